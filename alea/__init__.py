@@ -0,0 +1,55 @@
+"""
+Nucleo del sistema ALEA: tiri, Gradi di Successo, probabilità esatte e simulazioni.
+
+Nessuna dipendenza da discord e nessun effetto all'import: i moduli sono importati al primo accesso
+(`from alea import dice_roll`), le soglie si leggono al primo tiro (o con load_profiles())
+e NumPy solo per le simulazioni. Usabile da bot, benchmark e processi worker.
+"""
+import importlib
+
+_EXPORTS = {
+    # thresholds
+    "load_thresholds": "thresholds",
+    "ThresholdTable": "thresholds",
+    "compile_thresholds": "thresholds",
+    "load_profiles": "thresholds",
+    "threshold_profiles": "thresholds",
+    "get_threshold_table": "thresholds",
+    "format_success_levels": "thresholds",
+    # rng
+    "DicePool": "rng",
+    "parse_seed": "rng",
+    # dice
+    "safe_malus": "dice",
+    "calcola_malus_stato": "dice",
+    "dice_roll": "dice",
+    "dice_roll_batch": "dice",
+    "dice_roll_alea99": "dice",
+    "parse_ld": "dice",
+    "parse_vs_list": "dice",
+    # expr
+    "DiceExpressionError": "expr",
+    "parse_expression": "expr",
+    "roll_expression": "expr",
+    # odds
+    "alea_odds": "odds",
+    "alea99_odds": "odds",
+    # simulate
+    "simulate_alea": "simulate",
+    "simulate_alea99": "simulate",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'alea' has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
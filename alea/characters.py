@@ -0,0 +1,268 @@
+"""
+Schede personaggio (CAR, ABI, SPEC, VS e stati) per server e giocatore.
+Le letture sono servite da una cache LRU limitata per server; le modifiche aggiornano subito la cache
+e vengono scritte in SQLite da un thread in background, a blocchi (più modifiche alla stessa scheda
+tra due scritture diventano una sola riga). Stesso database dello storico dei tiri.
+"""
+import json
+import time
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, replace
+
+from .dice import SPEC_BONUS, calcola_malus_stato
+from .history import HISTORY_DB
+
+log = logging.getLogger(__name__)
+
+# === Character Sheets ===
+CHAR_CACHE_PER_GUILD = 256       # schede tenute in memoria per server
+CHAR_NAME_LISTS = 10_000         # elenchi di nomi (giocatore, server) tenuti in memoria per l'autocompletamento
+CHAR_FLUSH_INTERVAL = 2.0        # secondi massimi prima di scrivere le modifiche
+CHAR_NAME_MAX = 32
+STATE_LIMITS = {"lf": (0, 10), "la": (0, 4), "ls": (0, 4)}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS characters (
+    guild_id INTEGER NOT NULL,     -- 0 nei messaggi diretti
+    user_id INTEGER NOT NULL,
+    key TEXT NOT NULL,             -- nome in minuscolo
+    data TEXT NOT NULL,            -- Character in JSON
+    updated REAL NOT NULL,
+    PRIMARY KEY (guild_id, user_id, key)
+);
+"""
+
+
+@dataclass(frozen=True)
+class Character:
+    """Scheda immutabile: ogni modifica crea una nuova scheda (dataclasses.replace) e la sostituisce in cache."""
+    name: str
+    car: int = 0
+    abi: int = 0
+    spec: int = 0       # livello di Specializzazione (0-3: ALEA usa al massimo 2, ALEA99 tira 2 + SPEC dadi)
+    vs: int = 0         # VS fisso ALEA; 0 = CAR + ABI + bonus SPEC
+    vs99: int = 0       # VS ALEA99 (0-99, scala diversa: niente bonus SPEC, che in ALEA99 dà dadi); 0 = non impostato
+    lf: int = 0
+    la: int = 0
+    ls: int = 0
+
+    def alea_vs(self):
+        return self.vs or self.car + self.abi + SPEC_BONUS[min(self.spec, 2)]
+
+    def malus(self):
+        return calcola_malus_stato(self.lf, self.la, self.ls)
+
+    def with_state(self, **states):
+        return replace(self, **states)
+
+
+def character_key(name):
+    return name.strip().lower()
+
+
+class CharacterStore:
+    """
+    Cache per server (OrderedDict usato come LRU, chiave (user_id, nome)) e modifiche in attesa di scrittura.
+    get/save/delete vanno chiamate dall'event loop; load_one e list_names sono bloccanti (asyncio.to_thread).
+    """
+
+    def __init__(self, path=HISTORY_DB, per_guild=CHAR_CACHE_PER_GUILD, flush_interval=CHAR_FLUSH_INTERVAL):
+        self.path = path
+        self.per_guild = per_guild
+        self.flush_interval = flush_interval
+        self.guilds = {}
+        self.name_lists = OrderedDict()   # (guild_id, user_id) → nomi delle schede, LRU
+        self.pending = {}                 # (guild_id, user_id, key) → Character, o None per una cancellazione
+        self.writing = {}                 # blocco in scrittura: ancora visibile finché non è nel database
+        self.lock = threading.Lock()      # protegge `pending` e `writing`, condivisi col thread di scrittura
+        self.wake = threading.Event()
+        self._thread = None
+        self._closing = False
+        self.written = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def start(self):
+        """Crea la tabella e avvia il thread di scrittura (idempotente)."""
+        if self._thread is not None:
+            return
+        conn = self._connect()
+        with conn:
+            conn.executescript(SCHEMA)
+        conn.close()
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name="alea-characters", daemon=True)
+        self._thread.start()
+
+    # --- cache ---
+    def _cache(self, guild_id):
+        cache = self.guilds.get(guild_id)
+        if cache is None:
+            cache = self.guilds[guild_id] = OrderedDict()
+        return cache
+
+    def _remember(self, guild_id, user_id, key, character):
+        cache = self._cache(guild_id)
+        cache[(user_id, key)] = character
+        cache.move_to_end((user_id, key))
+        if len(cache) > self.per_guild:
+            cache.popitem(last=False)
+
+    def cached(self, guild_id, user_id):
+        """Schede del giocatore già in memoria (per l'autocompletamento, nessun accesso al disco)."""
+        return [c for (uid, _), c in self.guilds.get(guild_id or 0, {}).items() if uid == user_id and c is not None]
+
+    async def names(self, guild_id, user_id):
+        """Nomi delle schede del giocatore: dalla memoria, o dal disco la prima volta."""
+        import asyncio
+
+        key = (guild_id or 0, user_id)
+        names = self.name_lists.get(key)
+        if names is None:
+            names = await asyncio.to_thread(self.list_names, *key)
+            self.name_lists[key] = names
+            if len(self.name_lists) > CHAR_NAME_LISTS:
+                self.name_lists.popitem(last=False)
+        self.name_lists.move_to_end(key)
+        return names
+
+    # --- lettura ---
+    async def get(self, guild_id, user_id, name):
+        """Scheda per nome (None se non esiste): dalla cache, altrimenti dal disco in un thread."""
+        import asyncio
+
+        guild_id = guild_id or 0
+        key = character_key(name)
+        cache = self._cache(guild_id)
+        if (user_id, key) in cache:
+            cache.move_to_end((user_id, key))
+            return cache[(user_id, key)]
+        character = await asyncio.to_thread(self.load_one, guild_id, user_id, key)
+        if (user_id, key) in cache:       # una save() durante la lettura ha la precedenza
+            return cache[(user_id, key)]
+        self._remember(guild_id, user_id, key, character)
+        return character
+
+    def _unwritten(self):
+        """Modifiche non ancora nel database (le più recenti vincono); da leggere prima del database."""
+        with self.lock:
+            return {**self.writing, **self.pending}
+
+    def load_one(self, guild_id, user_id, key):
+        unwritten = self._unwritten()
+        if (guild_id, user_id, key) in unwritten:
+            return unwritten[(guild_id, user_id, key)]
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT data FROM characters WHERE guild_id = ? AND user_id = ? AND key = ?",
+                               (guild_id, user_id, key)).fetchone()
+        finally:
+            conn.close()
+        return Character(**json.loads(row[0])) if row else None
+
+    def list_names(self, guild_id, user_id):
+        """Nomi delle schede del giocatore nel server, incluse le modifiche non ancora scritte."""
+        guild_id = guild_id or 0
+        unwritten = self._unwritten()
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT key, data FROM characters WHERE guild_id = ? AND user_id = ?",
+                                (guild_id, user_id)).fetchall()
+        finally:
+            conn.close()
+        names = {key: json.loads(data)["name"] for key, data in rows}
+        for (g, u, key), character in unwritten.items():
+            if g == guild_id and u == user_id:
+                if character is None:
+                    names.pop(key, None)
+                else:
+                    names[key] = character.name
+        return sorted(names.values(), key=str.lower)
+
+    # --- scrittura ---
+    def save(self, guild_id, user_id, character):
+        """Aggiorna subito la cache e accoda la scrittura."""
+        guild_id = guild_id or 0
+        key = character_key(character.name)
+        self._remember(guild_id, user_id, key, character)
+        self._queue(guild_id, user_id, key, character)
+        names = self.name_lists.get((guild_id, user_id))
+        if names is not None:
+            others = [n for n in names if character_key(n) != key]
+            self.name_lists[(guild_id, user_id)] = sorted(others + [character.name], key=str.lower)
+
+    def delete(self, guild_id, user_id, name):
+        guild_id = guild_id or 0
+        key = character_key(name)
+        self._remember(guild_id, user_id, key, None)
+        self._queue(guild_id, user_id, key, None)
+        names = self.name_lists.get((guild_id, user_id))
+        if names is not None:
+            self.name_lists[(guild_id, user_id)] = [n for n in names if character_key(n) != key]
+
+    def _queue(self, guild_id, user_id, key, character):
+        with self.lock:
+            self.pending[(guild_id, user_id, key)] = character
+
+    def _flush(self, conn):
+        """Scrive in una transazione le modifiche in attesa; False se la scrittura fallisce (restano in coda)."""
+        with self.lock:
+            batch, self.pending = self.pending, {}
+            self.writing = batch
+        if not batch:
+            return True
+        now = time.time()
+        upserts = [(g, u, k, json.dumps(asdict(c)), now) for (g, u, k), c in batch.items() if c is not None]
+        deletes = [key for key, c in batch.items() if c is None]
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO characters (guild_id, user_id, key, data, updated) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (guild_id, user_id, key) DO UPDATE SET data = excluded.data, updated = excluded.updated",
+                    upserts,
+                )
+                conn.executemany("DELETE FROM characters WHERE guild_id = ? AND user_id = ? AND key = ?", deletes)
+        except sqlite3.Error:
+            # Rimette in coda le modifiche non sovrascritte nel frattempo, riprova al giro dopo
+            with self.lock:
+                self.pending = {**batch, **self.pending}
+                self.writing = {}
+            log.exception("Errore nella scrittura delle schede personaggio (%d in attesa)", len(batch))
+            return False
+        self.written += len(batch)
+        with self.lock:
+            self.writing = {}
+        return True
+
+    def _run(self):
+        conn = self._connect()
+        while True:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            # Letto prima della scrittura: le modifiche arrivate durante l'ultimo blocco vengono svuotate qui sotto
+            closing = self._closing
+            written = self._flush(conn)
+            if closing:
+                while written and self.pending:
+                    written = self._flush(conn)
+                if self.pending:
+                    log.error("Chiusura: %d modifiche alle schede non scritte", len(self.pending))
+                break
+        conn.close()
+
+    def close(self, timeout=10):
+        """Scrive tutte le modifiche ancora in attesa (anche quelle arrivate durante la scrittura) e ferma il thread."""
+        if self._thread is None:
+            return
+        self._closing = True
+        self.wake.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            log.error("Chiusura: scrittura delle schede ancora in corso dopo %s s", timeout)
+        self._thread = None
@@ -0,0 +1,111 @@
+"""
+Suggerimenti per l'autocompletamento di LD e VS. Gli indici di prefissi si costruiscono una volta
+(al primo uso o in warm_up()): ogni richiesta è una lettura di dict, senza parsing né scansioni.
+"""
+from collections import OrderedDict
+from functools import lru_cache
+
+from .dice import LD_LEVELS
+
+# === Autocomplete ===
+AUTOCOMPLETE_LIMIT = 25      # scelte massime per risposta (limite Discord)
+RECENT_VS_PER_USER = 10      # VS recenti ricordati per giocatore
+RECENT_VS_USERS = 10_000     # giocatori ricordati (i meno recenti vengono dimenticati)
+
+
+class PrefixIndex:
+    """Ogni prefisso (minuscolo) di ogni chiave → voci corrispondenti, nell'ordine di inserimento."""
+
+    def __init__(self, entries, limit=AUTOCOMPLETE_LIMIT):
+        index = {}
+        for keys, item in entries:
+            for key in keys:
+                key = key.lower()
+                for n in range(len(key) + 1):
+                    items = index.setdefault(key[:n], [])
+                    if item not in items:
+                        items.append(item)
+        self.index = {prefix: tuple(items[:limit]) for prefix, items in index.items()}
+
+    def lookup(self, text):
+        return self.index.get(str(text).strip().lower(), ())
+
+
+def ld_label(value, short, long):
+    return f"{long} ({short}, {value:+d})"
+
+
+@lru_cache(maxsize=None)
+def ld_text_index():
+    """LD testuale (/alea99): accetta valore, -3..+3, narrativo corto e lungo; suggerisce il valore numerico."""
+    return PrefixIndex(
+        ((long, short, str(value), f"{value:+d}", str(value // 20), f"{value // 20:+d}"),
+         (ld_label(value, short, long), str(value)))
+        for value, short, long in LD_LEVELS
+    )
+
+
+@lru_cache(maxsize=None)
+def ld_int_index():
+    """LD intero (/alea): solo prefissi numerici, il client Discord accetta solo cifre."""
+    return PrefixIndex(
+        ((str(value), f"{value:+d}"), (ld_label(value, short, long), value))
+        for value, short, long in LD_LEVELS
+    )
+
+
+def ld_suggestions(current, numeric=False):
+    """(nome, valore) da mostrare per quanto digitato finora."""
+    return (ld_int_index() if numeric else ld_text_index()).lookup(current)
+
+
+class RecentValues:
+    """
+    Ultimi valori distinti usati da ogni giocatore (il più recente per primo), in memoria e limitati.
+    La chiave è (sistema, giocatore): ALEA e ALEA99 hanno VS con scale diverse e non si mescolano.
+    """
+
+    def __init__(self, per_user=RECENT_VS_PER_USER, users=RECENT_VS_USERS):
+        self.per_user = per_user
+        self.users = users
+        self.values = OrderedDict()
+
+    def add(self, system, user_id, value):
+        values = self.values.pop((system, user_id), ())
+        self.values[(system, user_id)] = (value,) + tuple(v for v in values if v != value)[:self.per_user - 1]
+        if len(self.values) > self.users:
+            self.values.popitem(last=False)
+
+    def get(self, system, user_id):
+        return self.values.get((system, user_id), ())
+
+
+def vs_suggestions(current, recent=(), named=(), low=0, high=99):
+    """
+    (nome, valore) per il VS: il numero digitato (se valido), poi i valori con nome (es. schede personaggio)
+    e i VS usati di recente che iniziano con quanto digitato. Ogni scelta rispetta i limiti `low`..`high`
+    (`high=None`: nessun limite superiore), così non si suggerisce un VS che il comando rifiuterebbe.
+    """
+    def valid(value):
+        return low <= value and (high is None or value <= high)
+
+    text = str(current).strip()
+    choices = []
+    if text.isdigit() and valid(int(text)):
+        choices.append((f"VS {int(text)}", int(text)))
+    seen = {value for _, value in choices}
+    for label, value in named:
+        if valid(value) and (str(value).startswith(text) or label.lower().startswith(text.lower())):
+            choices.append((f"{label} (VS {value})", value))
+            seen.add(value)
+    for value in recent:
+        if value not in seen and valid(value) and str(value).startswith(text):
+            choices.append((f"VS {value} · usato di recente", value))
+            seen.add(value)
+    return choices[:AUTOCOMPLETE_LIMIT]
+
+
+def warm_up():
+    """Costruisce gli indici prima del primo autocompletamento."""
+    ld_text_index()
+    ld_int_index()
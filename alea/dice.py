@@ -0,0 +1,231 @@
+"""
+Tiri ALEA classico (1d100 con Tiro Aperto) e ALEA99 (Nd10, i 2 più bassi), malus da stati e parsing di LD.
+"""
+import re
+import logging
+
+from .rng import roll_rng
+from .thresholds import get_threshold_table
+
+log = logging.getLogger(__name__)
+AUDIT_LOG = logging.getLogger("alea.audit")  # un record per tiro in modalità audit (mai campionato)
+
+
+def safe_malus(malus_stato):
+    """Converte il malus da stato in intero; valori non convertibili (es. incoscienza = inf) valgono 0."""
+    try:
+        return int(malus_stato)
+    except (OverflowError, TypeError, ValueError):
+        return 0
+
+
+# Bonus al VS per livello di Specializzazione (ALEA classico)
+SPEC_BONUS = {0: 0, 1: 20, 2: 30}
+
+def calcola_malus_stato(lf=0, la=0, ls=0):
+    """Somma dei malus da Ferite (LF), Affaticamento (LA) e Stordimento (LS)."""
+    malus_lf = 0 if lf <= 3 else (20 if lf <= 5 else (40 if lf <= 7 else (60 if lf <= 9 else float('inf'))))
+    malus_la = 0 if la == 0 else (20 if la == 1 else (40 if la == 2 else (60 if la == 3 else float('inf'))))
+    malus_ls = 0 if ls == 0 else (20 if ls == 1 else (40 if ls == 2 else (60 if ls == 3 else float('inf'))))
+    return malus_lf + malus_la + malus_ls
+
+
+def dice_roll(vs, ld, malus_stato=0, compute_label=True, table=None, seed=None):
+    """
+    Perform a classic ALEA 1d100 roll applying LD (added to the roll) and state malus.
+    Handles "Tiro Aperto" (exploding) on 1-5 (subtract reroll) and 96-100 (add reroll).
+    Returns a dict with keys used by the /alea command.
+    Pass `seed` to replay an audited roll exactly.
+    """
+    replay = seed is not None
+    rng, seed = roll_rng(seed)
+
+    # Primo tiro 1-100
+    primo_tiro = rng.randint(1, 100)
+    final_roll = primo_tiro
+
+    tiro_aperto = False
+    reroll_value = None
+
+    # Handle "Tiro Aperto" (exploding rolls)
+    if 1 <= primo_tiro <= 5:
+        reroll_value = rng.randint(1, 100)
+        final_roll -= reroll_value
+        tiro_aperto = True
+    elif 96 <= primo_tiro <= 100:
+        reroll_value = rng.randint(1, 100)
+        final_roll += reroll_value
+        tiro_aperto = True
+
+    # Apply LD (classic ALEA uses LD added to the roll on the left)
+    final_roll += ld
+
+    # Apply malus from status (added to the roll)
+    final_roll += safe_malus(malus_stato)
+
+    # Ensure integer
+    final_roll = int(final_roll)
+
+    if seed is not None and not replay:
+        AUDIT_LOG.info("alea seed=%016x vs=%s ld=%s malus=%s primo=%s reroll=%s tm=%s",
+                       seed, vs, ld, safe_malus(malus_stato), primo_tiro, reroll_value, final_roll)
+
+    result_label = None
+    if compute_label:
+        # Compute human-readable result label against the VS boundaries (safe fallback)
+        try:
+            table = get_threshold_table() if table is None else table
+            result_label = table.labels[table.classify(final_roll, vs)]
+        except Exception:
+            # Il tiro resta valido anche senza grado, ma l'errore (tabella di soglie rotta?) deve vedersi
+            log.exception("Classificazione del tiro fallita (vs=%s, tm=%s)", vs, final_roll)
+            result_label = "Risultato sconosciuto"
+
+    return {
+        "Primo Tiro": primo_tiro,
+        "Reroll": reroll_value,
+        "Tiro Aperto": tiro_aperto,
+        "Tiro 1d100": primo_tiro,
+        "Tiro Manovra (con LD)": final_roll,
+        "Valore Soglia (VS)": vs,
+        "Livello Difficoltà (LD)": ld,
+        "Risultato": result_label,
+        "Seed": seed
+    }
+
+# === Batch Rolls ===
+BATCH_MAX_ROLLS = 50       # tiri massimi per singola interazione
+
+def parse_vs_list(text):
+    """Lista di VS da testo ('60, 45 70;80' → [60, 45, 70, 80]); None se un valore non è un intero >= 0."""
+    parts = [p for p in re.split(r"[\s,;]+", str(text).strip()) if p]
+    try:
+        values = [int(p) for p in parts]
+    except ValueError:
+        return None
+    if not values or any(v < 0 for v in values):
+        return None
+    return values
+
+
+def batch_vs(vs_values, tiri):
+    """VS di un tiro multiplo (ogni VS ripetuto `tiri` volte); None se il totale non è tra 1 e BATCH_MAX_ROLLS."""
+    # Il limite si controlla prima di moltiplicare la lista: un `tiri` enorme non deve allocare nulla
+    if not 1 <= tiri <= BATCH_MAX_ROLLS or not 1 <= len(vs_values) * tiri <= BATCH_MAX_ROLLS:
+        return None
+    return vs_values * tiri
+
+
+def dice_roll_batch(vs_values, ld, malus_stato=0, table=None):
+    """Tira una volta per ogni VS con gli stessi LD e malus; ogni risultato include l'indice del grado."""
+    table = get_threshold_table() if table is None else table
+    results = []
+    for vs in vs_values:
+        result = dice_roll(vs, ld, malus_stato, compute_label=False)
+        result["Indice Grado"] = table.classify(result["Tiro Manovra (con LD)"], vs)
+        results.append(result)
+    return results
+
+# === ALEA99 System ===
+def dice_roll_alea99(n, vs, ld, seed=None):
+    """
+    Sistema ALEA99: tira N d10, prende i 2 più bassi, calcola risultato come numero 2-cifre.
+    VS_effettivo = VS + LD
+
+    Gradi di Successo:
+    - Successo Assoluto (SA): cifre identiche e <= VS_effettivo
+    - Successo Pieno (SP): cifre diverse e <= VS_effettivo
+    - Fallimento Pieno (FP): cifre diverse e > VS_effettivo
+    - Fallimento Critico (FC): cifre identiche e > VS_effettivo
+
+    Con `seed` riproduce esattamente un tiro registrato in modalità audit.
+    """
+    replay = seed is not None
+    rng, seed = roll_rng(seed)
+
+    # Tira N d10 [0..9]
+    rolls = [rng.randint(0, 9) for _ in range(n)]
+
+    # Ordina e prendi i 2 più bassi
+    rolls_sorted = sorted(rolls)
+    two_lowest = rolls_sorted[:2]
+
+    # Forma il numero: primo dado è decina, secondo è unità
+    result_value = two_lowest[0] * 10 + two_lowest[1]
+
+    # Calcola VS effettivo
+    vs_effective = vs + ld
+
+    if seed is not None and not replay:
+        AUDIT_LOG.info("alea99 seed=%016x n=%s vs=%s ld=%s tiri=%s", seed, n, vs, ld, rolls)
+
+    # Determina grado di successo
+    has_identical_digits = two_lowest[0] == two_lowest[1]
+    is_success = result_value <= vs_effective
+
+    if has_identical_digits and is_success:
+        success_level = "Successo Assoluto"
+        acronym = "SA"
+    elif has_identical_digits and not is_success:
+        success_level = "Fallimento Critico"
+        acronym = "FC"
+    elif not has_identical_digits and is_success:
+        success_level = "Successo Pieno"
+        acronym = "SP"
+    else:  # not has_identical_digits and not is_success
+        success_level = "Fallimento Pieno"
+        acronym = "FP"
+
+    return {
+        "Numero Dadi": n,
+        "Tiri Completi": rolls,
+        "Due Più Bassi": two_lowest,
+        "Risultato": result_value,
+        "VS (Valore Soglia)": vs,
+        "LD (Livello Difficoltà)": ld,
+        "VS Effettivo": vs_effective,
+        "Cifre Identiche": has_identical_digits,
+        "Successo Level": success_level,
+        "Acronym": acronym,
+        "Seed": seed
+    }
+
+# Livelli di Difficoltà: (valore, narrativo corto, narrativo lungo)
+LD_LEVELS = (
+    (-60, "FFF", "Banale"),
+    (-40, "FF", "Facilissima"),
+    (-20, "F", "Facile"),
+    (0, "M", "Media"),
+    (20, "D", "Difficile"),
+    (40, "DD", "Difficilissima"),
+    (60, "DDD", "Estrema"),
+)
+LD_NARRATIVE = {name.upper(): value for value, short, long in LD_LEVELS for name in (short, long)}
+
+def parse_ld(ld_input):
+    """
+    Parsa LD da molteplici formati:
+    - Numerico: -60, -30, 0, 30, 60
+    - Numerico narrativo: -3, -2, -1, 0, 1, 2, 3 (moltiplicato per 20)
+    - Narrativo corto: FFF, FF, F, M, D, DD, DDD
+    - Narrativo lungo: Banale, Facilissima, Facile, Media, Difficile, Difficilissima, Estrema
+    Ritorna valore numerico in [-60, 60]
+    """
+    ld_input = str(ld_input).strip().upper()
+
+    # Narrativo corto o lungo
+    value = LD_NARRATIVE.get(ld_input)
+    if value is not None:
+        return value
+
+    # Prova numerico narrativo (-3 a +3)
+    try:
+        ld_num = int(ld_input)
+        if -3 <= ld_num <= 3:
+            return ld_num * 20
+        elif -60 <= ld_num <= 60 and ld_num % 20 == 0:
+            return ld_num
+    except ValueError:
+        pass
+
+    return None
@@ -0,0 +1,362 @@
+"""
+Espressioni di dadi per /roll: `6d10kl2`, `4d6kh3+2`, `3d6!`, `1d100ta`, `2d20dl1 + 1d4 - 1`, `(2d6+3)*2`.
+
+Il testo viene compilato in un AST immutabile tenuto in cache LRU, quindi un'espressione ripetuta non viene
+riparsata. Tenere/scartare dadi usa una selezione con heapq (O(n log k)) invece di un ordinamento completo;
+oltre VECTOR_THRESHOLD dadi per termine il tiro passa a un percorso vettoriale NumPy.
+
+Sintassi di un termine di dadi: [N]dF oppure [N]d% seguito da modificatori opzionali
+    khK / kK   tieni i K più alti          klK   tieni i K più bassi
+    dhK        scarta i K più alti         dlK   scarta i K più bassi
+    !          esplode sul massimo (ritira e somma, anche più volte)
+    !S         esplode su S o più
+    ta / taM   Tiro Aperto come in ALEA: sulle M facce più basse sottrae un ritiro, sulle M più alte lo somma
+               (M di default = 5% delle facce, quindi 1d100ta è il tiro di /alea)
+"""
+import re
+import heapq
+import logging
+import secrets
+import functools
+from dataclasses import dataclass
+
+from .rng import roll_rng
+
+AUDIT_LOG = logging.getLogger("alea.audit")
+
+# === Dice Expressions (/roll) ===
+MAX_EXPRESSION_LENGTH = 200
+MAX_DICE_TERMS = 20
+MAX_SIDES = 1_000_000
+MAX_DICE = 1_000_000        # dadi totali per espressione (un termine vettoriale da 1M dadi usa decine di MB)
+MAX_DRAWS = 2_000_000       # estrazioni per espressione, esplosioni e ritiri compresi (stimate e poi contate nel tiro)
+VECTOR_THRESHOLD = 5_000    # dadi per termine oltre i quali si usa NumPy
+INLINE_DRAWS = 2_000        # estrazioni stimate (esplosioni e ritiri compresi) oltre le quali il tiro va in un thread
+MAX_EXPLOSIONS = 100        # catene di esplosioni per dado (o round vettoriali per termine)
+
+
+class DiceExpressionError(ValueError):
+    """Espressione non valida; il messaggio è mostrato all'utente."""
+
+
+@dataclass(frozen=True)
+class Number:
+    value: int
+
+
+@dataclass(frozen=True)
+class Dice:
+    text: str
+    count: int
+    sides: int
+    keep: tuple = None          # ("h" | "l", K) dopo aver convertito gli scarti in "tieni"
+    explode: int = None         # soglia di esplosione (faccia minima che esplode)
+    open_margin: int = None     # Tiro Aperto: facce basse/alte che attivano il ritiro
+
+
+@dataclass(frozen=True)
+class BinOp:
+    op: str
+    left: object
+    right: object
+
+
+@dataclass(frozen=True)
+class Neg:
+    operand: object
+
+
+@dataclass(frozen=True)
+class Expression:
+    """Espressione compilata: radice dell'AST, termini di dadi in ordine, numero totale di dadi ed estrazioni stimate."""
+    text: str
+    root: object
+    dice: tuple
+    dice_count: int
+    draws: float = 0.0
+
+    @property
+    def offload(self):
+        """True se il tiro è troppo costoso per l'event loop: un termine vettoriale o troppe estrazioni scalari."""
+        return self.draws > INLINE_DRAWS or any(d.count > VECTOR_THRESHOLD for d in self.dice)
+
+
+TOKEN_RE = re.compile(r"\s*(?:(?P<dice>(?P<count>\d*)d(?P<sides>\d+|%)(?P<mods>(?:k[hl]?\d+|d[hl]\d+|!\d*|ta\d*)*))"
+                      r"|(?P<number>\d+)|(?P<op>[-+*()]))")
+MODIFIER_RE = re.compile(r"(k[hl]?|d[hl]|!|ta)(\d*)")
+
+
+def _dice_term(match):
+    text = match.group("dice")
+    count = int(match.group("count") or 1)
+    sides = 100 if match.group("sides") == "%" else int(match.group("sides"))
+    if count < 1 or sides < 2:
+        raise DiceExpressionError(f"`{text}`: servono almeno 1 dado e 2 facce")
+    if sides > MAX_SIDES:
+        raise DiceExpressionError(f"`{text}`: al massimo {MAX_SIDES} facce")
+
+    keep = explode = open_margin = None
+    for mod, value in MODIFIER_RE.findall(match.group("mods")):
+        if mod.startswith(("k", "d")):
+            if keep is not None:
+                raise DiceExpressionError(f"`{text}`: un solo modificatore tieni/scarta per termine")
+            n = int(value)
+            if not 0 <= n <= count:
+                raise DiceExpressionError(f"`{text}`: non si possono tenere o scartare {n} dadi su {count}")
+            keep = {"k": ("h", n), "kh": ("h", n), "kl": ("l", n), "dh": ("l", count - n), "dl": ("h", count - n)}[mod]
+        elif mod == "!":
+            explode = int(value) if value else sides
+            if not 2 <= explode <= sides:
+                raise DiceExpressionError(f"`{text}`: la soglia di esplosione deve essere tra 2 e {sides}")
+        else:
+            open_margin = int(value) if value else max(1, sides * 5 // 100)
+            if not 1 <= open_margin <= sides // 2:
+                raise DiceExpressionError(f"`{text}`: il Tiro Aperto richiede tra 1 e {sides // 2} facce per lato")
+    if explode is not None and open_margin is not None:
+        raise DiceExpressionError(f"`{text}`: esplosione e Tiro Aperto non sono combinabili")
+    return Dice(text=text, count=count, sides=sides, keep=keep, explode=explode, open_margin=open_margin)
+
+
+def expected_draws(dice):
+    """Estrazioni attese per un termine: ogni dado più i ritiri del Tiro Aperto o le esplosioni (al più MAX_EXPLOSIONS)."""
+    if dice.open_margin is not None:
+        if dice.count > VECTOR_THRESHOLD:
+            return dice.count * 2  # il percorso vettoriale estrae un ritiro per ogni dado
+        return dice.count * (1 + 2 * dice.open_margin / dice.sides)
+    if dice.explode is not None:
+        p = (dice.sides - dice.explode + 1) / dice.sides   # sempre < 1: la soglia è almeno 2
+        return dice.count * (1 - p ** (MAX_EXPLOSIONS + 1)) / (1 - p)
+    return dice.count
+
+
+def _tokenize(text):
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        match = TOKEN_RE.match(text, pos)
+        if match is None or match.end() == pos:
+            if text[pos:].strip() == "":
+                break
+            raise DiceExpressionError(f"Simbolo non valido vicino a `{text[pos:pos + 10]}`")
+        if match.group("dice"):
+            tokens.append(("dice", _dice_term(match)))
+        elif match.group("number"):
+            tokens.append(("number", Number(int(match.group("number")))))
+        else:
+            tokens.append(("op", match.group("op")))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """Discesa ricorsiva: expr := term (('+'|'-') term)*, term := unary ('*' unary)*, unary := '-' unary | atom."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def expr(self):
+        node = self.term()
+        while self.peek() in (("op", "+"), ("op", "-")):
+            node = BinOp(self.take()[1], node, self.term())
+        return node
+
+    def term(self):
+        node = self.unary()
+        while self.peek() == ("op", "*"):
+            self.take()
+            node = BinOp("*", node, self.unary())
+        return node
+
+    def unary(self):
+        if self.peek() == ("op", "-"):
+            self.take()
+            return Neg(self.unary())
+        if self.peek() == ("op", "+"):
+            self.take()
+            return self.unary()
+        return self.atom()
+
+    def atom(self):
+        kind, value = self.take()
+        if kind in ("dice", "number"):
+            return value
+        if (kind, value) == ("op", "("):
+            node = self.expr()
+            if self.take() != ("op", ")"):
+                raise DiceExpressionError("Parentesi non chiusa")
+            return node
+        raise DiceExpressionError("Espressione incompleta" if kind is None else f"`{value}` inatteso")
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_expression(text):
+    """Compila (con cache) il testo normalizzato di un'espressione; solleva DiceExpressionError se non valida."""
+    if len(text) > MAX_EXPRESSION_LENGTH:
+        raise DiceExpressionError(f"Espressione troppo lunga (max {MAX_EXPRESSION_LENGTH} caratteri)")
+    tokens = _tokenize(text)
+    if not tokens:
+        raise DiceExpressionError("Espressione vuota")
+    parser = _Parser(tokens)
+    root = parser.expr()
+    if parser.pos < len(tokens):
+        kind, value = tokens[parser.pos]
+        shown = value if kind == "op" else value.text if kind == "dice" else value.value
+        raise DiceExpressionError(f"`{shown}` inatteso")
+    dice = tuple(value for kind, value in tokens if kind == "dice")
+    if len(dice) > MAX_DICE_TERMS:
+        raise DiceExpressionError(f"Troppi termini di dadi (max {MAX_DICE_TERMS})")
+    dice_count = sum(d.count for d in dice)
+    if dice_count > MAX_DICE:
+        raise DiceExpressionError(f"Troppi dadi (max {MAX_DICE:,})".replace(",", "."))
+    draws = sum(map(expected_draws, dice))
+    if draws > MAX_DRAWS:
+        raise too_many_draws()
+    return Expression(text=text, root=root, dice=dice, dice_count=dice_count, draws=draws)
+
+
+def too_many_draws():
+    return DiceExpressionError(f"Troppi dadi (max {MAX_DRAWS:,} estrazioni comprese le esplosioni)".replace(",", "."))
+
+
+def parse_expression(text):
+    """Normalizza (minuscole, senza spazi ai bordi) e compila; stessi testi → stesso AST dalla cache."""
+    return compile_expression(str(text).strip().lower())
+
+
+# === Evaluation ===
+def _roll_die(rng, dice):
+    """Un dado con esplosione o Tiro Aperto; ritorna (valore, facce uscite)."""
+    first = rng.randint(1, dice.sides)
+    if dice.open_margin is not None:
+        if first <= dice.open_margin:
+            reroll = rng.randint(1, dice.sides)
+            return first - reroll, (first, reroll)
+        if first > dice.sides - dice.open_margin:
+            reroll = rng.randint(1, dice.sides)
+            return first + reroll, (first, reroll)
+        return first, (first,)
+    if dice.explode is not None:
+        faces = [first]
+        while faces[-1] >= dice.explode and len(faces) <= MAX_EXPLOSIONS:
+            faces.append(rng.randint(1, dice.sides))
+        return sum(faces), tuple(faces)
+    return first, (first,)
+
+
+def _kept_indices(values, keep):
+    """Indici dei dadi tenuti, con selezione heapq (n log k) invece di un ordinamento completo."""
+    if keep is None:
+        return None
+    mode, k = keep
+    select = heapq.nlargest if mode == "h" else heapq.nsmallest
+    return frozenset(select(k, range(len(values)), key=values.__getitem__))
+
+
+def _roll_scalar(rng, dice, budget):
+    """Tiro dado per dado; `budget` sono le estrazioni ancora disponibili per l'espressione."""
+    values, faces = [], []
+    draws = 0
+    for _ in range(dice.count):
+        value, die_faces = _roll_die(rng, dice)
+        values.append(value)
+        faces.append(die_faces)
+        draws += len(die_faces)
+        if draws > budget:
+            raise too_many_draws()
+    kept = _kept_indices(values, dice.keep)
+    total = sum(values) if kept is None else sum(values[i] for i in kept)
+    return {"Termine": dice.text, "Totale": total, "Valori": values, "Facce": faces, "Tenuti": kept,
+            "Estrazioni": draws}
+
+
+def _roll_vector(seed, dice, budget):
+    """Percorso NumPy per termini con moltissimi dadi: solo totale e conteggi, niente elenco dei dadi."""
+    import numpy as np
+
+    generator = np.random.Generator(np.random.PCG64(seed))
+    values = generator.integers(1, dice.sides + 1, size=dice.count, dtype=np.int64)
+    draws = dice.count
+    if dice.open_margin is not None:
+        low = values <= dice.open_margin
+        high = values > dice.sides - dice.open_margin
+        rerolls = generator.integers(1, dice.sides + 1, size=dice.count, dtype=np.int64)
+        values = values - np.where(low, rerolls, 0) + np.where(high, rerolls, 0)
+        draws += dice.count
+    elif dice.explode is not None:
+        exploding = values >= dice.explode
+        for _ in range(MAX_EXPLOSIONS):
+            count = int(np.count_nonzero(exploding))
+            if not count:
+                break
+            draws += count
+            if draws > budget:  # prima di estrarre: il round successivo non viene nemmeno allocato
+                raise too_many_draws()
+            extra = generator.integers(1, dice.sides + 1, size=count, dtype=np.int64)
+            values[exploding] += extra
+            still = np.zeros_like(exploding)
+            still[np.flatnonzero(exploding)] = extra >= dice.explode
+            exploding = still
+    if dice.keep is not None:
+        mode, k = dice.keep
+        if k == 0:
+            total = 0
+        elif mode == "l":
+            total = int(np.partition(values, k - 1)[:k].sum())
+        else:
+            total = int(np.partition(values, dice.count - k)[dice.count - k:].sum())
+    else:
+        total = int(values.sum())
+    return {"Termine": dice.text, "Totale": total, "Valori": None, "Facce": None, "Tenuti": None, "Estrazioni": draws}
+
+
+def _evaluate(node, terms):
+    if isinstance(node, Number):
+        return node.value
+    if isinstance(node, Dice):
+        return terms[id(node)]["Totale"]
+    if isinstance(node, Neg):
+        return -_evaluate(node.operand, terms)
+    left, right = _evaluate(node.left, terms), _evaluate(node.right, terms)
+    return left + right if node.op == "+" else left - right if node.op == "-" else left * right
+
+
+def roll_expression(expression, seed=None):
+    """
+    Tira un'espressione (testo o Expression compilata). Ritorna il totale, il dettaglio di ogni termine
+    di dadi nell'ordine dell'espressione e il seed (in modalità audit o replay, come per dice_roll).
+    Solleva DiceExpressionError se le esplosioni superano MAX_DRAWS estrazioni in totale.
+    """
+    expression = parse_expression(expression) if isinstance(expression, str) else expression
+    replay = seed is not None
+    rng, seed = roll_rng(seed)
+    terms = {}
+    budget = MAX_DRAWS
+    for dice in expression.dice:
+        if dice.count > VECTOR_THRESHOLD:
+            # Seme del generatore NumPy preso dal generatore del tiro, così anche il percorso vettoriale si riproduce
+            sub_seed = rng.getrandbits(63) if hasattr(rng, "getrandbits") else secrets.randbits(63)
+            term = _roll_vector(sub_seed, dice, budget)
+        else:
+            term = _roll_scalar(rng, dice, budget)
+        terms[id(dice)] = term
+        budget -= term["Estrazioni"]
+    total = _evaluate(expression.root, terms)
+
+    if seed is not None and not replay:
+        AUDIT_LOG.info("roll seed=%016x expr=%s totale=%s", seed, expression.text, total)
+
+    return {
+        "Espressione": expression.text,
+        "Totale": total,
+        "Termini": [terms[id(dice)] for dice in expression.dice],
+        "Seed": seed,
+    }
@@ -0,0 +1,161 @@
+"""
+Storico dei tiri in SQLite (WAL): registrare un tiro è un put() non bloccante su una coda,
+un thread in background scrive le righe a blocchi in una sola transazione.
+Nessun file viene aperto finché start() non viene chiamata; prima di allora record() non fa nulla.
+"""
+import os
+import json
+import time
+import queue
+import logging
+import sqlite3
+import threading
+
+log = logging.getLogger(__name__)
+
+# === Roll History (SQLite, write-behind) ===
+HISTORY_DB = os.getenv("ALEA_HISTORY_DB", "alea_history.db")
+HISTORY_FLUSH_INTERVAL = 1.0   # secondi massimi prima di scrivere un blocco incompleto
+HISTORY_BATCH = 500            # righe massime per transazione
+
+HISTORY_COLUMNS = ("ts", "user_id", "guild_id", "channel_id", "system", "vs", "ld", "malus", "n",
+                   "dice", "result", "grade", "seed", "expr")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rolls (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,              -- unix time del tiro
+    user_id INTEGER,
+    guild_id INTEGER,
+    channel_id INTEGER,
+    system TEXT NOT NULL,          -- 'alea', 'alea99' o 'roll'
+    vs INTEGER,
+    ld INTEGER,
+    malus INTEGER,
+    n INTEGER,                     -- dadi ALEA99 (NULL per ALEA classico)
+    dice TEXT,                     -- JSON: [primo tiro, reroll], i tiri Nd10 o i dadi di ogni termine di /roll
+    result INTEGER,                -- Tiro Manovra, risultato ALEA99 o totale di /roll
+    grade TEXT,
+    seed TEXT,
+    expr TEXT                      -- espressione di /roll
+);
+CREATE INDEX IF NOT EXISTS rolls_user_ts ON rolls(user_id, ts);
+CREATE INDEX IF NOT EXISTS rolls_guild_ts ON rolls(guild_id, ts);
+"""
+
+_STOP = object()
+
+
+class RollHistory:
+    """Coda di tiri da salvare, thread di scrittura e query di lettura (connessione per thread)."""
+
+    def __init__(self, path=HISTORY_DB, flush_interval=HISTORY_FLUSH_INTERVAL, batch_size=HISTORY_BATCH):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._local = threading.local()
+        self.written = 0
+        self.dropped = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # con WAL: durevole a ogni checkpoint, niente fsync per commit
+        return conn
+
+    def start(self):
+        """Crea lo schema e avvia il thread di scrittura (idempotente)."""
+        if self._thread is not None:
+            return
+        conn = self._connect()
+        with conn:
+            conn.executescript(SCHEMA)
+            # Database creati prima di /roll: aggiunge la colonna mancante
+            if "expr" not in {row[1] for row in conn.execute("PRAGMA table_info(rolls)")}:
+                try:
+                    conn.execute("ALTER TABLE rolls ADD COLUMN expr TEXT")
+                except sqlite3.OperationalError:
+                    pass  # aggiunta nel frattempo da un altro worker del cluster
+        conn.close()
+        self._thread = threading.Thread(target=self._run, name="alea-history", daemon=True)
+        self._thread.start()
+
+    def record(self, **fields):
+        """Accoda un tiro (mai bloccante); `dice` viene serializzato in JSON."""
+        if self._thread is None:
+            return
+        fields.setdefault("ts", time.time())
+        if fields.get("dice") is not None:
+            fields["dice"] = json.dumps(fields["dice"])
+        self._queue.put(tuple(fields.get(column) for column in HISTORY_COLUMNS))
+
+    def _run(self):
+        conn = self._connect()
+        insert = f"INSERT INTO rolls ({', '.join(HISTORY_COLUMNS)}) VALUES ({', '.join('?' * len(HISTORY_COLUMNS))})"
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            # Raccoglie altre righe fino al blocco pieno o alla scadenza, così una raffica è una sola transazione
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                with conn:
+                    conn.executemany(insert, batch)
+                self.written += len(batch)
+            except sqlite3.Error:
+                self.dropped += len(batch)
+                log.exception("Errore nella scrittura dello storico tiri (%d tiri persi)", len(batch))
+        conn.close()
+
+    def close(self, timeout=10):
+        """Scrive i tiri ancora in coda e ferma il thread."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            conn.row_factory = sqlite3.Row
+        return conn
+
+    def recent(self, user_id=None, guild_id=None, since=None, until=None, limit=10, offset=0):
+        """
+        Tiri più recenti per utente e/o server, opzionalmente in un intervallo di tempo (unix time).
+        Bloccante: dal bot va chiamata con asyncio.to_thread. I tiri ancora in coda non sono inclusi.
+        """
+        clauses, params = [], []
+        for column, value in (("user_id", user_id), ("guild_id", guild_id)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._reader().execute(
+            f"SELECT * FROM rolls {where} ORDER BY ts DESC, id DESC LIMIT ? OFFSET ?", (*params, limit, offset)
+        ).fetchall()
+        return [{**dict(row), "dice": json.loads(row["dice"]) if row["dice"] else None} for row in rows]
@@ -0,0 +1,138 @@
+"""
+Log strutturati in JSON, una riga per record, senza mai bloccare l'event loop: i logger mettono i record in una
+coda (QueueHandler) e un thread in background (QueueListener) li formatta e li scrive su stdout (journald).
+Il campionamento avviene prima della coda, quindi i record scartati non costano quasi nulla.
+
+Uso: log = logging.getLogger(__name__); log.info("messaggio", extra={"command": "alea", "guild": 123})
+"""
+import os
+import sys
+import json
+import time
+import queue
+import random
+import logging
+import threading
+import logging.handlers
+
+# === Structured Logging ===
+LOG_LEVEL = os.getenv("ALEA_LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE = float(os.getenv("ALEA_LOG_SAMPLE", "0.1"))    # frazione tenuta degli eventi di routine (extra sample=True)
+LOG_BURST = int(os.getenv("ALEA_LOG_BURST", "20"))          # WARNING e oltre: record al minuto per (logger, messaggio)
+LOG_BURST_WINDOW = 60.0
+
+# Attributi standard di LogRecord: tutto il resto arriva da `extra` e finisce nel JSON così com'è
+_STANDARD = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "sample"}
+
+
+def exception_summary(exc_info):
+    """Tipo, messaggio e ultima riga del traceback (file:riga in funzione) di un'eccezione."""
+    error, tb = exc_info[1], exc_info[2]
+    where = None
+    cwd = os.getcwd()
+    while tb is not None:
+        path = tb.tb_frame.f_code.co_filename
+        path = os.path.relpath(path, cwd) if path.startswith(cwd) else path
+        where = f"{path}:{tb.tb_lineno} in {tb.tb_frame.f_code.co_name}"
+        tb = tb.tb_next
+    return {"type": type(error).__name__, "message": str(error)[:500], "where": where}
+
+
+class JsonFormatter(logging.Formatter):
+    """Un oggetto JSON per riga: ts, level, logger, msg, i campi `extra`, `static` (es. cluster) ed exc."""
+
+    def __init__(self, static=None):
+        super().__init__()
+        self.static = static or {}
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **self.static,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD:
+                entry[key] = value
+        if record.exc_info and record.exc_info[1] is not None:
+            entry["exc"] = exception_summary(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Filtro prima della coda, così un server molto attivo non inonda journald:
+    - gli eventi di routine (extra sample=True, es. ogni comando completato) sono tenuti con probabilità `rate`
+      e riportano `sample_rate` per poter riscalare i conteggi;
+    - WARNING e oltre non sono mai campionati, ma al più `burst` al minuto per (logger, messaggio):
+      i successivi vengono contati e riportati come `suppressed` nel primo record ammesso dopo la finestra.
+    """
+
+    def __init__(self, rate=LOG_SAMPLE, burst=LOG_BURST, window=LOG_BURST_WINDOW):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.window = window
+        self.windows = {}                 # (logger, messaggio) → [inizio finestra, ammessi, soppressi]
+        self.lock = threading.Lock()      # i record arrivano anche dai thread di scrittura (storico, schede)
+
+    def filter(self, record):
+        if getattr(record, "sample", False):
+            if self.rate < 1 and random.random() >= self.rate:
+                return False
+            record.sample_rate = self.rate
+            return True
+        if record.levelno < logging.WARNING or not self.burst:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None or now - window[0] >= self.window:
+                suppressed = window[2] if window else 0
+                if len(self.windows) > 10_000:
+                    self.windows.clear()
+                self.windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class LocalQueueHandler(logging.handlers.QueueHandler):
+    """
+    Coda nello stesso processo: nel thread chiamante si risolve solo il messaggio (gli argomenti potrebbero
+    cambiare dopo); traceback e JSON li costruisce il thread del listener.
+    """
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def setup_logging(level=LOG_LEVEL, static=None, stream=None):
+    """
+    Configura il logger radice (anche i log di discord.py passano da qui) e avvia il thread di scrittura.
+    Ritorna il QueueListener: listener.stop() scrive i record ancora in coda (da chiamare all'uscita).
+    """
+    log_queue = queue.SimpleQueue()  # illimitata: put() non blocca mai
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter(static))
+    handler = LocalQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter())
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    return listener
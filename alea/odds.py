@@ -0,0 +1,120 @@
+"""
+Probabilità esatte (non simulate) dei Gradi di Successo per ALEA classico e ALEA99.
+Le tabelle di base sono calcolate al primo uso e poi tenute in cache.
+"""
+import functools
+from collections import OrderedDict
+
+from .dice import safe_malus
+from .thresholds import get_threshold_table
+
+# === Exact Odds (ALEA Classico) ===
+ROLL_OUTCOMES = 10000
+ODDS_CACHE_SIZE = 2048
+_ODDS_CACHE = OrderedDict()  # (profilo, generazione, VS, LD + malus) → probabilità; non tiene in vita le tabelle
+
+@functools.lru_cache(maxsize=None)
+def roll_distribution():
+    """
+    Distribuzione esatta di dice_roll prima di LD e malus, come conteggi su 10000 esiti equiprobabili.
+    Un primo tiro 6-95 pesa 100 (1/100); con Tiro Aperto ogni coppia (primo tiro, reroll) pesa 1 (1/10000).
+    """
+    distribution = {}
+    for primo_tiro in range(1, 101):
+        if 1 <= primo_tiro <= 5:
+            for reroll in range(1, 101):
+                distribution[primo_tiro - reroll] = distribution.get(primo_tiro - reroll, 0) + 1
+        elif 96 <= primo_tiro <= 100:
+            for reroll in range(1, 101):
+                distribution[primo_tiro + reroll] = distribution.get(primo_tiro + reroll, 0) + 1
+        else:
+            distribution[primo_tiro] = distribution.get(primo_tiro, 0) + 100
+    return tuple(sorted(distribution.items()))
+
+
+def _alea_odds(vs, shift, table):
+    key = (table.profile, table.generation, vs, shift)
+    odds = _ODDS_CACHE.get(key)
+    if odds is not None:
+        _ODDS_CACHE.move_to_end(key)
+        return odds
+    counts = [0] * len(table)
+    for value, weight in roll_distribution():
+        counts[table.classify(value + shift, vs)] += weight
+    odds = _ODDS_CACHE[key] = tuple(c / ROLL_OUTCOMES for c in counts)
+    if len(_ODDS_CACHE) > ODDS_CACHE_SIZE:
+        _ODDS_CACHE.popitem(last=False)  # le voci di tabelle sostituite escono per prime, non più lette
+    return odds
+
+
+def alea_odds(vs, ld=0, malus_stato=0, table=None):
+    """
+    Probabilità esatta di ogni Grado di Successo per /alea, nello stesso ordine delle etichette della tabella.
+    LD e malus spostano il tiro allo stesso modo, quindi la cache (LRU limitata) usa la loro somma
+    insieme a VS e a profilo e generazione della tabella di soglie.
+    """
+    table = get_threshold_table() if table is None else table
+    return _alea_odds(vs, ld + safe_malus(malus_stato), table)
+
+# === Exact Odds (ALEA99) ===
+ALEA99_DICE = range(2, 6)  # N = 2 + SPEC, SPEC 0-3
+
+def alea99_outcome_counts(n):
+    """
+    Numero di esiti (su 10^N) in cui i 2 più bassi di N d10 formano ogni risultato 00-99.
+    Per decina a < unità b: un solo dado vale a, gli altri N-1 sono >= b con almeno uno = b.
+    Per cifre identiche a = b: tutti i dadi >= a con almeno due = a.
+    """
+    counts = [0] * 100
+    for a in range(10):
+        for b in range(a, 10):
+            if a == b:
+                counts[a * 10 + b] = (10 - a) ** n - (9 - a) ** n - n * (9 - a) ** (n - 1)
+            else:
+                counts[a * 10 + b] = n * ((10 - b) ** (n - 1) - (9 - b) ** (n - 1))
+    return counts
+
+
+@functools.lru_cache(maxsize=None)
+def alea99_tables():
+    """
+    Tabelle cumulative per ogni N: conteggi di esiti <= risultato, separati per cifre identiche e diverse.
+    Calcolate una volta, rendono ogni probabilità ALEA99 una semplice lettura di tabella.
+    """
+    tables = {}
+    for n in ALEA99_DICE:
+        counts = alea99_outcome_counts(n)
+        cum_identical, cum_different = [], []
+        identical = different = 0
+        for value, count in enumerate(counts):
+            if value // 10 == value % 10:
+                identical += count
+            else:
+                different += count
+            cum_identical.append(identical)
+            cum_different.append(different)
+        tables[n] = (tuple(cum_identical), tuple(cum_different), 10 ** n)
+    return tables
+
+
+def alea99_odds(n, vs, ld=0):
+    """Probabilità esatte di SA, SP, FP, FC per un tiro ALEA99 con N dadi e VS_effettivo = VS + LD."""
+    cum_identical, cum_different, total = alea99_tables()[n]
+    vs_effective = vs + ld
+    if vs_effective < 0:
+        sa = sp = 0
+    else:
+        idx = min(vs_effective, 99)
+        sa, sp = cum_identical[idx], cum_different[idx]
+    return {
+        "SA": sa / total,
+        "SP": sp / total,
+        "FP": (cum_different[-1] - sp) / total,
+        "FC": (cum_identical[-1] - sa) / total,
+    }
+
+
+def warm_up():
+    """Precalcola le tabelle di base (chiamata all'avvio del bot, fuori dal percorso dei comandi)."""
+    roll_distribution()
+    alea99_tables()
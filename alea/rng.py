@@ -0,0 +1,116 @@
+"""
+Generatore dei dadi: pool di valori precalcolati e semi riproducibili per la modalità audit.
+Il pool è creato al primo tiro; NumPy viene importato solo con ALEA_RNG=numpy.
+"""
+import os
+import random
+import secrets
+import threading
+
+# === Dice RNG (buffered pool, audit mode) ===
+RNG_SOURCE = os.getenv("ALEA_RNG", "urandom").lower()        # "urandom" (os.urandom) o "numpy" (PCG64)
+RNG_AUDIT = os.getenv("ALEA_RNG_AUDIT", "0").lower() in ("1", "true", "yes")
+RNG_BLOCK = 4096                                             # valori generati per blocco e per tipo di dado
+# Intervalli con un buffer: quelli di ALEA/ALEA99 e i dadi comuni di /roll. Gli altri (fino a d1000000) si tirano
+# uno alla volta, così un dado insolito non crea un buffer permanente né un riempimento sincrono di 4096 valori.
+POOLED_RANGES = frozenset({(1, 100), (0, 9), (1, 10), (1, 20), (1, 4), (1, 6), (1, 8), (1, 12)})
+
+class DicePool:
+    """
+    Dadi serviti da buffer precalcolati, uno per intervallo di POOLED_RANGES (1-100, 0-9, ...).
+    Ogni buffer è riempito a blocchi da os.urandom (campionamento con rifiuto, senza bias) o da PCG64;
+    sotto un quarto del blocco un thread in background lo rabbocca, quindi un tiro è solo un list.pop().
+    """
+
+    def __init__(self, source=RNG_SOURCE, block=RNG_BLOCK, pooled=POOLED_RANGES):
+        self.source = source
+        self.block = block
+        self.pooled = pooled
+        self.low_water = block // 4
+        self._generator = None
+        if source == "numpy":
+            import numpy as np
+            self._generator = np.random.Generator(np.random.PCG64())
+        self._buffers = {}
+        self._refilling = set()
+        self._lock = threading.Lock()
+        self._draw_lock = threading.Lock()
+
+    def _draw(self, a, b, count):
+        span = b - a + 1
+        with self._draw_lock:
+            if self._generator is not None:
+                return self._generator.integers(a, b + 1, size=count).tolist()
+        if span > 256:
+            return [a + secrets.randbelow(span) for _ in range(count)]
+        # Un byte per valore: scarta i byte >= limit così ogni esito ha la stessa probabilità
+        limit = 256 - 256 % span
+        values = []
+        while len(values) < count:
+            values.extend([byte % span + a for byte in os.urandom(count) if byte < limit])
+        return values[:count]
+
+    def _refill(self, key, buf):
+        try:
+            buf.extend(self._draw(key[0], key[1], self.block))
+        finally:
+            with self._lock:
+                self._refilling.discard(key)
+
+    def randint(self, a, b):
+        """Intero uniforme in [a, b], come random.randint."""
+        key = (a, b)
+        buf = self._buffers.get(key)
+        if buf is None:
+            if key not in self.pooled:
+                return self._draw(a, b, 1)[0]
+            with self._lock:
+                buf = self._buffers.setdefault(key, [])
+        try:
+            value = buf.pop()
+        except IndexError:
+            # Buffer vuoto (primo uso o raffica più veloce del rabbocco): riempimento sincrono
+            buf.extend(self._draw(a, b, self.block))
+            value = buf.pop()
+        if len(buf) < self.low_water:
+            with self._lock:
+                if key in self._refilling:
+                    return value
+                self._refilling.add(key)
+            threading.Thread(target=self._refill, args=(key, buf), daemon=True).start()
+        return value
+
+DICE_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def dice_pool():
+    """Pool condiviso, creato al primo tiro."""
+    global DICE_POOL
+    if DICE_POOL is None:
+        with _POOL_LOCK:
+            if DICE_POOL is None:
+                DICE_POOL = DicePool()
+    return DICE_POOL
+
+
+def parse_seed(text):
+    """Seme esadecimale come mostrato nei footer e nei log di audit ('00ab12...'); None se non valido."""
+    try:
+        seed = int(str(text).strip().lower().removeprefix("0x"), 16)
+    except ValueError:
+        return None
+    return seed if 0 <= seed < 2 ** 64 else None
+
+
+def roll_rng(seed=None):
+    """
+    Generatore per un singolo tiro e il suo seme.
+    Con un seme (replay) o in modalità audit (ALEA_RNG_AUDIT=1, seme nuovo per ogni tiro) usa random.Random(seed),
+    così un tiro contestato si riproduce esattamente; altrimenti usa il pool condiviso (seme None).
+    """
+    if seed is None and not RNG_AUDIT:
+        return DICE_POOL or dice_pool(), None
+    if seed is None:
+        seed = secrets.randbits(64)
+    return random.Random(seed), seed
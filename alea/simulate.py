@@ -0,0 +1,110 @@
+"""
+Simulazioni Monte Carlo vettoriali (NumPy) per ALEA classico e ALEA99.
+NumPy viene importato alla prima simulazione, non all'import del modulo.
+"""
+from .dice import safe_malus
+from .thresholds import get_threshold_table
+
+# === Monte Carlo Simulation (NumPy) ===
+SIM_CHUNK = 1_000_000  # tiri per blocco vettoriale, limita la memoria per simulazioni molto grandi
+SIM_MAX_ROLLS = 5_000_000
+
+def simulation_rng(seed=None):
+    """Generatore PCG64 per una simulazione, ripetibile con lo stesso seme."""
+    import numpy as np
+    return np.random.Generator(np.random.PCG64(seed))
+
+
+def simulate_alea(vs, ld=0, malus_stato=0, rolls=100_000, table=None, rng=None, bins=10):
+    """
+    Simula `rolls` tiri ALEA classici come array NumPy: Tiro Aperto, LD, malus e classificazione
+    nei Gradi di Successo sono operazioni vettoriali, senza una chiamata Python per tiro.
+    `table` (ThresholdTable) permette di provare profili di soglie diversi da quello caricato.
+    Ritorna conteggi per grado (ordine delle etichette), istogramma del Tiro Manovra e statistiche.
+    L'istogramma ha confini interi fissi sull'intervallo possibile del Tiro Manovra, così ogni blocco
+    somma i suoi conteggi e nessun array di risultati sopravvive al proprio blocco.
+    """
+    import numpy as np
+
+    rng = rng if rng is not None else np.random.default_rng()
+    table = get_threshold_table() if table is None else table
+    boundaries = np.array(table.boundaries(vs))
+    shift = ld + safe_malus(malus_stato)
+
+    # Tiro Manovra da 1-100 (Tiro Aperto basso) a 100+100 (Tiro Aperto alto), più LD e malus
+    lowest, highest = -99 + shift, 200 + shift
+    width = -(-(highest - lowest + 1) // bins)
+    edges = lowest + width * np.arange(bins + 1)
+    grade_counts = np.zeros(len(table), dtype=np.int64)
+    hist_counts = np.zeros(bins, dtype=np.int64)
+    total = 0
+    tiri_aperti = 0
+    remaining = rolls
+    while remaining > 0:
+        size = min(remaining, SIM_CHUNK)
+        primo_tiro = rng.integers(1, 101, size=size)
+        reroll = rng.integers(1, 101, size=size)
+        low = primo_tiro <= 5
+        high = primo_tiro >= 96
+        final = primo_tiro + np.where(high, reroll, 0) - np.where(low, reroll, 0) + shift
+        # Primo confine >= tiro (stessa regola di /alea: final <= boundary), oltre tutti → ultimo grado
+        label_index = np.minimum(np.searchsorted(boundaries, final, side="left"), len(table) - 1)
+        grade_counts += np.bincount(label_index, minlength=len(table))
+        tiri_aperti += int(np.count_nonzero(low | high))
+        hist_counts += np.histogram(final, bins=edges)[0]
+        total += int(final.sum())
+        remaining -= size
+
+    return {
+        "Tiri": rolls,
+        "Gradi": grade_counts.tolist(),
+        "Tiri Aperti": tiri_aperti,
+        "Media Tiro Manovra": total / rolls if rolls else 0.0,
+        "Istogramma": [(int(edges[i]), int(edges[i + 1]) - 1, int(c)) for i, c in enumerate(hist_counts)],
+    }
+
+
+def simulate_alea99(n, vs, ld=0, rolls=100_000, rng=None):
+    """
+    Simula `rolls` tiri ALEA99 con N d10 come matrice NumPy; i 2 più bassi sono estratti con np.partition.
+    Ritorna conteggi SA/SP/FP/FC e l'istogramma dei risultati per decina (00-09, 10-19, ...).
+    """
+    import numpy as np
+
+    rng = rng if rng is not None else np.random.default_rng()
+    vs_effective = vs + ld
+
+    grades = {"SA": 0, "SP": 0, "FP": 0, "FC": 0}
+    values_hist = np.zeros(100, dtype=np.int64)
+    remaining = rolls
+    while remaining > 0:
+        size = min(remaining, SIM_CHUNK)
+        dice = rng.integers(0, 10, size=(size, n), dtype=np.int8)
+        two_lowest = np.partition(dice, 1, axis=1)[:, :2].astype(np.int64)
+        value = two_lowest[:, 0] * 10 + two_lowest[:, 1]
+        identical = two_lowest[:, 0] == two_lowest[:, 1]
+        success = value <= vs_effective
+
+        grades["SA"] += int(np.count_nonzero(identical & success))
+        grades["SP"] += int(np.count_nonzero(~identical & success))
+        grades["FP"] += int(np.count_nonzero(~identical & ~success))
+        grades["FC"] += int(np.count_nonzero(identical & ~success))
+        values_hist += np.bincount(value, minlength=100)
+        remaining -= size
+
+    decades = values_hist.reshape(10, 10).sum(axis=1)
+    return {
+        "Tiri": rolls,
+        "Gradi": grades,
+        "Istogramma": [(d * 10, d * 10 + 9, int(c)) for d, c in enumerate(decades)],
+    }
+
+
+def format_histogram(histogram, total, width=20):
+    """Istogramma testuale compatto per un blocco di codice Discord."""
+    peak = max((c for _, _, c in histogram), default=0) or 1
+    lines = []
+    for low, high, count in histogram:
+        bar = "█" * int(round(count / peak * width))
+        lines.append(f"{low:>5}..{high:<5} {bar} {count / max(1, total) * 100:.1f}%")
+    return "\n".join(lines)
@@ -0,0 +1,219 @@
+"""
+Statistiche dei tiri aggiornate in modo incrementale, per utente, per server e per sistema (alea/alea99).
+Ogni tiro aggiorna contatori in memoria in O(numero di gradi); leggere la fortuna di un giocatore è una lettura di dict.
+I contatori modificati vengono salvati periodicamente (checkpoint) nello stesso database dello storico.
+Con più processi (cluster.py) ogni worker salva le proprie righe (colonna cluster): i contatori sono somme,
+quindi quelli di un utente che tira su server di worker diversi si ricompongono sommandoli (merged()).
+"""
+import os
+import json
+import math
+import logging
+import sqlite3
+
+from .history import HISTORY_DB
+
+log = logging.getLogger(__name__)
+
+# === Incremental Roll Statistics ===
+STATS_CHECKPOINT_INTERVAL = float(os.getenv("ALEA_STATS_CHECKPOINT_INTERVAL", "60"))
+STATS_SCOPES = ("user", "guild")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS roll_stats (
+    scope TEXT NOT NULL,           -- 'user' o 'guild'
+    id INTEGER NOT NULL,
+    system TEXT NOT NULL,          -- 'alea' o 'alea99'
+    cluster INTEGER NOT NULL DEFAULT 0,  -- worker che ha scritto la riga (0 senza cluster)
+    data TEXT NOT NULL,            -- Tally in JSON
+    PRIMARY KEY (scope, id, system, cluster)
+);
+"""
+
+# Database creati prima del deploy shardato: la chiave primaria cambia, quindi la tabella va ricostruita
+MIGRATE_CLUSTER = """
+ALTER TABLE roll_stats RENAME TO roll_stats_old;
+""" + SCHEMA + """
+INSERT INTO roll_stats (scope, id, system, cluster, data) SELECT scope, id, system, 0, data FROM roll_stats_old;
+DROP TABLE roll_stats_old;
+"""
+
+
+class Tally:
+    """
+    Contatori di un utente o server per un sistema: tiri per grado, probabilità attese per grado
+    (somma delle probabilità esatte di ogni tiro), Tiri Aperti, somma dei risultati e successi osservati/attesi.
+    La fortuna è lo scarto dei successi dall'atteso in deviazioni standard (somma delle varianze p(1-p)).
+    """
+    __slots__ = ("rolls", "grades", "expected", "tiri_aperti", "final_sum", "successes", "expected_successes", "variance")
+
+    def __init__(self):
+        self.rolls = 0
+        self.grades = {}
+        self.expected = {}
+        self.tiri_aperti = 0
+        self.final_sum = 0
+        self.successes = 0
+        self.expected_successes = 0.0
+        self.variance = 0.0
+
+    def add(self, grade, odds, success, p_success, final, tiro_aperto=False):
+        self.rolls += 1
+        self.grades[grade] = self.grades.get(grade, 0) + 1
+        for name, p in odds.items():
+            self.expected[name] = self.expected.get(name, 0.0) + p
+        self.tiri_aperti += bool(tiro_aperto)
+        self.final_sum += final
+        self.successes += bool(success)
+        self.expected_successes += p_success
+        self.variance += p_success * (1 - p_success)
+
+    def merge(self, other):
+        """Somma i contatori di `other` (stesso utente o server, scritti da un altro worker)."""
+        self.rolls += other.rolls
+        for name, count in other.grades.items():
+            self.grades[name] = self.grades.get(name, 0) + count
+        for name, p in other.expected.items():
+            self.expected[name] = self.expected.get(name, 0.0) + p
+        self.tiri_aperti += other.tiri_aperti
+        self.final_sum += other.final_sum
+        self.successes += other.successes
+        self.expected_successes += other.expected_successes
+        self.variance += other.variance
+        return self
+
+    def mean_final(self):
+        return self.final_sum / self.rolls if self.rolls else 0.0
+
+    def luck(self):
+        """Successi osservati meno attesi, in deviazioni standard (0 senza tiri o con esiti certi)."""
+        return (self.successes - self.expected_successes) / math.sqrt(self.variance) if self.variance > 0 else 0.0
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        tally = cls()
+        for name in cls.__slots__:
+            if name in data:
+                setattr(tally, name, data[name])
+        return tally
+
+
+class RollStats:
+    """
+    Tally per (scope, id, sistema). add() e get() vanno chiamati dall'event loop;
+    load(), write() e merged() sono bloccanti e girano in un thread (all'avvio, a ogni checkpoint, su richiesta).
+    `cluster` identifica il worker: ognuno carica e salva solo le proprie righe.
+    """
+
+    def __init__(self, path=HISTORY_DB, cluster=0):
+        self.path = path
+        self.cluster = cluster
+        self.tallies = {}
+        self.dirty = set()
+
+    def add(self, user_id, guild_id, system, **roll):
+        for key in (("user", user_id, system), ("guild", guild_id, system)):
+            if key[1] is None:
+                continue
+            tally = self.tallies.get(key)
+            if tally is None:
+                tally = self.tallies[key] = Tally()
+            tally.add(**roll)
+            self.dirty.add(key)
+
+    def get(self, scope, id, system):
+        return self.tallies.get((scope, id, system))
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def merged(self, scope, id, system):
+        """Tally di questo worker sommato alle ultime righe salvate dagli altri (None se nessuno ha tiri)."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT data FROM roll_stats WHERE scope = ? AND id = ? AND system = ? AND cluster != ?",
+                (scope, id, system, self.cluster),
+            ).fetchall()
+        finally:
+            conn.close()
+        local = self.tallies.get((scope, id, system))
+        if not rows:
+            return local
+        tally = Tally.from_dict(local.to_dict()) if local is not None else Tally()
+        for (data,) in rows:
+            tally.merge(Tally.from_dict(json.loads(data)))
+        return tally
+
+    def _create_schema(self, conn):
+        conn.isolation_level = None
+        # IMMEDIATE: i worker che partono insieme creano o migrano la tabella uno alla volta
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(roll_stats)")}
+            script = MIGRATE_CLUSTER if columns and "cluster" not in columns else SCHEMA
+            for statement in script.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.isolation_level = ""
+
+    def load(self):
+        """Legge l'ultimo checkpoint di questo worker (crea o aggiorna la tabella se serve)."""
+        conn = self._connect()
+        try:
+            self._create_schema(conn)
+            for scope, id, system, data in conn.execute(
+                "SELECT scope, id, system, data FROM roll_stats WHERE cluster = ?", (self.cluster,)
+            ):
+                self.tallies[(scope, id, system)] = Tally.from_dict(json.loads(data))
+        finally:
+            conn.close()
+        return len(self.tallies)
+
+    def checkpoint_rows(self):
+        """Righe dei contatori modificati dall'ultimo checkpoint (da chiamare sull'event loop)."""
+        rows = [(*key, self.cluster, json.dumps(self.tallies[key].to_dict())) for key in self.dirty]
+        self.dirty = set()
+        return rows
+
+    def write(self, rows):
+        """Upsert dei contatori in una transazione."""
+        if not rows:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO roll_stats (scope, id, system, cluster, data) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (scope, id, system, cluster) DO UPDATE SET data = excluded.data", rows
+                )
+        finally:
+            conn.close()
+
+    def checkpoint(self):
+        """Checkpoint sincrono (all'uscita, quando l'event loop è fermo)."""
+        self.write(self.checkpoint_rows())
+
+
+async def checkpoint_stats(stats, interval=STATS_CHECKPOINT_INTERVAL):
+    """Salva periodicamente i contatori modificati in un thread; se la scrittura fallisce li riprova al giro dopo."""
+    import asyncio
+
+    while True:
+        await asyncio.sleep(interval)
+        rows = stats.checkpoint_rows()
+        try:
+            await asyncio.to_thread(stats.write, rows)
+        except Exception:
+            stats.dirty.update(row[:3] for row in rows)
+            log.exception("Errore nel checkpoint delle statistiche (%d righe riprovate al giro dopo)", len(rows))
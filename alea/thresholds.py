@@ -0,0 +1,389 @@
+"""
+Gradi di Successo: lettura di thresholds.csv, tabella compilata e profili per server con ricarica a caldo.
+I profili non vengono letti all'import: load_profiles() li carica all'avvio del bot, altrimenti al primo uso.
+"""
+import os
+import re
+import csv
+import json
+import bisect
+import logging
+import itertools
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+try:
+    import fcntl  # lock del file delle preferenze dei server tra worker (solo POSIX)
+except ImportError:
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+# === Load Degrees of Success from CSV ===
+def load_thresholds(path="thresholds.csv"):
+    thresholds = []
+    success_labels = []
+    success_acronyms = []
+
+    with open(path, newline='', encoding='utf-8') as csvfile:
+        reader = csv.reader(csvfile)
+        for row in reader:
+            # Skip empty rows or rows with insufficient columns
+            if not row or len(row) < 3:
+                continue
+
+            first = row[0].strip()
+            # Try parsing the threshold as an integer (allow floats too)
+            try:
+                val = int(first)
+            except ValueError:
+                try:
+                    val = int(float(first))
+                except (OverflowError, ValueError):
+                    log.warning("Riga di soglie ignorata in %s: %r non è un numero", path, first)
+                    continue
+
+            # Normalize and cap sentinel: do not accept negative values
+            if val < 0:
+                continue
+
+            if val > 999:
+                val = 999
+
+            thresholds.append(float(val) / 100)
+            success_labels.append(row[1].strip())
+            success_acronyms.append(row[2].strip())
+
+            # If sentinel 999 found, stop parsing further rows
+            if val == 999:
+                break
+
+    return thresholds, success_labels, success_acronyms
+
+# === Compiled Threshold Table ===
+TABLE_CACHE_SIZE = 4096                 # VS memorizzati (LRU) per tabella e per tipo di valore
+_GENERATIONS = itertools.count(1)       # ogni tabella compilata ha la sua generazione (chiave delle cache esterne)
+
+@dataclass(frozen=True, eq=False)
+class ThresholdTable:
+    """
+    Tabella immutabile dei Gradi di Successo, ordinata per soglia crescente.
+    Confini numerici, intervalli e righe verbose per VS sono calcolati una volta e memorizzati nella tabella
+    stessa, quindi vengono liberati con lei quando una ricarica la sostituisce; la classificazione usa bisect
+    sui confini invece di una scansione lineare. `profile` e `generation` identificano la tabella nelle cache
+    esterne (es. alea.odds) senza tenerla in vita.
+    """
+    thresholds: tuple
+    labels: tuple
+    acronyms: tuple
+    profile: str = "default"
+    generation: int = field(default_factory=lambda: next(_GENERATIONS))
+    _memo: dict = field(default_factory=dict, init=False, repr=False)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _cached(self, kind, vs, compute):
+        cache = self._memo.get(kind)
+        if cache is None:
+            cache = self._memo.setdefault(kind, OrderedDict())
+        value = cache.get(vs)
+        if value is not None:
+            try:
+                cache.move_to_end(vs)
+            except KeyError:  # appena espulso da /alea-sim, che legge i confini da un thread
+                pass
+            return value
+        value = cache[vs] = compute(vs)
+        if len(cache) > TABLE_CACHE_SIZE:
+            cache.popitem(last=False)  # esce il VS usato meno di recente, quelli frequenti restano
+        return value
+
+    def boundaries(self, vs):
+        """Confini numerici per un VS (esclude la soglia sentinella finale)."""
+        return self._cached("boundaries", vs, self._boundaries)
+
+    def _boundaries(self, vs):
+        numeric_thresholds = self.thresholds[:-1] if len(self.thresholds) > 1 else self.thresholds
+        return tuple(round(vs * t) for t in numeric_thresholds)
+
+    def classify(self, final_value, vs):
+        """Indice del grado: primo confine >= Tiro Manovra; oltre tutti i confini → ultimo grado."""
+        return min(bisect.bisect_left(self.boundaries(vs), final_value), len(self.labels) - 1)
+
+    def range_texts(self, vs):
+        """Intervallo di ogni grado con estremi aperti per il primo e l'ultimo."""
+        return self._cached("range_texts", vs, self._range_texts)
+
+    def _range_texts(self, vs):
+        boundaries = self.boundaries(vs)
+        if len(boundaries) == 0:
+            return tuple(f"[1 - {vs}]" for _ in self.labels)
+        texts = []
+        for label_i in range(len(self.labels)):
+            if label_i == 0:
+                # First label: everything below first boundary (open lower)
+                texts.append(f"[meno di {boundaries[0]}]")
+            elif label_i == len(self.labels) - 1:
+                # Last label (Fallimento Critico): anything above the last numeric boundary
+                texts.append(f"[più di {boundaries[-1]}]")
+            else:
+                # Middle labels: closed interval
+                texts.append(f"[{boundaries[label_i-1] + 1} - {boundaries[label_i]}]")
+        return tuple(texts)
+
+    def verbose_lines(self, vs):
+        """Righe del riepilogo verbose (senza segno di spunta né probabilità) per un VS."""
+        return self._cached("verbose_lines", vs, self._verbose_lines)
+
+    def _verbose_lines(self, vs):
+        return tuple(f"**{label}** {rtext}" for label, rtext in zip(self.labels, self.range_texts(vs)))
+
+
+def compile_thresholds(thresholds, success_labels, success_acronyms, profile="default"):
+    """Compila le liste lette da thresholds.csv in una ThresholdTable ordinata per soglia."""
+    rows = sorted(zip(thresholds, success_labels, success_acronyms), key=lambda row: row[0])
+    return ThresholdTable(
+        thresholds=tuple(row[0] for row in rows),
+        labels=tuple(row[1] for row in rows),
+        acronyms=tuple(row[2] for row in rows),
+        profile=profile,
+    )
+
+# === Threshold Profiles (hot reload, per guild) ===
+THRESHOLDS_FILE = "thresholds.csv"                 # profilo "default"
+THRESHOLD_PROFILES_DIR = "thresholds"              # profili aggiuntivi: thresholds/<nome>.csv
+GUILD_PROFILES_FILE = "guild_profiles.json"        # profilo scelto da ogni server
+DEFAULT_PROFILE = "default"
+THRESHOLD_WATCH_INTERVAL = float(os.getenv("ALEA_THRESHOLDS_WATCH_INTERVAL", "5"))
+PROFILE_NAME_RE = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+
+def threshold_sources():
+    """Mappa nome profilo → file CSV."""
+    sources = {DEFAULT_PROFILE: THRESHOLDS_FILE}
+    if os.path.isdir(THRESHOLD_PROFILES_DIR):
+        for filename in sorted(os.listdir(THRESHOLD_PROFILES_DIR)):
+            name, ext = os.path.splitext(filename)
+            if ext.lower() == ".csv" and PROFILE_NAME_RE.match(name) and name != DEFAULT_PROFILE:
+                sources[name] = os.path.join(THRESHOLD_PROFILES_DIR, filename)
+    return sources
+
+
+def threshold_mtimes():
+    """Firma dei file di soglie (mtime in ns, None se mancante) per rilevare modifiche."""
+    mtimes = {}
+    for name, path in threshold_sources().items():
+        try:
+            mtimes[name] = os.stat(path).st_mtime_ns
+        except OSError:
+            mtimes[name] = None
+    return mtimes
+
+
+def load_threshold_profiles(previous=None):
+    """
+    Carica tutti i profili di soglie in un nuovo dict di ThresholdTable.
+    Un profilo illeggibile o vuoto mantiene la versione precedente (se esiste), così un CSV
+    salvato a metà non rompe i tiri; all'avvio il profilo default deve essere valido.
+    """
+    previous = previous or {}
+    profiles = {}
+    for name, path in threshold_sources().items():
+        try:
+            table = compile_thresholds(*load_thresholds(path), profile=name)
+            if len(table) == 0:
+                raise ValueError("nessun livello di successo valido")
+            profiles[name] = table
+        except Exception:
+            log.exception("Errore nel caricamento del profilo soglie '%s' (%s)", name, path)
+            if name in previous:
+                profiles[name] = previous[name]
+    if DEFAULT_PROFILE not in profiles:
+        raise RuntimeError(f"Profilo soglie '{DEFAULT_PROFILE}' non disponibile ({THRESHOLDS_FILE})")
+    return profiles
+
+
+def load_guild_profiles():
+    """Profilo scelto per ogni server (guild id come stringa → nome profilo)."""
+    try:
+        with open(GUILD_PROFILES_FILE, encoding='utf-8') as f:
+            data = json.load(f)
+        return {str(k): str(v) for k, v in data.items()}
+    except FileNotFoundError:
+        return {}
+    except Exception:
+        log.exception("Errore nella lettura di %s", GUILD_PROFILES_FILE)
+        return {}
+
+
+def save_guild_profiles(guild_profiles):
+    """Scrittura atomica (file temporaneo + rename) delle preferenze dei server."""
+    tmp_path = GUILD_PROFILES_FILE + ".tmp"
+    with open(tmp_path, "w", encoding='utf-8') as f:
+        json.dump(guild_profiles, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, GUILD_PROFILES_FILE)
+
+
+# I dict vengono sostituiti interamente (mai modificati sul posto): ogni tiro legge
+# la sua tabella una sola volta e non vede mai una ricarica a metà.
+# None finché load_profiles() non viene chiamata (all'avvio del bot o al primo tiro).
+THRESHOLD_MTIMES = None
+THRESHOLD_PROFILES = None
+GUILD_PROFILES = None
+
+
+def load_profiles():
+    """Legge profili di soglie e preferenze dei server; ritorna i profili caricati."""
+    global THRESHOLD_MTIMES, THRESHOLD_PROFILES, GUILD_PROFILES
+    mtimes = threshold_mtimes()
+    profiles = load_threshold_profiles()
+    GUILD_PROFILES = load_guild_profiles()
+    THRESHOLD_MTIMES, THRESHOLD_PROFILES = mtimes, profiles
+    return profiles
+
+
+def threshold_profiles():
+    """Profili di soglie attivi (nome → ThresholdTable), caricati al primo accesso."""
+    profiles = THRESHOLD_PROFILES
+    return profiles if profiles is not None else load_profiles()
+
+
+def guild_profile_name(guild_id):
+    """Nome del profilo scelto dal server (default se non impostato)."""
+    threshold_profiles()
+    return GUILD_PROFILES.get(str(guild_id), DEFAULT_PROFILE)
+
+
+def set_guild_profile(guild_id, name):
+    """Imposta il profilo del server sostituendo il dict in blocco; ritorna il nuovo dict da salvare."""
+    global GUILD_PROFILES
+    threshold_profiles()
+    updated = dict(GUILD_PROFILES)
+    if name == DEFAULT_PROFILE:
+        updated.pop(str(guild_id), None)
+    else:
+        updated[str(guild_id)] = name
+    GUILD_PROFILES = updated
+    return updated
+
+
+def update_guild_profile(guild_id, name):
+    """
+    Imposta e salva il profilo del server rileggendo il file sotto lock: con più worker (cluster.py)
+    ognuno modifica solo i propri server e nessuno sovrascrive le scelte degli altri.
+    Bloccante (lettura e scrittura su disco): dal bot va chiamata con asyncio.to_thread.
+    """
+    global GUILD_PROFILES
+    threshold_profiles()
+    with open(GUILD_PROFILES_FILE + ".lock", "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        updated = load_guild_profiles()  # il file, non la copia in memoria, è la versione di riferimento
+        if name == DEFAULT_PROFILE:
+            updated.pop(str(guild_id), None)
+        else:
+            updated[str(guild_id)] = name
+        save_guild_profiles(updated)
+    GUILD_PROFILES = updated
+    return updated
+
+
+def get_threshold_table(guild_id=None):
+    """Tabella del profilo scelto dal server, o quella default."""
+    profiles = threshold_profiles()
+    name = GUILD_PROFILES.get(str(guild_id), DEFAULT_PROFILE) if guild_id is not None else DEFAULT_PROFILE
+    return profiles.get(name) or profiles[DEFAULT_PROFILE]
+
+
+def reload_thresholds_if_changed():
+    """Ricarica i profili se un CSV è cambiato; ritorna True se la tabella è stata sostituita."""
+    global THRESHOLD_PROFILES, THRESHOLD_MTIMES
+    if THRESHOLD_PROFILES is None:
+        load_profiles()
+        return True
+    mtimes = threshold_mtimes()
+    if mtimes == THRESHOLD_MTIMES:
+        return False
+    THRESHOLD_PROFILES = load_threshold_profiles(THRESHOLD_PROFILES)
+    THRESHOLD_MTIMES = mtimes
+    log.info("Soglie ricaricate: %s", ", ".join(sorted(THRESHOLD_PROFILES)))
+    return True
+
+
+async def watch_thresholds(interval=THRESHOLD_WATCH_INTERVAL, on_reload=None):
+    """
+    Controlla periodicamente i CSV e ricarica le soglie in un thread, senza riavviare il bot.
+    `on_reload` (opzionale) viene chiamata dopo ogni ricarica, es. per ricostruire gli embed di aiuto.
+    """
+    import asyncio
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if await asyncio.to_thread(reload_thresholds_if_changed) and on_reload is not None:
+                on_reload()
+        except Exception:
+            log.exception("Errore nella ricarica delle soglie")
+
+# === Format Success Levels with Dynamic Intervals ===
+def format_success_levels(table=None):
+    """
+    Genera la sezione Gradi di Successo dal profilo di soglie con intervalli dinamici.
+    Divide i livelli in Successi (S) e Fallimenti (F) con VS (100%) come spartiacque.
+    """
+    table = get_threshold_table() if table is None else table
+    thresholds, labels = table.thresholds, table.labels
+    if not thresholds or len(thresholds) == 0:
+        return "Nessun livello di successo configurato."
+
+    # Separa successi (threshold <= 1.0, incluso il confine VS=100%) e fallimenti (threshold > 1.0)
+    successi = [(thresholds[i], labels[i]) for i in range(len(thresholds)) if thresholds[i] <= 1.0]
+    fallimenti = [(thresholds[i], labels[i]) for i in range(len(thresholds)) if thresholds[i] > 1.0]
+
+    lines = []
+    lines.append(f"La configurazione attuale utilizza {len(thresholds)} livelli di successo:\n")
+
+    # Aggiungi i successi (da S_n a S1, da più raro a meno raro)
+    for idx, (threshold, label) in enumerate(successi):
+        level_num = len(successi) - idx  # S_n, S_(n-1), ..., S1
+        emoji = "🟢"
+
+        if idx == 0:
+            # Primo successo (più raro): da 0% al primo threshold
+            interval = f"[meno di {threshold*100:.0f}%]"
+        else:
+            # Successi intermedi: tra due threshold
+            prev_threshold = successi[idx-1][0]
+            interval = f"[{prev_threshold*100:.0f}% - {threshold*100:.0f}%]"
+
+        lines.append(f"{emoji} S{level_num} {interval} {label}")
+
+    # Aggiungi i fallimenti (da F1 a F_m, da meno raro a più raro)
+    for idx, (threshold, label) in enumerate(fallimenti):
+        level_num = idx + 1  # F1, F2, F3, ...
+
+        # Emoji: rossa per fallimenti, nera per fallimento critico (ultimo)
+        if idx == len(fallimenti) - 1:
+            emoji = "⚫"
+        else:
+            emoji = "🔴"
+
+        if idx == 0:
+            # Primo fallimento: dal confine (ultimo successo o 0%) al primo fallimento
+            if len(successi) > 0:
+                prev_threshold = successi[-1][0]
+                interval = f"[{prev_threshold*100:.0f}% - {threshold*100:.0f}%]"
+            else:
+                interval = f"[0% - {threshold*100:.0f}%]"
+        elif idx == len(fallimenti) - 1:
+            # Ultimo fallimento (critico): oltre il precedente
+            prev_threshold = fallimenti[idx-1][0]
+            interval = f"[più di {prev_threshold*100:.0f}%]"
+        else:
+            # Fallimenti intermedi: tra due threshold
+            prev_threshold = fallimenti[idx-1][0]
+            interval = f"[{prev_threshold*100:.0f}% - {threshold*100:.0f}%]"
+
+        lines.append(f"{emoji} F{level_num} {interval} {label}")
+
+    return "\n".join(lines)
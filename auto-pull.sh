@@ -0,0 +1,35 @@
+#!/bin/bash
+# Auto-pull da GitHub (cron, ogni 5 minuti): applica gli aggiornamenti con il minimo disturbo.
+#   - solo extensions/: systemctl reload → SIGHUP, i comandi vengono ricaricati senza chiudere la sessione gateway
+#   - nucleo (main.py, core.py, cluster.py, alea/, requirements.txt): riavvio completo del servizio
+#   - thresholds.csv e profili: niente, il bot li ricarica da solo; README, benchmark: niente
+# Uso (crontab di root): */5 * * * * /home/deploy/alea-dice-bot/auto-pull.sh >> /var/log/alea-auto-pull.log 2>&1
+set -e
+
+REPO="${ALEA_REPO:-/home/deploy/alea-dice-bot}"
+SERVICE="${ALEA_SERVICE:-alea-bot.service}"
+cd "$REPO"
+
+OLD=$(sudo -u deploy git rev-parse HEAD)
+sudo -u deploy git pull -q origin main
+NEW=$(sudo -u deploy git rev-parse HEAD)
+if [ "$OLD" = "$NEW" ]; then
+    exit 0
+fi
+
+CHANGED=$(sudo -u deploy git diff --name-only "$OLD" "$NEW")
+CORE=$(echo "$CHANGED" | grep -E '\.py$|^requirements\.txt$' | grep -vE '^(extensions|benchmarks)/' || true)
+EXTENSIONS=$(echo "$CHANGED" | grep -E '^extensions/' || true)
+
+if [ -n "$CORE" ]; then
+    if echo "$CHANGED" | grep -q '^requirements\.txt$'; then
+        sudo -u deploy pip install -r requirements.txt -q
+    fi
+    echo "$(date -Is) ${OLD:0:7}..${NEW:0:7}: nucleo modificato ($(echo $CORE)), riavvio"
+    systemctl restart "$SERVICE"
+elif [ -n "$EXTENSIONS" ]; then
+    echo "$(date -Is) ${OLD:0:7}..${NEW:0:7}: ricarica delle estensioni ($(echo $EXTENSIONS))"
+    systemctl reload "$SERVICE"
+else
+    echo "$(date -Is) ${OLD:0:7}..${NEW:0:7}: nessun riavvio necessario"
+fi
@@ -0,0 +1,243 @@
+"""
+Micro-benchmark offline: costo per chiamata e throughput di tiri, gradi e costruzione degli embed.
+
+Misura le funzioni del nucleo (dice_roll, dice_roll_alea99, parse_ld, format_success_levels, roll_expression)
+e il percorso completo degli handler /alea, /alea99, /roll e /embed-test, guidati da una Interaction finta senza rete.
+I risultati sono JSON, confrontabili tra versioni per trovare regressioni.
+
+Uso (dalla radice del repository):
+    python benchmarks/bench.py                          # JSON su stdout
+    python benchmarks/bench.py --output bench.json      # JSON su file
+    python benchmarks/bench.py --compare vecchio.json   # confronto, exit 1 se qualcosa rallenta
+    python benchmarks/bench.py --quick --only alea99    # meno iterazioni, solo i casi che contengono "alea99"
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # thresholds.csv e i profili sono relativi alla radice, come per il servizio systemd
+# Costo per chiamata, non throughput per canale: senza scheduler le chiamate in serie non aspettano i token
+os.environ.setdefault("ALEA_SEND_RATE", "0")
+
+
+# === Fake Discord Interaction ===
+class FakeResponse:
+    """interaction.response: defer/send_message senza rete; il payload viene serializzato come farebbe discord.py."""
+
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.done = False
+
+    def is_done(self):
+        return self.done
+
+    async def defer(self, **kwargs):
+        self.done = True
+        self.interaction.deferred = True
+
+    async def send_message(self, content=None, **kwargs):
+        self.done = True
+        self.interaction.capture(content, kwargs)
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        self.interaction.capture(content, kwargs)
+
+
+class FakeInteraction:
+    """Il minimo di discord.Interaction usato dagli handler: utente, canale, guild_id, data, created_at, extras, response e followup."""
+
+    def __init__(self, options=None, guild_id=None):
+        import discord
+
+        self.user = types.SimpleNamespace(id=1, display_name="bench")
+        self.channel_id = 1
+        self.guild_id = guild_id
+        self.data = {"options": [{"name": k, "value": v} for k, v in (options or {}).items()]}
+        self.created_at = discord.utils.utcnow()
+        self.extras = {}
+        self.deferred = False
+        self.sent = []
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+    def capture(self, content, kwargs):
+        if content is not None:
+            # Gli handler rispondono con testo solo per gli errori: il caso misurato sarebbe sbagliato
+            raise RuntimeError(f"risposta di errore dall'handler: {content}")
+        embeds = kwargs.get("embeds") or [kwargs["embed"]]
+        self.sent.append([embed.to_dict() for embed in embeds])
+
+
+# === Measurement ===
+def measure(fn, number, repeat):
+    """Tempo per chiamata (ns) su `repeat` serie di `number` chiamate; best e mediana delle serie."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter_ns() - start) / number)
+    return summarize(runs, number, repeat)
+
+
+def measure_async(loop, coro_fn, number, repeat):
+    """Come measure(), ma ogni chiamata è una coroutine attesa sullo stesso event loop."""
+    async def series():
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            await coro_fn()
+        return (time.perf_counter_ns() - start) / number
+
+    runs = [loop.run_until_complete(series()) for _ in range(repeat)]
+    return summarize(runs, number, repeat)
+
+
+def summarize(runs, number, repeat):
+    best = min(runs)
+    return {
+        "calls": number,
+        "repeat": repeat,
+        "best_ns": round(best, 1),
+        "median_ns": round(statistics.median(runs), 1),
+        "ops_per_s": round(1e9 / best, 1) if best else None,
+    }
+
+
+# === Cases ===
+def core_cases():
+    from alea.dice import dice_roll, dice_roll_alea99, parse_ld
+    from alea.expr import roll_expression
+    from alea.thresholds import format_success_levels, get_threshold_table
+
+    table = get_threshold_table()
+    return {
+        "dice_roll": lambda: dice_roll(60, 20, 0, table=table),
+        "dice_roll_no_label": lambda: dice_roll(60, 20, 0, compute_label=False),
+        "dice_roll_alea99_3d10": lambda: dice_roll_alea99(3, 50, 0),
+        "dice_roll_alea99_5d10": lambda: dice_roll_alea99(5, 50, 20),
+        "parse_ld_numeric": lambda: parse_ld("-40"),
+        "parse_ld_narrative": lambda: parse_ld("Difficilissima"),
+        "parse_ld_invalid": lambda: parse_ld("xyz"),
+        "format_success_levels": lambda: format_success_levels(table),
+        "roll_expression_4d6kh3": lambda: roll_expression("4d6kh3+2"),
+        "roll_expression_6d10kl2": lambda: roll_expression("6d10kl2"),
+    }
+
+
+def handler_cases():
+    from extensions import alea99, alea_classic, embed_test, roll
+
+    def handler(command, **options):
+        async def call():
+            interaction = FakeInteraction(options)
+            await command.callback(interaction, **options)
+        return call
+
+    return {
+        "handler_alea": handler(alea_classic.alea, vs=60, ld=20),
+        "handler_alea_verbose": handler(alea_classic.alea, vs=60, ld=20, verbose=True),
+        "handler_alea_batch20": handler(alea_classic.alea, vs=55, ld=20, tiri=20),
+        "handler_alea99": handler(alea99.alea99, vs=50, spec=2, ld="D"),
+        "handler_alea99_verbose": handler(alea99.alea99, vs=50, spec=2, ld="D", verbose=True),
+        "handler_embed_test": handler(embed_test.embed_test, vs=50, verbose=True),
+        "handler_roll": handler(roll.roll, espressione="4d6kh3+2"),
+    }
+
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=ROOT).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "rng_source": os.getenv("ALEA_RNG", "urandom"),
+        "rng_audit": os.getenv("ALEA_RNG_AUDIT", "0"),
+    }
+
+
+def run(quick=False, only=None):
+    core_number, handler_number, repeat = (2_000, 200, 3) if quick else (20_000, 2_000, 5)
+    results = {}
+
+    for name, fn in core_cases().items():
+        if only and only not in name:
+            continue
+        fn()  # warm-up: carica soglie, pool dei dadi e cache
+        results[name] = measure(fn, core_number, repeat)
+
+    cases = {name: fn for name, fn in handler_cases().items() if not only or only in name}
+    if cases:
+        loop = asyncio.new_event_loop()
+        try:
+            for name, coro_fn in cases.items():
+                loop.run_until_complete(coro_fn())
+                results[name] = measure_async(loop, coro_fn, handler_number, repeat)
+        finally:
+            loop.close()
+
+    return {"meta": metadata(), "results": results}
+
+
+def compare(current, previous, tolerance):
+    """Rapporto best_ns attuale / precedente per ogni caso comune; ritorna i casi oltre la tolleranza."""
+    regressions = []
+    for name, result in current["results"].items():
+        old = previous.get("results", {}).get(name)
+        if not old or not old.get("best_ns"):
+            continue
+        ratio = result["best_ns"] / old["best_ns"]
+        result["vs_previous"] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+        print(f"{name:<26} {old['best_ns']:>12.0f}ns → {result['best_ns']:>12.0f}ns  x{ratio:.2f}"
+              f"{'  REGRESSIONE' if ratio > 1 + tolerance else ''}", file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark offline del bot ALEA")
+    parser.add_argument("--output", help="file JSON dei risultati (default: stdout)")
+    parser.add_argument("--compare", help="JSON di un'esecuzione precedente da confrontare")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="rallentamento ammesso nel confronto (default: 0.25 = +25%%)")
+    parser.add_argument("--quick", action="store_true", help="meno iterazioni, per controlli rapidi")
+    parser.add_argument("--only", help="esegue solo i casi il cui nome contiene questo testo")
+    args = parser.parse_args()
+
+    report = run(quick=args.quick, only=args.only)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
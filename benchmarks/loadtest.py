@@ -0,0 +1,401 @@
+"""
+Load test: migliaia di interazioni sintetiche concorrenti sui comandi registrati in bot.tree,
+con le chiamate defer/send_message/followup inviate via HTTP a un finto endpoint dell'API Discord.
+
+Il finto endpoint gira in un processo separato (così non ruba tempo all'event loop misurato) e simula
+latenza configurabile e rate limit 429 con Retry-After; il client ritenta come fa discord.py.
+Il report (JSON) contiene throughput, latenza di coda per comando, lag dell'event loop,
+risposte oltre la scadenza di 3 secondi di Discord e le fasi registrate dal bot stesso.
+
+Uso (dalla radice del repository):
+    python benchmarks/loadtest.py --interactions 2000                     # raffica: tutte insieme
+    python benchmarks/loadtest.py --interactions 5000 --rate 300          # arrivi aperti a 300/s
+    python benchmarks/loadtest.py --latency 0.08 --jitter 0.04 --rate-limit 50 --mix alea=5,alea99=3,alea-batch=1
+    python benchmarks/loadtest.py --channels 1 --rate 20                  # tutti nello stesso canale: tiri uniti
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import socket
+import sys
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # thresholds.csv e i profili sono relativi alla radice, come per il servizio systemd
+
+API_PREFIX = "/api/v10"
+INTERACTION_DEADLINE = 3.0   # Discord invalida l'interazione senza risposta (o defer) entro 3 secondi
+MAX_RETRIES = 5
+PLAYERS = 50                 # utenti sintetici, a rotazione
+
+# Scenari: nome → (comando in bot.tree, opzioni)
+SCENARIOS = {
+    "alea": ("alea", {"vs": 60, "ld": 20}),
+    "alea-verbose": ("alea", {"vs": 60, "ld": 20, "verbose": True}),
+    "alea-batch": ("alea", {"vs": 55, "ld": 20, "tiri": 20}),
+    "alea99": ("alea99", {"vs": 50, "spec": 2, "ld": "D"}),
+    "alea-help": ("alea-help", {}),
+    "embed-test": ("embed-test", {"vs": 50}),
+}
+
+
+# === Mock Discord API (processo separato) ===
+def run_mock_api(port, latency, jitter, rate_limit, limited_ratio, ready):
+    """Finto endpoint Discord: callback delle interazioni e webhook dei followup, con latenza e 429."""
+    from aiohttp import web
+
+    bucket = {"tokens": float(rate_limit), "updated": time.monotonic()}
+
+    def rate_limited():
+        """Token bucket globale (rate_limit richieste/s, 0 = illimitato) più 429 casuali (limited_ratio)."""
+        if limited_ratio and random.random() < limited_ratio:
+            return 0.05 + random.random() * 0.2
+        if not rate_limit:
+            return None
+        now = time.monotonic()
+        bucket["tokens"] = min(rate_limit, bucket["tokens"] + (now - bucket["updated"]) * rate_limit)
+        bucket["updated"] = now
+        if bucket["tokens"] >= 1:
+            bucket["tokens"] -= 1
+            return None
+        return (1 - bucket["tokens"]) / rate_limit
+
+    async def respond(request, body, status):
+        await request.read()
+        retry_after = rate_limited()
+        if retry_after is not None:
+            return web.json_response(
+                {"message": "You are being rate limited.", "retry_after": round(retry_after, 3), "global": bool(rate_limit)},
+                status=429, headers={"Retry-After": f"{retry_after:.3f}"},
+            )
+        await asyncio.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+        return web.json_response(body, status=status) if body is not None else web.Response(status=status)
+
+    async def interaction_callback(request):
+        return await respond(request, None, 204)
+
+    async def webhook(request):
+        return await respond(request, {"id": str(random.getrandbits(63)), "type": 0}, 200)
+
+    app = web.Application()
+    app.add_routes([
+        web.post(API_PREFIX + "/interactions/{interaction_id}/{token}/callback", interaction_callback),
+        web.post(API_PREFIX + "/webhooks/{application_id}/{token}", webhook),
+        web.patch(API_PREFIX + "/webhooks/{application_id}/{token}/messages/@original", webhook),
+    ])
+
+    async def serve():
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host="127.0.0.1", port=port, backlog=4096).start()
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# === Synthetic Interactions ===
+class LoadStats:
+    def __init__(self):
+        self.requests = 0
+        self.rate_limited = 0
+        self.failed_requests = 0
+        self.ack = {}        # scenario → secondi dalla creazione al defer/send_message
+        self.total = {}      # scenario → secondi dalla creazione alla fine dell'handler
+        self.errors = {}     # scenario → eccezioni negli handler
+        self.ephemeral = 0   # risposte di errore (es. parametri non validi)
+
+    def add(self, bucket, scenario, value):
+        bucket.setdefault(scenario, []).append(value)
+
+
+class ApiClient:
+    """Richieste JSON verso il finto endpoint, ritentando sui 429 dopo Retry-After come discord.py."""
+
+    def __init__(self, session, base_url, stats):
+        self.session = session
+        self.base_url = base_url + API_PREFIX
+        self.stats = stats
+
+    async def post(self, path, payload, method="POST"):
+        for _ in range(MAX_RETRIES):
+            self.stats.requests += 1
+            async with self.session.request(method, self.base_url + path, json=payload) as resp:
+                if resp.status == 429:
+                    self.stats.rate_limited += 1
+                    data = await resp.json()
+                    await asyncio.sleep(float(data.get("retry_after", resp.headers.get("Retry-After", 1))))
+                    continue
+                resp.raise_for_status()
+                return await resp.json() if resp.content_type == "application/json" else None
+        self.stats.failed_requests += 1
+        raise RuntimeError(f"rate limit persistente su {path}")
+
+
+def message_payload(content, kwargs):
+    embeds = kwargs.get("embeds") or ([kwargs["embed"]] if kwargs.get("embed") else [])
+    payload = {"embeds": [embed.to_dict() for embed in embeds]}
+    if content is not None:
+        payload["content"] = content
+    if kwargs.get("ephemeral"):
+        payload["flags"] = 64
+    return payload
+
+
+class HttpResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.done = False
+
+    def is_done(self):
+        return self.done
+
+    async def defer(self, **kwargs):
+        self.done = True
+        await self.interaction.callback({"type": 5})
+
+    async def send_message(self, content=None, **kwargs):
+        self.done = True
+        await self.interaction.callback({"type": 4, "data": message_payload(content, kwargs)})
+
+
+class HttpFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        self.interaction.check_error(content, kwargs)
+        data = await self.interaction.api.post(f"/webhooks/{self.interaction.application_id}/{self.interaction.token}",
+                                               message_payload(content, kwargs))
+        interaction = self.interaction
+        return types.SimpleNamespace(
+            id=int(data["id"]), jump_url=f"https://discord.com/channels/{interaction.guild_id or '@me'}/{interaction.channel_id}/{data['id']}"
+        )
+
+
+class LoadInteraction:
+    """Il minimo di discord.Interaction usato dagli handler, con risposte via HTTP al finto endpoint."""
+
+    application_id = 1
+
+    def __init__(self, interaction_id, scenario, options, api, stats, guild_id=None, channels=1):
+        import discord
+
+        self.id = interaction_id
+        self.token = f"tok{interaction_id}"
+        self.scenario = scenario
+        self.user = types.SimpleNamespace(id=1000 + interaction_id % PLAYERS, display_name=f"giocatore{interaction_id % PLAYERS}")
+        self.channel_id = 1 + interaction_id % channels
+        self.guild_id = guild_id
+        self.data = {"options": [{"name": k, "value": v} for k, v in options.items()]}
+        self.created_at = discord.utils.utcnow()
+        self.created = time.perf_counter()
+        self.api = api
+        self.stats = stats
+        self.acked = False
+        self.extras = {}
+        self.response = HttpResponse(self)
+        self.followup = HttpFollowup(self)
+
+    def check_error(self, content, kwargs):
+        if content is not None and kwargs.get("ephemeral"):
+            self.stats.ephemeral += 1
+
+    async def edit_original_response(self, content=None, **kwargs):
+        await self.api.post(f"/webhooks/{self.application_id}/{self.token}/messages/@original",
+                            message_payload(content, kwargs), method="PATCH")
+
+    async def callback(self, payload):
+        self.check_error(payload.get("data", {}).get("content"), {"ephemeral": payload.get("data", {}).get("flags") == 64})
+        await self.api.post(f"/interactions/{self.id}/{self.token}/callback", payload)
+        if not self.acked:
+            self.acked = True
+            self.stats.add(self.stats.ack, self.scenario, time.perf_counter() - self.created)
+
+
+# === Load Generator ===
+async def monitor_loop_lag(samples, interval=0.01):
+    """Ritardo del risveglio rispetto a `interval`: misura quanto l'event loop resta bloccato."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - start - interval))
+
+
+def parse_mix(text):
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Scenario sconosciuto: {name} (disponibili: {', '.join(SCENARIOS)})")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+async def run_load(args, base_url):
+    import aiohttp
+    if args.send_rate is not None:
+        os.environ["ALEA_SEND_RATE"] = str(args.send_rate)
+    import core
+
+    await core.load_extensions()  # come setup_hook, senza connettersi a Discord
+    commands = {name: core.bot.tree.get_command(command) for name, (command, _) in SCENARIOS.items()}
+    weights = parse_mix(args.mix)
+    rnd = random.Random(args.seed)
+    plan = rnd.choices(list(weights), weights=list(weights.values()), k=args.interactions)
+
+    stats = LoadStats()
+    lag = []
+    semaphore = asyncio.Semaphore(args.concurrency or args.interactions)
+    ids = itertools.count(1)
+
+    async def one(scenario, api):
+        async with semaphore:
+            options = SCENARIOS[scenario][1]
+            interaction = LoadInteraction(next(ids), scenario, options, api, stats, guild_id=args.guild_id, channels=args.channels)
+            try:
+                await commands[scenario].callback(interaction, **options)
+            except Exception as e:
+                stats.errors.setdefault(scenario, []).append(repr(e))
+                return
+            stats.add(stats.total, scenario, time.perf_counter() - interaction.created)
+
+    connector = aiohttp.TCPConnector(limit=args.connections)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        api = ApiClient(session, base_url, stats)
+        monitor = asyncio.create_task(monitor_loop_lag(lag))
+        start = time.perf_counter()
+        tasks = []
+        for i, scenario in enumerate(plan):
+            if args.rate:
+                # Arrivi aperti: la generazione non aspetta le risposte, come i giocatori veri
+                delay = start + i / args.rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one(scenario, api)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+        monitor.cancel()
+
+    sends = dict(core.SEND_COUNTS)
+    sends["responses"] = {f"{command}:{path}": count for (command, path), count in sorted(core.RESPONSE_COUNTS.items())}
+    return stats, lag, elapsed, core.LATENCY.summary(), sends
+
+
+def percentiles(values, quantiles=(0.5, 0.95, 0.99)):
+    data = sorted(values)
+    if not data:
+        return {}
+    result = {f"p{int(q * 100)}_ms": round(data[min(len(data) - 1, int(q * len(data)))] * 1000, 2) for q in quantiles}
+    result["max_ms"] = round(data[-1] * 1000, 2)
+    result["count"] = len(data)
+    return result
+
+
+def build_report(args, stats, lag, elapsed, stages, sends):
+    completed = sum(len(v) for v in stats.total.values())
+    all_ack = [v for values in stats.ack.values() for v in values]
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "interactions": args.interactions,
+            "rate": args.rate,
+            "concurrency": args.concurrency,
+            "mix": args.mix,
+            "channels": args.channels,
+            "send_rate": args.send_rate,
+            "mock_latency_s": args.latency,
+            "mock_jitter_s": args.jitter,
+            "mock_rate_limit": args.rate_limit,
+            "mock_429_ratio": args.limited_ratio,
+        },
+        "throughput": {
+            "elapsed_s": round(elapsed, 3),
+            "completed": completed,
+            "interactions_per_s": round(completed / elapsed, 1) if elapsed else None,
+            "http_requests": stats.requests,
+            "rate_limited": stats.rate_limited,
+            "failed_requests": stats.failed_requests,
+            "ephemeral_errors": stats.ephemeral,
+            "handler_errors": {k: len(v) for k, v in stats.errors.items()},
+        },
+        "ack_latency": percentiles(all_ack),
+        "ack_over_deadline": sum(1 for v in all_ack if v > INTERACTION_DEADLINE),
+        "total_latency": {scenario: percentiles(values) for scenario, values in sorted(stats.total.items())},
+        "event_loop_lag": percentiles(lag),
+        "send_paths": sends,
+        "bot_stages": {f"{command}/{stage}": {"count": count, **{f"p{int(q * 100)}_ms": round(v * 1000, 2) for q, v in zip((0.5, 0.95, 0.99), values)}}
+                       for (command, stage), (count, values) in stages.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test dei comandi ALEA contro un finto endpoint Discord")
+    parser.add_argument("--interactions", type=int, default=2000, help="interazioni totali (default: 2000)")
+    parser.add_argument("--rate", type=float, default=0, help="arrivi al secondo; 0 = tutte in una raffica (default)")
+    parser.add_argument("--concurrency", type=int, default=0, help="interazioni in corso al massimo; 0 = nessun limite")
+    parser.add_argument("--mix", default="alea=6,alea-verbose=1,alea-batch=1,alea99=3,alea-help=1,embed-test=1",
+                        help="scenari e pesi, es. alea=5,alea99=3")
+    parser.add_argument("--latency", type=float, default=0.05, help="latenza media del finto endpoint in secondi (default: 0.05)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="variazione uniforme della latenza (default: 0.02)")
+    parser.add_argument("--rate-limit", type=float, default=0, help="richieste/s prima dei 429 globali; 0 = nessun limite")
+    parser.add_argument("--limited-ratio", type=float, default=0, help="frazione di richieste con 429 casuale (default: 0)")
+    parser.add_argument("--connections", type=int, default=100, help="connessioni HTTP del client (default: 100, come aiohttp)")
+    parser.add_argument("--guild-id", type=int, default=None, help="guild_id delle interazioni (profilo di soglie)")
+    parser.add_argument("--channels", type=int, default=100, help="canali su cui distribuire le interazioni (default: 100)")
+    parser.add_argument("--send-rate", type=float, default=None,
+                        help="messaggi per canale ogni 5 s dello scheduler del bot; 0 = disattivato (default: quello del bot)")
+    parser.add_argument("--seed", type=int, default=0, help="seme per la sequenza degli scenari")
+    parser.add_argument("--output", help="file JSON del report (default: stdout)")
+    args = parser.parse_args()
+
+    port = free_port()
+    ready = multiprocessing.Event()
+    mock = multiprocessing.Process(
+        target=run_mock_api,
+        args=(port, args.latency, args.jitter, args.rate_limit, args.limited_ratio, ready),
+        daemon=True,
+    )
+    mock.start()
+    try:
+        if not ready.wait(10):
+            raise SystemExit("Il finto endpoint Discord non si è avviato")
+        stats, lag, elapsed, stages, sends = asyncio.run(run_load(args, f"http://127.0.0.1:{port}"))
+    finally:
+        mock.terminate()
+        mock.join()
+
+    report = build_report(args, stats, lag, elapsed, stages, sends)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    t = report["throughput"]
+    print(f"{t['completed']} interazioni in {t['elapsed_s']}s ({t['interactions_per_s']}/s) | "
+          f"ack p99 {report['ack_latency'].get('p99_ms')}ms, oltre 3s: {report['ack_over_deadline']} | "
+          f"lag loop p99 {report['event_loop_lag'].get('p99_ms')}ms max {report['event_loop_lag'].get('max_ms')}ms | "
+          f"429: {t['rate_limited']}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+Launcher per il deploy shardato: divide gli shard tra più processi worker (main.py) sulla stessa macchina,
+così ogni worker ha il proprio event loop e il proprio core. I worker condividono configurazione
+(thresholds.csv, profili, guild_profiles.json) e database dello storico; il launcher li riavvia se terminano
+ed espone health check e metriche aggregate sulla porta del keep-alive (PORT).
+
+Uso (dalla radice del repository, con DISCORD_BOT_TOKEN impostato):
+    python cluster.py                          # shard consigliati da Discord, un worker per core
+    python cluster.py --shards 8 --workers 4   # 8 shard, 2 per worker
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import time
+import urllib.request
+
+import aiohttp
+from aiohttp import web
+
+from alea.logs import setup_logging
+
+log = logging.getLogger("cluster")
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DISCORD_API = "https://discord.com/api/v10"
+WORKER_PORT_BASE = int(os.getenv("ALEA_WORKER_PORT_BASE", "8100"))  # worker i: 127.0.0.1:BASE+i
+WORKER_READY_TIMEOUT = 180       # secondi di attesa del primo worker pronto prima di avviare il successivo
+RESTART_BACKOFF_MAX = 60         # secondi massimi tra un riavvio e l'altro di un worker che continua a cadere
+STABLE_UPTIME = 60               # un worker rimasto su così a lungo riparte col backoff minimo
+STOP_TIMEOUT = 20                # secondi concessi ai worker per scrivere storico e statistiche all'uscita
+
+
+# === Shard Assignment ===
+def recommended_shards(token):
+    """Numero di shard consigliato da Discord per il bot (GET /gateway/bot)."""
+    request = urllib.request.Request(
+        f"{DISCORD_API}/gateway/bot",
+        headers={"Authorization": f"Bot {token}", "User-Agent": "DiscordBot (alea-dice-bot, 1.0)"},
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.load(response)["shards"]
+
+
+def split_shards(shard_count, workers):
+    """Shard contigui per worker, il più possibile bilanciati: split_shards(5, 2) == [[0, 1, 2], [3, 4]]."""
+    workers = max(1, min(workers, shard_count))
+    size, extra = divmod(shard_count, workers)
+    groups, start = [], 0
+    for i in range(workers):
+        end = start + size + (i < extra)
+        groups.append(list(range(start, end)))
+        start = end
+    return groups
+
+
+# === Workers ===
+class Worker:
+    """Un processo main.py con i suoi shard, la sua porta di health check locale e i riavvii subiti."""
+
+    def __init__(self, cluster_id, shard_ids, shard_count):
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.port = WORKER_PORT_BASE + cluster_id
+        self.process = None
+        self.started = None
+        self.restarts = 0
+
+    def env(self):
+        env = dict(os.environ)
+        env.update(
+            ALEA_SHARD_COUNT=str(self.shard_count),
+            ALEA_SHARD_IDS=",".join(map(str, self.shard_ids)),
+            ALEA_CLUSTER_ID=str(self.cluster_id),
+            PORT=str(self.port),
+            ALEA_HEALTH_HOST="127.0.0.1",
+        )
+        return env
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.join(ROOT, "main.py"), env=self.env(), cwd=ROOT
+        )
+        self.started = time.monotonic()
+        log.info("Worker %d avviato (pid %d, shard %s)", self.cluster_id, self.process.pid, self.shard_ids)
+
+    def running(self):
+        return self.process is not None and self.process.returncode is None
+
+    def reload(self):
+        """SIGHUP: il worker ricarica le estensioni (extensions/) senza chiudere le sue sessioni gateway."""
+        if self.running():
+            self.process.send_signal(signal.SIGHUP)
+
+    async def stop(self):
+        """SIGINT come un Ctrl+C: bot.run() esce pulito e main() scrive storico e statistiche."""
+        if not self.running():
+            return
+        self.process.send_signal(signal.SIGINT)
+        try:
+            await asyncio.wait_for(self.process.wait(), STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            log.warning("Worker %d non si ferma, terminato forzatamente", self.cluster_id)
+            self.process.kill()
+            await self.process.wait()
+
+
+async def fetch(session, worker, path):
+    """(status, testo) dal server di health check di un worker; (None, None) se non risponde."""
+    try:
+        async with session.get(f"http://127.0.0.1:{worker.port}{path}") as response:
+            return response.status, await response.text()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None, None
+
+
+async def wait_ready(worker, session, stopping, timeout=WORKER_READY_TIMEOUT):
+    """
+    Aspetta che il worker abbia tutti gli shard connessi. Avviare i worker uno dopo l'altro rispetta
+    il limite di IDENTIFY di Discord (uno ogni 5 secondi), che ogni processo conosce solo per sé.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and worker.running() and not stopping.is_set():
+        status, _ = await fetch(session, worker, "/healthz")
+        if status == 200:
+            return True
+        await asyncio.sleep(2)
+    return False
+
+
+async def supervise(worker, stopping):
+    """Tiene in vita un worker: se termina lo riavvia, con attesa crescente se continua a cadere."""
+    backoff = 1
+    while not stopping.is_set():
+        code = await worker.process.wait()
+        if stopping.is_set():
+            return
+        backoff = 1 if time.monotonic() - worker.started > STABLE_UPTIME else min(backoff * 2, RESTART_BACKOFF_MAX)
+        log.warning("Worker %d terminato (codice %s), riavvio tra %ds", worker.cluster_id, code, backoff)
+        try:
+            await asyncio.wait_for(stopping.wait(), backoff)
+            return
+        except asyncio.TimeoutError:
+            pass
+        worker.restarts += 1
+        await worker.start()
+
+
+# === Aggregated Health Server ===
+async def handle_root(request):
+    return web.Response(text="Bot is running!")
+
+
+async def handle_healthz(request):
+    """200 solo se tutti i worker hanno tutti gli shard pronti; il dettaglio di ogni worker è nel JSON."""
+    workers = request.app["workers"]
+    responses = await asyncio.gather(*(fetch(request.app["session"], w, "/healthz") for w in workers))
+    entries = []
+    for worker, (status, text) in zip(workers, responses):
+        data = json.loads(text) if text else {}
+        entries.append({
+            "cluster": worker.cluster_id,
+            "pid": worker.process.pid if worker.running() else None,
+            "restarts": worker.restarts,
+            "status": data.get("status", "unreachable"),
+            "guilds": data.get("guilds", 0),
+            "latency_ms": data.get("latency_ms"),
+            "shards": data.get("shards") or {str(i): None for i in worker.shard_ids},
+        })
+    ready = sum(entry["status"] == "ok" for entry in entries)
+    payload = {
+        "status": "ok" if ready == len(workers) else ("degraded" if ready else "unavailable"),
+        "shard_count": request.app["shard_count"],
+        "workers_ready": ready,
+        "guilds": sum(entry["guilds"] for entry in entries),
+        "uptime_s": round(time.monotonic() - request.app["started"], 1),
+        "workers": entries,
+    }
+    return web.json_response(payload, status=200 if ready == len(workers) else 503)
+
+
+async def handle_memory(request):
+    """Memoria e oggetti in cache di ogni worker, più il totale dell'RSS."""
+    workers = request.app["workers"]
+    responses = await asyncio.gather(*(fetch(request.app["session"], w, "/memory") for w in workers))
+    entries = {str(w.cluster_id): json.loads(text) if status == 200 else None for w, (status, text) in zip(workers, responses)}
+    return web.json_response({
+        "rss_bytes": sum(entry["rss_bytes"] or 0 for entry in entries.values() if entry),
+        "workers": entries,
+    })
+
+
+def merge_metrics(texts):
+    """
+    Unisce le metriche Prometheus dei worker: un solo HELP/TYPE per famiglia e l'etichetta
+    cluster="N" su ogni campione (le etichette dei worker non contengono spazi).
+    """
+    families = {}
+    for cluster_id, text in texts:
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# HELP ") or line.startswith("# TYPE "):
+                family = line.split()[2]
+                entry = families.setdefault(family, {"meta": [], "samples": []})
+                if len(entry["meta"]) < 2:
+                    entry["meta"].append(line)
+            elif line and family is not None:
+                name, _, value = line.partition(" ")
+                if "{" in name:
+                    name = name.replace("{", f'{{cluster="{cluster_id}",', 1)
+                else:
+                    name = f'{name}{{cluster="{cluster_id}"}}'
+                families[family]["samples"].append(f"{name} {value}")
+    lines = []
+    for entry in families.values():
+        lines += entry["meta"] + entry["samples"]
+    return lines
+
+
+async def handle_metrics(request):
+    workers = request.app["workers"]
+    responses = await asyncio.gather(*(fetch(request.app["session"], w, "/metrics") for w in workers))
+    lines = merge_metrics([(w.cluster_id, text) for w, (status, text) in zip(workers, responses) if status == 200])
+    lines += [
+        "# HELP alea_cluster_worker_up Worker raggiungibile (1) o no (0).",
+        "# TYPE alea_cluster_worker_up gauge",
+    ]
+    for worker, (status, _) in zip(workers, responses):
+        lines.append(f'alea_cluster_worker_up{{cluster="{worker.cluster_id}"}} {int(status == 200)}')
+    lines += [
+        "# HELP alea_cluster_worker_restarts_total Riavvii di ogni worker da parte del launcher.",
+        "# TYPE alea_cluster_worker_restarts_total counter",
+    ]
+    for worker in workers:
+        lines.append(f'alea_cluster_worker_restarts_total{{cluster="{worker.cluster_id}"}} {worker.restarts}')
+    return web.Response(body=("\n".join(lines) + "\n").encode("utf-8"),
+                        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+async def start_health_server(workers, shard_count, session):
+    app = web.Application()
+    app["workers"], app["shard_count"], app["session"], app["started"] = workers, shard_count, session, time.monotonic()
+    app.add_routes([
+        web.get("/", handle_root),
+        web.get("/healthz", handle_healthz),
+        web.get("/metrics", handle_metrics),
+        web.get("/memory", handle_memory),
+    ])
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host="0.0.0.0", port=int(os.environ.get("PORT", 8080))).start()
+    return runner
+
+
+# === Launcher ===
+async def run(shard_count, workers_count):
+    workers = [Worker(i, ids, shard_count) for i, ids in enumerate(split_shards(shard_count, workers_count))]
+    log.info("Cluster: %d shard su %d worker", shard_count, len(workers))
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+
+    def reload_workers():
+        # systemctl reload / auto-pull.sh: la ricarica dei comandi passa a tutti i worker
+        for worker in workers:
+            worker.reload()
+
+    loop.add_signal_handler(signal.SIGHUP, reload_workers)
+
+    session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=3))
+    runner = await start_health_server(workers, shard_count, session)
+    supervisors = []
+    try:
+        for worker in workers:
+            if stopping.is_set():
+                break
+            await worker.start()
+            supervisors.append(asyncio.create_task(supervise(worker, stopping)))
+            if worker is not workers[-1] and not await wait_ready(worker, session, stopping):
+                log.warning("Worker %d non pronto (terminato o oltre %ds), avvio il successivo", worker.cluster_id, WORKER_READY_TIMEOUT)
+        await stopping.wait()
+    finally:
+        log.info("Arresto dei worker...")
+        await asyncio.gather(*(worker.stop() for worker in workers))
+        for task in supervisors:
+            task.cancel()
+        await runner.cleanup()
+        await session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Avvia il bot ALEA come cluster di processi shardati")
+    parser.add_argument("--shards", default=os.getenv("ALEA_SHARD_COUNT") or "auto",
+                        help="numero totale di shard, o auto per quello consigliato da Discord (default: auto)")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("ALEA_WORKERS") or os.cpu_count() or 1),
+                        help="processi worker (default: uno per core, mai più degli shard)")
+    args = parser.parse_args()
+
+    if args.shards == "auto":
+        token = os.getenv("DISCORD_BOT_TOKEN")
+        if not token:
+            parser.error("DISCORD_BOT_TOKEN non impostato: serve per chiedere a Discord il numero di shard")
+        shard_count = recommended_shards(token)
+    else:
+        shard_count = int(args.shards)
+    if shard_count < 1 or args.workers < 1:
+        parser.error("--shards e --workers devono essere almeno 1")
+
+    listener = setup_logging(static={"cluster": "launcher"})
+    try:
+        asyncio.run(run(shard_count, args.workers))
+    finally:
+        listener.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,868 @@
+"""
+Runtime condiviso del bot: istanza del bot, strumentazione delle latenze, health server, scheduler degli invii,
+storico, statistiche e schede personaggio, sync dei comandi e caricamento delle estensioni.
+I comandi stanno nelle estensioni (extensions/) e importano da qui quello che condividono: ricaricarle non tocca
+la sessione gateway né questo stato. Una modifica a questo modulo, a main.py o al package alea richiede un riavvio.
+"""
+import time
+STARTUP_T0 = time.perf_counter()  # prima di ogni altro import: base del report di avvio
+
+import os
+import sys
+import json
+import signal
+import asyncio
+import hashlib
+import math
+import pkgutil
+import logging
+import discord
+from discord import app_commands
+from discord.ext import commands
+from aiohttp import web
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from alea import thresholds
+from alea.characters import CharacterStore
+from alea.complete import RecentValues
+from alea.history import RollHistory
+from alea.stats import RollStats, checkpoint_stats
+
+log = logging.getLogger(__name__)
+COMMAND_LOG = logging.getLogger("core.commands")  # un record per comando completato (campionato) o fallito
+
+# === Keep-Alive / Health Server (aiohttp, on the bot's event loop) ===
+PROCESS_START = time.monotonic()
+PROCESS_START_WALL = time.time()  # per confrontare le date di modifica dei moduli (core_changes)
+COMMAND_COUNTS = Counter()  # comandi completati, per nome
+
+# === Latency Instrumentation ===
+LATENCY_WINDOW = 2048       # campioni tenuti per (comando, fase)
+LATENCY_QUANTILES = (0.5, 0.95, 0.99)
+LATENCY_STAGES = ("receipt", "compute", "discord", "total")
+
+class LatencyRecorder:
+    """
+    Campioni di latenza (secondi) per (comando, fase) in ring buffer di dimensione fissa.
+    Registrare è un append O(1); i percentili si calcolano solo quando qualcuno li legge.
+    Conteggio e somma cumulativi (mai azzerati) servono a /metrics, dove Prometheus ne calcola rate().
+    Fasi: receipt (creazione interazione → evento ricevuto), compute (dadi + embed),
+    discord (round trip defer/send/followup), total (creazione → comando completato).
+    """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self.samples = {}
+        self.totals = {}   # (comando, fase) → [campioni dall'avvio, secondi totali]
+
+    def record(self, command, stage, seconds):
+        buf = self.samples.get((command, stage))
+        if buf is None:
+            buf = self.samples[(command, stage)] = deque(maxlen=self.window)
+            self.totals[(command, stage)] = [0, 0.0]
+        buf.append(seconds)
+        total = self.totals[(command, stage)]
+        total[0] += 1
+        total[1] += seconds
+
+    def summary(self, quantiles=LATENCY_QUANTILES):
+        """{(comando, fase): (campioni, [percentili in secondi])} ordinato per comando e fase."""
+        result = {}
+        for key in sorted(self.samples, key=lambda k: (k[0], LATENCY_STAGES.index(k[1]) if k[1] in LATENCY_STAGES else 99)):
+            data = sorted(self.samples[key])
+            if data:
+                result[key] = (len(data), [data[min(len(data) - 1, int(q * len(data)))] for q in quantiles])
+        return result
+
+LATENCY = LatencyRecorder()
+
+
+def record_stage(command, stage, start):
+    """Registra il tempo trascorso da `start` (time.perf_counter()) per una fase di un comando."""
+    LATENCY.record(command, stage, time.perf_counter() - start)
+
+
+@contextmanager
+def timed(command, stage):
+    """Misura il blocco (es. una chiamata all'API Discord) come fase di un comando."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(command, stage, start)
+
+
+def interaction_age(interaction):
+    """Secondi dalla creazione dell'interazione (snowflake) ad ora; 0 se l'orologio locale è indietro."""
+    return max(0.0, (discord.utils.utcnow() - interaction.created_at).total_seconds())
+
+# === Startup Report ===
+class StartupReport:
+    """
+    Durata delle fasi di avvio, per tenere brevi i riavvii dopo ogni auto-pull.
+    import: da STARTUP_T0 a main() (moduli del nucleo); thresholds: lettura dei CSV e dei profili;
+    tables: probabilità esatte e indici di autocompletamento; extensions: caricamento dei comandi (setup_hook);
+    gateway_ready: dall'avvio del processo al primo on_ready.
+    """
+
+    def __init__(self, start):
+        self.start = start
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        """Misura la durata del blocco come fase di avvio."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - start
+
+    def mark(self, name):
+        """Registra il tempo trascorso da STARTUP_T0 (solo la prima volta)."""
+        self.phases.setdefault(name, time.perf_counter() - self.start)
+
+    def summary(self):
+        return " | ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases.items())
+
+STARTUP = StartupReport(STARTUP_T0)
+
+def gateway_latency():
+    """Latenza heartbeat del gateway in secondi, None finché non è misurata."""
+    latency = bot.latency
+    return latency if math.isfinite(latency) else None
+
+
+async def handle_root(request):
+    return web.Response(text="Bot is running!")
+
+
+async def handle_healthz(request):
+    """200 solo se la sessione gateway è pronta e aperta, altrimenti 503."""
+    ready = bot.is_ready() and not bot.is_closed()
+    latency = gateway_latency()
+    payload = {
+        "status": "ok" if ready else "unavailable",
+        "gateway_ready": bot.is_ready(),
+        "gateway_closed": bot.is_closed(),
+        "latency_ms": round(latency * 1000, 1) if latency is not None else None,
+        "guilds": len(bot.guilds),
+        "rss_bytes": process_memory()["rss"],
+        "uptime_s": round(time.monotonic() - PROCESS_START, 1),
+        "startup_s": {name: round(seconds, 3) for name, seconds in STARTUP.phases.items()},
+    }
+    if isinstance(bot, commands.AutoShardedBot):
+        guilds = shard_guild_counts()
+        payload["cluster"] = CLUSTER_ID
+        payload["shard_count"] = bot.shard_count
+        payload["shards"] = {
+            shard_id: {
+                "closed": shard.is_closed(),
+                "latency_ms": round(shard.latency * 1000, 1) if math.isfinite(shard.latency) else None,
+                "guilds": guilds[shard_id],
+            }
+            for shard_id, shard in sorted(bot.shards.items())
+        }
+    return web.json_response(payload, status=200 if ready else 503)
+
+
+def shard_guild_counts():
+    """Server per shard di questo processo."""
+    return Counter(guild.shard_id for guild in bot.guilds)
+
+
+def process_memory():
+    """RSS attuale e di picco del processo in byte: da /proc su Linux, altrove solo il picco (getrusage)."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            fields = dict(line.split(":", 1) for line in f if line.startswith(("VmRSS:", "VmHWM:")))
+        return {"rss": int(fields["VmRSS"].split()[0]) * 1024, "peak": int(fields["VmHWM"].split()[0]) * 1024}
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return {"rss": None, "peak": None}
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"rss": None, "peak": peak if sys.platform == "darwin" else peak * 1024}  # kB su Linux, byte su macOS
+
+
+def cached_objects():
+    """Oggetti tenuti in memoria per tipo: cache di discord.py (col profilo lean membri e messaggi restano a 0) e del bot."""
+    guilds = bot.guilds
+    return {
+        "guilds": len(guilds),
+        "channels": sum(len(guild.channels) + len(guild.threads) for guild in guilds),
+        "roles": sum(len(guild.roles) for guild in guilds),
+        "emojis": len(bot.emojis),
+        "stickers": len(bot.stickers),
+        "members": sum(len(guild.members) for guild in guilds),
+        "users": len(bot.users),
+        "messages": len(bot.cached_messages),
+        "private_channels": len(bot.private_channels),
+        "characters": sum(len(cache) for cache in CHARACTERS.guilds.values()),
+        "character_name_lists": len(CHARACTERS.name_lists),
+        "recent_vs_users": len(RECENT_VS.values),
+    }
+
+
+async def handle_memory(request):
+    """Memoria del processo e oggetti in cache per tipo, per capire cosa cresce con il numero di server."""
+    memory = process_memory()
+    return web.json_response({
+        "gateway_profile": GATEWAY_PROFILE,
+        "rss_bytes": memory["rss"],
+        "peak_rss_bytes": memory["peak"],
+        "cached": cached_objects(),
+    })
+
+
+def render_metrics():
+    """Metriche in formato testo Prometheus."""
+    latency = gateway_latency()
+    rss = process_memory()["rss"]
+    lines = [
+        "# HELP alea_up Processo del bot attivo.",
+        "# TYPE alea_up gauge",
+        "alea_up 1",
+        "# HELP alea_gateway_ready Sessione gateway pronta (1) o no (0).",
+        "# TYPE alea_gateway_ready gauge",
+        f"alea_gateway_ready {int(bot.is_ready() and not bot.is_closed())}",
+        "# HELP alea_gateway_latency_seconds Latenza heartbeat del gateway.",
+        "# TYPE alea_gateway_latency_seconds gauge",
+        f"alea_gateway_latency_seconds {latency if latency is not None else 'NaN'}",
+        "# HELP alea_guilds Server a cui il bot è connesso.",
+        "# TYPE alea_guilds gauge",
+        f"alea_guilds {len(bot.guilds)}",
+        "# HELP alea_memory_rss_bytes Memoria residente del processo.",
+        "# TYPE alea_memory_rss_bytes gauge",
+        f"alea_memory_rss_bytes {rss if rss is not None else 'NaN'}",
+        "# HELP alea_cached_objects Oggetti in cache per tipo (discord.py e bot).",
+        "# TYPE alea_cached_objects gauge",
+        *(f'alea_cached_objects{{type="{kind}"}} {count}' for kind, count in cached_objects().items()),
+        "# HELP alea_threshold_profiles Profili di soglie caricati.",
+        "# TYPE alea_threshold_profiles gauge",
+        f"alea_threshold_profiles {len(thresholds.threshold_profiles())}",
+        "# HELP alea_uptime_seconds Secondi dall'avvio del processo.",
+        "# TYPE alea_uptime_seconds counter",
+        f"alea_uptime_seconds {time.monotonic() - PROCESS_START:.3f}",
+        "# HELP alea_startup_seconds Durata delle fasi di avvio (gateway_ready: dall'avvio del processo).",
+        "# TYPE alea_startup_seconds gauge",
+    ]
+    for name, seconds in STARTUP.phases.items():
+        lines.append(f'alea_startup_seconds{{phase="{name}"}} {seconds:.6f}')
+    if isinstance(bot, commands.AutoShardedBot):
+        guilds = shard_guild_counts()
+        lines += [
+            "# HELP alea_shard_latency_seconds Latenza heartbeat di ogni shard del processo.",
+            "# TYPE alea_shard_latency_seconds gauge",
+        ]
+        for shard_id, shard in sorted(bot.shards.items()):
+            latency = shard.latency
+            lines.append(f'alea_shard_latency_seconds{{shard="{shard_id}"}} {latency if math.isfinite(latency) else "NaN"}')
+        lines += [
+            "# HELP alea_shard_guilds Server per shard.",
+            "# TYPE alea_shard_guilds gauge",
+        ]
+        for shard_id in sorted(bot.shards):
+            lines.append(f'alea_shard_guilds{{shard="{shard_id}"}} {guilds[shard_id]}')
+    lines += [
+        "# HELP alea_commands_total Slash command completati.",
+        "# TYPE alea_commands_total counter",
+    ]
+    for name, count in sorted(COMMAND_COUNTS.items()):
+        lines.append(f'alea_commands_total{{command="{name}"}} {count}')
+    lines += [
+        "# HELP alea_sends_total Invii dei tiri: direct (subito), merged (messaggi uniti), coalesced (tiri uniti), overflow (effimeri, coda piena).",
+        "# TYPE alea_sends_total counter",
+    ]
+    for path in ("direct", "merged", "coalesced", "overflow"):
+        lines.append(f'alea_sends_total{{path="{path}"}} {SEND_COUNTS[path]}')
+    lines += [
+        "# HELP alea_responses_total Risposte ai comandi: direct (send_message, una chiamata) o deferred (defer + followup).",
+        "# TYPE alea_responses_total counter",
+    ]
+    for (command, path), count in sorted(RESPONSE_COUNTS.items()):
+        lines.append(f'alea_responses_total{{command="{command}",path="{path}"}} {count}')
+    lines += [
+        "# HELP alea_send_queue Tiri in attesa di un token del proprio canale.",
+        "# TYPE alea_send_queue gauge",
+        f"alea_send_queue {SENDER.pending()}",
+    ]
+    lines.append("# HELP alea_command_latency_seconds Latenza per comando e fase: quantili sulla finestra recente, _count e _sum dall'avvio.")
+    lines.append("# TYPE alea_command_latency_seconds summary")
+    for (command, stage), (_, values) in LATENCY.summary().items():
+        labels = f'command="{command}",stage="{stage}"'
+        for q, value in zip(LATENCY_QUANTILES, values):
+            lines.append(f'alea_command_latency_seconds{{{labels},quantile="{q}"}} {value:.6f}')
+        count, seconds = LATENCY.totals[(command, stage)]
+        lines.append(f"alea_command_latency_seconds_count{{{labels}}} {count}")
+        lines.append(f"alea_command_latency_seconds_sum{{{labels}}} {seconds:.6f}")
+    return "\n".join(lines) + "\n"
+
+
+async def handle_metrics(request):
+    return web.Response(body=render_metrics().encode("utf-8"),
+                        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+async def start_health_server():
+    """Avvia il server HTTP sullo stesso event loop del bot (niente thread, niente server di sviluppo)."""
+    port = int(os.environ.get('PORT', 8080))  # Render requires a PORT
+    host = os.environ.get("ALEA_HEALTH_HOST", "0.0.0.0")  # i worker di cluster.py ascoltano solo in locale
+    app = web.Application()
+    app.add_routes([
+        web.get("/", handle_root),
+        web.get("/healthz", handle_healthz),
+        web.get("/metrics", handle_metrics),
+        web.get("/memory", handle_memory),
+    ])
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    return runner
+
+# === Load Environment Variables ===
+TOKEN = os.getenv("DISCORD_BOT_TOKEN")  # Load token from Render's environment variables
+
+# === Sharding ===
+# Senza ALEA_SHARD_COUNT: un solo processo, una sola sessione gateway (commands.Bot).
+# "auto": AutoShardedBot con il numero di shard consigliato da Discord, tutti in questo processo.
+# N con ALEA_SHARD_IDS: solo gli shard elencati; è così che cluster.py distribuisce gli shard tra i worker.
+SHARD_COUNT = os.getenv("ALEA_SHARD_COUNT", "").strip().lower()
+SHARD_IDS = os.getenv("ALEA_SHARD_IDS", "").strip()
+CLUSTER_ID = int(os.environ["ALEA_CLUSTER_ID"]) if os.getenv("ALEA_CLUSTER_ID") else None
+
+def shard_options():
+    """Argomenti shard_count/shard_ids per AutoShardedBot; None per il bot non shardato."""
+    if not SHARD_COUNT:
+        return None
+    if SHARD_COUNT == "auto":
+        if SHARD_IDS:
+            raise ValueError("ALEA_SHARD_IDS richiede un ALEA_SHARD_COUNT numerico")
+        return {"shard_count": None}
+    shard_count = int(SHARD_COUNT)
+    shard_ids = [int(i) for i in SHARD_IDS.split(",") if i.strip()] if SHARD_IDS else None
+    if shard_count < 1 or any(not 0 <= i < shard_count for i in shard_ids or ()):
+        raise ValueError(f"ALEA_SHARD_IDS deve contenere shard da 0 a {shard_count - 1}")
+    return {"shard_count": shard_count, "shard_ids": shard_ids}
+
+# === Batch Rolls ===
+EMBED_DESCRIPTION_LIMIT = 4000
+EMBED_TITLE_LIMIT = 256
+
+def batch_embeds(title, lines, summary, color, footer):
+    """Impagina le righe di un tiro multiplo in uno o più embed dello stesso messaggio."""
+    pages = [[]]
+    size = 0
+    for line in lines:
+        if pages[-1] and size + len(line) + 1 > EMBED_DESCRIPTION_LIMIT:
+            pages.append([])
+            size = 0
+        pages[-1].append(line)
+        size += len(line) + 1
+
+    embeds = []
+    for i, page in enumerate(pages):
+        page_title = title if len(pages) == 1 else f"{title} ({i + 1}/{len(pages)})"
+        embeds.append(discord.Embed(title=page_title, description="\n".join(page), color=color))
+    embeds[-1].add_field(name="Riepilogo", value=summary, inline=False)
+    embeds[-1].set_footer(text=footer)
+    return embeds
+
+
+
+# === Response Pipeline ===
+# Una risposta diretta (send_message) è una sola chiamata; defer + followup sono due. I tiri sono pronti in
+# microsecondi, quindi si risponde direttamente e si fa il defer solo se un lavoro in attesa (storico, simulazioni,
+# schede dal disco, coda del canale) rischia di superare la finestra di 3 secondi di Discord.
+RESPONSE_BUDGET = float(os.getenv("ALEA_RESPONSE_BUDGET", "1.5"))  # età massima dell'interazione prima del defer (s)
+RESPONSE_COUNTS = Counter()  # (comando, percorso): direct = send_message, deferred = defer + followup
+
+async def defer(interaction, command, ephemeral=False):
+    """Defer dell'interazione (se non ha già risposto): la risposta arriverà poi con un followup."""
+    if interaction.response.is_done():
+        return
+    RESPONSE_COUNTS[(command, "deferred")] += 1
+    interaction.extras["response"] = "deferred"
+    await interaction.response.defer(ephemeral=ephemeral)
+
+
+async def respond(interaction, command, content=None, **kwargs):
+    """Risposta del comando: send_message se l'interazione non ha ancora risposto, altrimenti followup dopo il defer."""
+    if interaction.response.is_done():
+        await interaction.followup.send(content, **kwargs)
+        return
+    RESPONSE_COUNTS[(command, "direct")] += 1
+    interaction.extras["response"] = "direct"
+    await interaction.response.send_message(content, **kwargs)
+
+
+async def within_budget(interaction, command, work, budget=RESPONSE_BUDGET, ephemeral=False):
+    """
+    Attende `work` (una coroutine, es. una query allo storico in un thread) finché l'interazione ha meno di
+    `budget` secondi; se non è ancora finito fa il defer, così la risposta non scade, e poi continua ad attenderlo.
+    """
+    task = asyncio.ensure_future(work)
+    remaining = budget - interaction_age(interaction)
+    if remaining > 0:
+        done, _ = await asyncio.wait((task,), timeout=remaining)
+        if done:
+            return task.result()
+    with timed(command, "discord"):
+        await defer(interaction, command, ephemeral=ephemeral)
+    return await task
+
+# === Outbound Send Scheduler (per channel) ===
+SEND_RATE = float(os.getenv("ALEA_SEND_RATE", "5"))   # messaggi per finestra e per canale; 0 = nessuno scheduler
+SEND_PER = float(os.getenv("ALEA_SEND_PER", "5"))     # finestra in secondi (limite dei canali Discord: 5 messaggi ogni 5 s)
+MERGED_MAX_EMBEDS = 10       # embed per messaggio (limite Discord)
+MERGED_MAX_CHARS = 6000      # caratteri totali degli embed di un messaggio (limite Discord)
+SEND_QUEUE_MAX = int(os.getenv("ALEA_SEND_QUEUE_MAX", "50"))  # tiri in attesa per canale (circa 5 s di coda); 0 = illimitati
+SEND_PRUNE_EVERY = 1024      # nuovi canali tra una pulizia e l'altra dei bucket inattivi
+SEND_COUNTS = Counter()      # direct: risposta immediata; merged: messaggi uniti; coalesced: tiri confluiti in un messaggio unito;
+                             # overflow: coda del canale piena, risultato effimero a chi ha tirato
+
+class TokenBucket:
+    """`rate` invii subito, poi uno ogni per/rate secondi."""
+
+    def __init__(self, rate, per):
+        self.capacity = rate
+        self.fill_rate = rate / per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+        self.updated = now
+
+    def take(self):
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def delay(self):
+        """Secondi mancanti al prossimo token."""
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.fill_rate)
+
+    def full(self):
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+def resolve(future, error=None):
+    """Completa il future di un invio in coda (se chi lo aspetta non è stato cancellato)."""
+    if future.done():
+        return
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
+
+
+class ChannelSender:
+    """
+    Invio dei risultati dei tiri, con un token bucket per canale. Con token disponibili la risposta parte subito
+    (respond: send_message, una sola chiamata); durante una raffica le interazioni in coda ricevono il defer,
+    così l'attesa non rischia la scadenza di 3 secondi, e i risultati in attesa vengono uniti in un solo messaggio
+    (fino a 10 embed, col nome del giocatore) inviato col followup della prima; le altre ricevono un rimando.
+    La coda di un canale è limitata a `queue_max` tiri: oltre, il risultato arriva subito come messaggio effimero
+    a chi ha tirato (non conta sul limite del canale), invece di accumulare secondi di ritardo per tutti.
+    """
+
+    def __init__(self, rate=SEND_RATE, per=SEND_PER, queue_max=SEND_QUEUE_MAX):
+        self.rate = rate
+        self.per = per
+        self.queue_max = queue_max
+        self.buckets = {}
+        self.queues = {}        # canale → deque di (interaction, embeds, future) in attesa di un token
+        self.deferring = Counter()  # canale → tiri che hanno già un posto in coda ma stanno ancora facendo il defer
+        self.drains = set()     # task di svuotamento attivi (riferimento forte finché non finiscono)
+        self.new_buckets = 0
+
+    def pending(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def _full(self, channel):
+        if not self.queue_max:
+            return False
+        return len(self.queues.get(channel, ())) + self.deferring[channel] >= self.queue_max
+
+    def _bucket(self, channel):
+        bucket = self.buckets.get(channel)
+        if bucket is None:
+            bucket = self.buckets[channel] = TokenBucket(self.rate, self.per)
+            self.new_buckets += 1
+            if self.new_buckets >= SEND_PRUNE_EVERY:
+                # Un bucket pieno equivale a uno nuovo: dimentica i canali inattivi
+                self.new_buckets = 0
+                self.buckets = {c: b for c, b in self.buckets.items() if c == channel or c in self.queues or not b.full()}
+        return bucket
+
+    async def send(self, interaction, command, embeds):
+        channel = interaction.channel_id
+        if not self.rate or channel is None:
+            await respond(interaction, command, embeds=embeds)
+            return
+        bucket = self._bucket(channel)
+        queue = self.queues.get(channel)
+        if queue is None and bucket.take():
+            SEND_COUNTS["direct"] += 1
+            await respond(interaction, command, embeds=embeds)
+            return
+        if self._full(channel):
+            SEND_COUNTS["overflow"] += 1
+            await respond(interaction, command, "⏳ Canale affollato: il risultato è visibile solo a te ed è nello storico "
+                          "(`/alea-history`).", embeds=embeds, ephemeral=True)
+            return
+        # Il posto in coda si prenota prima del defer, così una raffica non supera il limite durante l'attesa
+        self.deferring[channel] += 1
+        try:
+            await defer(interaction, command)
+        finally:
+            self.deferring[channel] -= 1
+            if not self.deferring[channel]:
+                del self.deferring[channel]
+        # Durante il defer altri tiri dello stesso canale possono aver creato la coda: si rilegge dopo l'attesa
+        bucket = self._bucket(channel)
+        queue = self.queues.get(channel)
+        future = asyncio.get_running_loop().create_future()
+        if queue is None:
+            queue = self.queues[channel] = deque()
+            task = asyncio.create_task(self._drain(channel, bucket, queue))
+            self.drains.add(task)
+            task.add_done_callback(self.drains.discard)
+        queue.append((interaction, embeds, future))
+        await future
+
+    async def _drain(self, channel, bucket, queue):
+        """Un messaggio per token finché la coda del canale non è vuota."""
+        try:
+            while queue:
+                await asyncio.sleep(bucket.delay())
+                if not bucket.take():
+                    continue
+                batch = [queue.popleft()]
+                count, size = len(batch[0][1]), sum(len(e) for e in batch[0][1])
+                while queue:
+                    embeds = queue[0][1]
+                    if count + len(embeds) > MERGED_MAX_EMBEDS or size + sum(len(e) for e in embeds) > MERGED_MAX_CHARS:
+                        break
+                    batch.append(queue.popleft())
+                    count += len(embeds)
+                    size += sum(len(e) for e in embeds)
+                await self._send_batch(batch)
+        finally:
+            del self.queues[channel]
+
+    async def _send_batch(self, batch):
+        carrier, embeds, future = batch[0]
+        if len(batch) > 1:
+            embeds = []
+            for interaction, item, _ in batch:
+                if not item[0].author:  # i tiri con una scheda hanno già l'autore
+                    item[0].set_author(name=interaction.user.display_name)
+                embeds += item
+        try:
+            message = await carrier.followup.send(embeds=embeds)
+        except Exception as e:
+            for *_, pending in batch:
+                resolve(pending, e)
+            return
+        resolve(future)
+        if len(batch) == 1:
+            SEND_COUNTS["direct"] += 1
+            return
+        SEND_COUNTS["merged"] += 1
+        SEND_COUNTS["coalesced"] += len(batch)
+        link = getattr(message, "jump_url", None)
+        text = f"🎲 Risultato nel messaggio di {carrier.user.display_name}" + (f": {link}" if link else "")
+        await asyncio.gather(*(self._point(interaction, text, pending) for interaction, _, pending in batch[1:]))
+
+    async def _point(self, interaction, text, future):
+        """Chiude il defer di un tiro unito a un altro messaggio con un rimando (modifica, non un nuovo messaggio)."""
+        try:
+            await interaction.edit_original_response(content=text)
+        except Exception as e:
+            resolve(future, e)
+            return
+        resolve(future)
+
+SENDER = ChannelSender()
+
+# === Roll History and Statistics ===
+HISTORY = RollHistory()  # avviata in main(); senza start() record() non fa nulla (benchmark, import)
+RECENT_VS = RecentValues()  # VS usati di recente da ogni giocatore per sistema (alea, alea99), per l'autocompletamento
+CHARACTERS = CharacterStore()  # schede personaggio: LRU per server, scrittura in background (avviata in main())
+STATS = RollStats(cluster=CLUSTER_ID or 0)  # contatori in memoria, checkpoint periodico nello stesso database
+
+# === Initialize Discord Bot ===
+# Profilo "lean" (default): il bot usa solo slash command, quindi basta l'intent guilds (server, canali e ruoli per
+# interaction.guild) e nessuna cache di membri, presenze o messaggi; niente chunking dei membri all'avvio.
+# "default": intents e cache predefiniti di discord.py, per confronto o per comandi che leggano membri o messaggi.
+GATEWAY_PROFILE = os.getenv("ALEA_GATEWAY_PROFILE", "lean").strip().lower()
+
+def gateway_options(profile=GATEWAY_PROFILE):
+    """Intents e opzioni di cache del client per il profilo scelto."""
+    if profile == "default":
+        return {"intents": discord.Intents.default()}
+    if profile != "lean":
+        raise ValueError(f"ALEA_GATEWAY_PROFILE deve essere lean o default, non {profile!r}")
+    intents = discord.Intents.none()
+    intents.guilds = True
+    return {
+        "intents": intents,
+        "member_cache_flags": discord.MemberCacheFlags.none(),
+        "max_messages": None,
+        "chunk_guilds_at_startup": False,
+    }
+
+SHARDING = shard_options()
+if SHARDING is None:
+    bot = commands.Bot(command_prefix="!", **gateway_options())
+else:
+    bot = commands.AutoShardedBot(command_prefix="!", **gateway_options(), **SHARDING)
+
+# === Autocomplete (shared by the extensions) ===
+# Indici di prefissi precostruiti (alea.complete): ogni suggerimento è una lettura di dict
+def autocomplete_choices(command, suggestions):
+    start = time.perf_counter()
+    choices = [app_commands.Choice(name=name, value=value) for name, value in suggestions]
+    record_stage(command, "compute", start)
+    return choices
+
+
+async def char_autocomplete(interaction: discord.Interaction, current: str):
+    """Nomi delle schede del giocatore nel server (dalla memoria dopo la prima richiesta)."""
+    names = await CHARACTERS.names(interaction.guild_id, interaction.user.id)
+    current = current.strip().lower()
+    return autocomplete_choices("autocomplete", [(n, n) for n in names if n.lower().startswith(current)][:25])
+
+# === Bot Events ===
+@bot.event
+async def setup_hook():
+    # Keep-alive, health check e metriche sullo stesso event loop
+    bot.health_server = await start_health_server()
+    # Comandi dalle estensioni, ricaricabili con SIGHUP o /alea-reload senza chiudere la sessione gateway
+    with STARTUP.phase("extensions"):
+        await load_extensions()
+    install_reload_signal()
+    # Hot reload di thresholds.csv e dei profili, senza riavvio né resync dei comandi;
+    # le estensioni che ne dipendono (es. gli embed di aiuto) ascoltano on_thresholds_reload
+    bot.threshold_watcher = asyncio.create_task(
+        thresholds.watch_thresholds(on_reload=lambda: bot.dispatch("thresholds_reload"))
+    )
+    # Checkpoint periodico delle statistiche dei tiri
+    bot.stats_checkpoint = asyncio.create_task(checkpoint_stats(STATS))
+    # Sync dei comandi solo se cambiati, in parallelo alla connessione al gateway.
+    # Con cluster.py i comandi sono globali: li sincronizza solo il primo worker
+    if not CLUSTER_ID:
+        bot.command_sync = asyncio.create_task(sync_commands())
+
+@bot.event
+async def on_interaction(interaction: discord.Interaction):
+    # Ricezione: dalla creazione dell'interazione su Discord all'arrivo sul nostro event loop
+    if interaction.type == discord.InteractionType.application_command:
+        LATENCY.record(interaction.data.get("name", "?"), "receipt", interaction_age(interaction))
+
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    age = interaction_age(interaction)
+    COMMAND_COUNTS[command.qualified_name] += 1
+    LATENCY.record(command.qualified_name, "total", age)
+    COMMAND_LOG.info("Comando completato", extra={
+        "command": command.qualified_name, "guild": interaction.guild_id, "latency_ms": round(age * 1000, 1),
+        "response": interaction.extras.get("response"), "sample": True,
+    })
+
+@bot.tree.error
+async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    """Eccezioni non gestite dei comandi: record strutturato (mai campionato) e risposta effimera a chi ha usato il comando."""
+    command = interaction.command.qualified_name if interaction.command else (interaction.data or {}).get("name", "?")
+    original = getattr(error, "original", error)
+    level = logging.WARNING if isinstance(error, app_commands.CommandNotFound) else logging.ERROR
+    context = {"command": command, "guild": interaction.guild_id, "latency_ms": round(interaction_age(interaction) * 1000, 1)}
+    COMMAND_LOG.log(level, "Errore nel comando", exc_info=(type(original), original, original.__traceback__), extra=context)
+    text = "❌ Errore interno durante il comando, riprova tra poco"
+    try:
+        if interaction.response.is_done():
+            await interaction.followup.send(text, ephemeral=True)
+        else:
+            await interaction.response.send_message(text, ephemeral=True)
+    except discord.HTTPException:
+        COMMAND_LOG.warning("Impossibile notificare l'errore all'utente", exc_info=True, extra=context)
+
+@bot.event
+async def on_ready():
+    if "gateway_ready" not in STARTUP.phases:
+        STARTUP.mark("gateway_ready")
+        log.info("Avvio completato: %s", STARTUP.summary(),
+                 extra={"startup_s": {name: round(seconds, 3) for name, seconds in STARTUP.phases.items()}})
+
+# === Command Tree Sync ===
+COMMAND_HASH_FILE = os.getenv("ALEA_COMMAND_HASH_FILE", "command_tree.json")  # hash dell'ultimo albero sincronizzato
+DEV_GUILD_IDS = [int(g) for g in os.getenv("ALEA_DEV_GUILDS", "").split(",") if g.strip()]
+FORCE_SYNC = os.getenv("ALEA_FORCE_SYNC") == "1"
+
+def command_tree_hash(guild=None):
+    """SHA-256 dello schema dei comandi, serializzato come lo riceve Discord, globale o di un server."""
+    payload = sorted((command.to_dict(bot.tree) for command in bot.tree.get_commands(guild=guild)),
+                     key=lambda c: (c.get("type", 1), c["name"]))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def load_command_hashes():
+    """Hash sincronizzati per "application_id:scope" ({} se il file manca o non è leggibile)."""
+    try:
+        with open(COMMAND_HASH_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception:
+        log.exception("Errore nella lettura di %s", COMMAND_HASH_FILE)
+        return {}
+
+
+def save_command_hashes(hashes):
+    """Scrittura atomica (file temporaneo + rename), come per le preferenze dei server."""
+    tmp_path = COMMAND_HASH_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(hashes, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, COMMAND_HASH_FILE)
+
+
+async def sync_commands():
+    """
+    Sincronizza i comandi solo se lo schema è cambiato dall'ultima sync riuscita: i riavvii dell'auto-pull
+    senza modifiche ai comandi non chiamano l'API (niente rate limit, nessuna attesa).
+    Con ALEA_DEV_GUILDS i comandi sono copiati anche su quei server, dove le modifiche sono visibili subito.
+    """
+    hashes = await asyncio.to_thread(load_command_hashes)
+    changed = False
+    for guild_id in [None] + DEV_GUILD_IDS:
+        guild = discord.Object(id=guild_id) if guild_id is not None else None
+        scope = f"guild:{guild_id}" if guild_id is not None else "global"
+        if guild is not None:
+            bot.tree.copy_global_to(guild=guild)
+        key = f"{bot.application_id}:{scope}"
+        digest = command_tree_hash(guild)
+        if hashes.get(key) == digest and not FORCE_SYNC:
+            log.info("Comandi invariati (%s, %s): sync saltata", scope, digest[:12])
+            continue
+        try:
+            synced = await bot.tree.sync(guild=guild)
+        except discord.HTTPException:
+            log.exception("Errore nella sincronizzazione dei comandi (%s)", scope)
+            continue
+        log.info("Sincronizzati %d comandi (%s)", len(synced), scope)
+        hashes[key] = digest
+        changed = True
+    if changed:
+        await asyncio.to_thread(save_command_hashes, hashes)
+
+
+# === Extensions (hot reload) ===
+EXTENSIONS_PACKAGE = "extensions"
+EXTENSIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), EXTENSIONS_PACKAGE)
+RELOAD_LOCK = asyncio.Lock()
+RELOAD_TASKS = set()  # ricariche avviate da SIGHUP (riferimento forte finché non finiscono)
+
+def extension_names():
+    """Estensioni presenti su disco (extensions/*.py, esclusi i moduli che iniziano con _)."""
+    return sorted(f"{EXTENSIONS_PACKAGE}.{module.name}" for module in pkgutil.iter_modules([EXTENSIONS_DIR])
+                  if not module.name.startswith("_"))
+
+
+def core_changes():
+    """
+    Moduli del nucleo (tutto tranne le estensioni) modificati su disco dopo l'avvio del processo:
+    la ricarica delle estensioni non li aggiorna, serve un riavvio completo.
+    """
+    root = os.path.dirname(EXTENSIONS_DIR)
+    changed = []
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None)
+        if not path or not path.startswith(root) or path.startswith(EXTENSIONS_DIR):
+            continue
+        try:
+            if os.path.getmtime(path) > PROCESS_START_WALL:
+                changed.append(os.path.relpath(path, root))
+        except OSError:
+            pass
+    return sorted(changed)
+
+
+async def load_extensions():
+    for name in extension_names():
+        await bot.load_extension(name)
+
+
+async def reload_extensions():
+    """
+    Ricarica dal disco tutte le estensioni (e carica le nuove, scarica le eliminate) sullo stesso event loop:
+    la sessione gateway resta aperta e le interazioni continuano ad arrivare. Un'estensione che non si carica
+    resta alla versione precedente (discord.py ripristina il modulo). Ritorna (ricaricate, errori per estensione).
+    """
+    async with RELOAD_LOCK:
+        reloaded, failed = [], {}
+        names = extension_names()
+        for name in [n for n in bot.extensions if n not in names]:
+            await bot.unload_extension(name)
+        for name in names:
+            try:
+                if name in bot.extensions:
+                    await bot.reload_extension(name)
+                else:
+                    await bot.load_extension(name)
+                reloaded.append(name)
+            except commands.ExtensionError as e:
+                failed[name] = e
+        # Sync solo se lo schema dei comandi è cambiato (hash), e solo dal primo worker del cluster
+        if not CLUSTER_ID:
+            await sync_commands()
+        return reloaded, failed
+
+
+async def reload_and_report():
+    reloaded, failed = await reload_extensions()
+    log.info("Estensioni ricaricate: %d, errori: %d", len(reloaded), len(failed))
+    for name, error in failed.items():
+        log.error("Errore nella ricarica di %s", name, exc_info=(type(error), error, error.__traceback__))
+    core = core_changes()
+    if core:
+        log.warning("Moduli del nucleo modificati (%s): serve un riavvio completo", ", ".join(core))
+
+
+def install_reload_signal():
+    """SIGHUP (systemctl reload, auto-pull.sh, cluster.py) ricarica le estensioni senza riavviare il processo."""
+    if not hasattr(signal, "SIGHUP"):
+        return
+
+    def on_sighup():
+        task = asyncio.create_task(reload_and_report())
+        RELOAD_TASKS.add(task)
+        task.add_done_callback(RELOAD_TASKS.discard)
+
+    asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, on_sighup)
+
+
+@bot.tree.command(name="alea-reload", description="Ricarica i comandi dal disco senza riavviare il bot (solo proprietario)")
+@app_commands.default_permissions(administrator=True)
+async def alea_reload(interaction: discord.Interaction):
+    """Come SIGHUP: ricarica le estensioni; nel nucleo perché deve funzionare anche con un'estensione rotta"""
+    if not await bot.is_owner(interaction.user):
+        await respond(interaction, "alea-reload", "❌ Solo il proprietario del bot può ricaricare i comandi", ephemeral=True)
+        return
+    await defer(interaction, "alea-reload", ephemeral=True)  # ricaricare e sincronizzare può superare i 3 secondi
+    reloaded, failed = await reload_extensions()
+    lines = [f"✅ Estensioni ricaricate: {len(reloaded)}"]
+    lines += [f"❌ `{name}`: {error}" for name, error in failed.items()]
+    core = core_changes()
+    if core:
+        lines.append(f"⚠️ Moduli del nucleo modificati ({', '.join(core)}): serve un riavvio completo")
+    await respond(interaction, "alea-reload", "\n".join(lines)[:2000], ephemeral=True)
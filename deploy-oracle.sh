@@ -2,6 +2,11 @@
 set -e
 
 TOKEN="${1:-}"
+# ALEA_CLUSTER=1: avvia cluster.py (shard su più processi) invece di main.py
+ENTRYPOINT="main.py"
+if [ "${ALEA_CLUSTER:-0}" = "1" ]; then
+    ENTRYPOINT="cluster.py"
+fi
 if [ -z "$TOKEN" ]; then
     echo "Error: Discord token required"
     echo "Usage: bash deploy-oracle.sh YOUR_DISCORD_TOKEN"
@@ -12,25 +17,25 @@ echo "=========================================="
 echo "ALEA Bot Oracle Deployment"
 echo "=========================================="
 
-echo "[1/7] Updating system..."
+echo "[1/8] Updating system..."
 sudo apt update -qq 2>/dev/null
 sudo apt install -y python3 python3-pip git 2>/dev/null
 
-echo "[2/7] Creating deploy user..."
+echo "[2/8] Creating deploy user..."
 sudo useradd -m -s /bin/bash deploy 2>/dev/null || echo "Deploy user already exists"
 
-echo "[3/7] Cloning repository..."
+echo "[3/8] Cloning repository..."
 if [ ! -d "/home/deploy/alea-dice-bot" ]; then
   sudo -u deploy git clone https://github.com/ThatFabio/alea-dice-bot.git /home/deploy/alea-dice-bot 2>/dev/null
 else
   cd /home/deploy/alea-dice-bot && sudo -u deploy git pull 2>/dev/null && cd -
 fi
 
-echo "[4/7] Installing Python dependencies..."
+echo "[4/8] Installing Python dependencies..."
 cd /home/deploy/alea-dice-bot
 sudo -u deploy pip install -r requirements.txt -q 2>/dev/null
 
-echo "[5/7] Creating systemd service..."
+echo "[5/8] Creating systemd service..."
 sudo tee /etc/systemd/system/alea-bot.service > /dev/null << SERVICEEOF
 [Unit]
 Description=ALEA Discord Bot
@@ -40,7 +45,9 @@ After=network.target
 Type=simple
 User=deploy
 WorkingDirectory=/home/deploy/alea-dice-bot
-ExecStart=/usr/bin/python3 /home/deploy/alea-dice-bot/main.py
+ExecStart=/usr/bin/python3 /home/deploy/alea-dice-bot/$ENTRYPOINT
+# systemctl reload: ricarica i comandi (extensions/) senza riavviare il processo
+ExecReload=/bin/kill -HUP \$MAINPID
 Restart=always
 RestartSec=10
 Environment="DISCORD_BOT_TOKEN=$TOKEN"
@@ -49,11 +56,17 @@ Environment="DISCORD_BOT_TOKEN=$TOKEN"
 WantedBy=multi-user.target
 SERVICEEOF
 
-echo "[6/7] Enabling service..."
+echo "[6/8] Installing auto-pull cron job..."
+# Ogni 5 minuti: pull da GitHub, poi reload (solo extensions/) o restart (nucleo); vedi auto-pull.sh
+sudo tee /etc/cron.d/alea-bot > /dev/null << CRONEOF
+*/5 * * * * root /home/deploy/alea-dice-bot/auto-pull.sh >> /var/log/alea-auto-pull.log 2>&1
+CRONEOF
+
+echo "[7/8] Enabling service..."
 sudo systemctl daemon-reload
 sudo systemctl enable alea-bot.service 2>/dev/null
 
-echo "[7/7] Starting bot..."
+echo "[8/8] Starting bot..."
 sudo systemctl start alea-bot.service
 
 sleep 2
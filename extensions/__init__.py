@@ -0,0 +1 @@
+"""Comandi del bot come estensioni discord.py, ricaricabili senza riavvio (vedi core.reload_extensions)."""
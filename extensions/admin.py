@@ -0,0 +1,62 @@
+"""
+Comandi di amministrazione: profilo di soglie del server (/alea-profilo) e latenze (/alea-stats).
+"""
+import asyncio
+
+import discord
+from discord import app_commands
+
+from alea import thresholds
+from core import LATENCY, LATENCY_WINDOW, respond
+
+# === Administration ===
+@app_commands.command(name="alea-profilo", description="Mostra o imposta il profilo di Gradi di Successo del server")
+@app_commands.guild_only()
+@app_commands.default_permissions(manage_guild=True)
+async def alea_profilo(interaction: discord.Interaction, nome: str = ""):
+    """Imposta il profilo di soglie (thresholds/<nome>.csv) usato dal server; senza nome mostra quelli disponibili"""
+    profiles = thresholds.threshold_profiles()
+    current = thresholds.guild_profile_name(interaction.guild_id)
+
+    if not nome:
+        available = ", ".join(f"`{p}`" for p in sorted(profiles))
+        await respond(interaction, "alea-profilo",
+            f"**Profilo attuale:** `{current}`\n**Profili disponibili:** {available}", ephemeral=True
+        )
+        return
+
+    if nome not in profiles:
+        await respond(interaction, "alea-profilo", f"❌ Profilo `{nome}` non trovato. Aggiungi `thresholds/{nome}.csv`.", ephemeral=True)
+        return
+
+    # Nuovo dict sostituito in blocco, come per le tabelle di soglie; il file è condiviso tra i worker
+    await asyncio.to_thread(thresholds.update_guild_profile, interaction.guild_id, nome)
+
+    await respond(interaction, "alea-profilo", f"✅ Profilo Gradi di Successo impostato: `{nome}` ({len(profiles[nome])} livelli)")
+
+@app_commands.command(name="alea-stats", description="Latenze p50/p95/p99 per comando e fase (solo amministratori)")
+@app_commands.guild_only()  # default_permissions non vale nei messaggi diretti
+@app_commands.default_permissions(administrator=True)
+async def alea_stats(interaction: discord.Interaction):
+    """Percentili di latenza delle interazioni recenti, per capire se i ritardi sono nostri o di Discord"""
+    summary = LATENCY.summary()
+    if not summary:
+        await respond(interaction, "alea-stats", "Nessun campione di latenza registrato finora.", ephemeral=True)
+        return
+
+    rows = [f"{'comando':<12} {'fase':<8} {'n':>5} {'p50':>8} {'p95':>8} {'p99':>8}"]
+    for (command, stage), (count, values) in summary.items():
+        rows.append(f"{command[:12]:<12} {stage:<8} {count:>5} " + " ".join(f"{v*1000:>6.1f}ms" for v in values))
+
+    embed = discord.Embed(
+        title="⏱️ Latenze comandi",
+        description="```\n" + "\n".join(rows)[:4000] + "\n```",
+        color=discord.Color.dark_grey()
+    )
+    embed.set_footer(text=f"Ultimi {LATENCY_WINDOW} campioni per comando e fase")
+    await respond(interaction, "alea-stats", embed=embed, ephemeral=True)
+
+
+async def setup(bot):
+    bot.tree.add_command(alea_profilo)
+    bot.tree.add_command(alea_stats)
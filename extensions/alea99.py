@@ -0,0 +1,253 @@
+"""
+/alea99 (Nd10, i 2 dadi più bassi) e /alea99-odds.
+"""
+import time
+from collections import Counter
+
+import discord
+from discord import app_commands
+
+from alea.dice import BATCH_MAX_ROLLS, batch_vs, dice_roll_alea99, parse_ld, parse_vs_list
+from alea.odds import alea99_odds
+from alea.complete import ld_suggestions, vs_suggestions
+from core import (CHARACTERS, HISTORY, RECENT_VS, SENDER, STATS, autocomplete_choices, batch_embeds,
+                  char_autocomplete, record_stage, respond, timed, within_budget)
+
+# === ALEA99 ===
+def build_alea99_batch_embeds(results, n, ld):
+    """Embed compatto per un tiro ALEA99 multiplo: una riga per tiro e un conteggio SA/SP/FP/FC."""
+    lines = []
+    counts = Counter()
+    for i, result in enumerate(results, 1):
+        counts[result["Acronym"]] += 1
+        rolls = " ".join(str(d) for d in result["Tiri Completi"])
+        lines.append(
+            f"`{i:02d}` VS `{result['VS Effettivo']}` · [{rolls}] → "
+            f"**{result['Risultato']:02d}** {result['Acronym']}"
+        )
+    summary = " · ".join(f"**{k}** {counts[k]}" for k in ("SA", "SP", "FP", "FC") if counts[k])
+    return batch_embeds(
+        f"🎲 {len(results)} tiri ALEA99 - {n}d10",
+        lines,
+        summary,
+        discord.Color.green() if counts["SA"] + counts["SP"] >= counts["FP"] + counts["FC"] else discord.Color.red(),
+        f"LD {ld} (VS Effettivo = VS + LD) - Sistema ALEA99",
+    )
+
+def record_alea99_roll(interaction, result):
+    """Accoda un tiro ALEA99 nello storico e aggiorna le statistiche."""
+    RECENT_VS.add("alea99", interaction.user.id, result["VS (Valore Soglia)"])
+    HISTORY.record(
+        user_id=interaction.user.id, guild_id=interaction.guild_id, channel_id=interaction.channel_id,
+        system="alea99", vs=result["VS (Valore Soglia)"], ld=result["LD (Livello Difficoltà)"],
+        n=result["Numero Dadi"], dice=result["Tiri Completi"], result=result["Risultato"], grade=result["Acronym"],
+        seed=f"{result['Seed']:016x}" if result["Seed"] is not None else None,
+    )
+    odds = alea99_odds(result["Numero Dadi"], result["VS (Valore Soglia)"], result["LD (Livello Difficoltà)"])
+    STATS.add(
+        interaction.user.id, interaction.guild_id, "alea99",
+        grade=result["Acronym"], odds=odds, success=result["Acronym"] in ("SA", "SP"),
+        p_success=odds["SA"] + odds["SP"], final=result["Risultato"],
+    )
+
+@app_commands.command(name="alea99", description="Effettua un tiro ALEA99 - Nd10 (best 2)")
+async def alea99(interaction: discord.Interaction, 
+                 vs: int = -1,
+                 spec: int = None,
+                 ld: str = "0",
+                 verbose: bool = False,
+                 tiri: int = 1,
+                 vs_lista: str = "",
+                 char: str = ""):
+    """
+    Effettua un tiro ALEA99 (Nd10 best 2).
+    
+    vs (Valore Soglia): 0-99 - *Obbligatorio, se non c'è una scheda*
+    spec (Specializzazione): 0-3 (converte a N = 2+SPEC → 2d10 a 5d10) - *Opzionale, default: 0*
+    ld (Livello Difficoltà): supporta molteplici formati - *Opzionale, default: 0*
+        - Numerico: -60, -30, 0, 30, 60
+        - Narrativo numerico: -3, -2, -1, 0, 1, 2, 3
+        - Narrativo corto: FFF, FF, F, M, D, DD, DDD
+        - Narrativo lungo: Banale, Facilissima, Facile, Media, Difficile, Difficilissima, Estrema
+    verbose: mostra tutti i Gradi di Successo (default: False)
+    tiri: numero di tiri in un solo messaggio (max 50) - *Opzionale, default: 1*
+    vs_lista: lista di VS, uno per tiro (sostituisce vs, es. `50, 45, 60`) - *Opzionale*
+    char: scheda personaggio salvata con /alea-char (VS e SPEC se non indicati) - *Opzionale*
+    """
+
+    # Scheda personaggio: i parametri espliciti hanno la precedenza su quelli salvati
+    sheet = None
+    if char:
+        sheet = await within_budget(interaction, "alea99", CHARACTERS.get(interaction.guild_id, interaction.user.id, char))
+        if sheet is None:
+            await respond(interaction, "alea99", f"❌ Scheda `{char}` non trovata. Creala con `/alea-char save`", ephemeral=True)
+            return
+        if vs == -1 and not vs_lista:
+            if not sheet.vs99:
+                await respond(interaction, "alea99", f"❌ La scheda `{sheet.name}` non ha un VS ALEA99: indicalo con `vs` o salvalo con `/alea-char save vs99:`", ephemeral=True)
+                return
+            vs = sheet.vs99  # non il VS classico: il bonus SPEC in ALEA99 è già nei dadi in più
+        spec = sheet.spec if spec is None else spec
+    spec = spec or 0
+    if vs == -1 and not vs_lista:
+        await respond(interaction, "alea99", "❌ Devi fornire il Valore Soglia (VS) o una scheda (`char`)", ephemeral=True)
+        return
+    
+    # Valida VS (o la lista di VS per il tiro multiplo)
+    vs_values = [vs]
+    if vs_lista:
+        vs_values = parse_vs_list(vs_lista)
+        if vs_values is None:
+            await respond(interaction, "alea99", "❌ VS lista non valida: usa interi separati da virgole o spazi (es. `50, 45, 60`)", ephemeral=True)
+            return
+    if any(v < 0 or v > 99 for v in vs_values):
+        await respond(interaction, "alea99", "❌ VS deve essere tra 0 e 99", ephemeral=True)
+        return
+    vs_values = batch_vs(vs_values, tiri)
+    if vs_values is None:
+        await respond(interaction, "alea99", f"❌ Un tiro multiplo deve avere tra 1 e {BATCH_MAX_ROLLS} tiri in totale", ephemeral=True)
+        return
+    
+    # Valida SPEC
+    if spec < 0 or spec > 3:
+        await respond(interaction, "alea99", "❌ SPEC deve essere 0, 1, 2 o 3 (N = 2+SPEC, quindi 2-5 dadi)", ephemeral=True)
+        return
+    
+    # Parsa LD
+    ld_value = parse_ld(ld)
+    if ld_value is None:
+        await respond(interaction, "alea99",
+            "❌ LD non riconosciuto. Usa: `-60` a `+60`, oppure `-3` a `+3`, oppure `FFF/FF/F/M/D/DD/DDD`, oppure `Banale/Facilissima/Facile/Media/Difficile/Difficilissima/Estrema`",
+            ephemeral=True
+        )
+        return
+    
+    # Calcola N da SPEC: N = 2 + SPEC
+    n = 2 + spec
+
+    compute_start = time.perf_counter()
+
+    if len(vs_values) > 1:
+        results = [dice_roll_alea99(n, v, ld_value) for v in vs_values]
+        for result in results:
+            record_alea99_roll(interaction, result)
+        embeds = build_alea99_batch_embeds(results, n, ld_value)
+        if sheet is not None:
+            embeds[0].set_author(name=f"{sheet.name} ({interaction.user.display_name})")
+        record_stage("alea99", "compute", compute_start)
+        with timed("alea99", "discord"):
+            await SENDER.send(interaction, "alea99", embeds)
+        return
+    
+    result = dice_roll_alea99(n, vs, ld_value)
+    record_alea99_roll(interaction, result)
+        # Format the rolls display
+    rolls_display = " ".join([f"`{d}`" for d in result["Tiri Completi"]])
+    two_lowest_display = " ".join([f"**{d}**" for d in result["Due Più Bassi"]])
+    
+    # Create embed
+    embed = discord.Embed(
+        title=f"🎲 **{result['Risultato']:02d}** - {result['Acronym']}",
+        description=result['Successo Level'],
+        color=discord.Color.green() if "Successo" in result['Successo Level'] else discord.Color.red()
+    )
+    
+    embed.add_field(
+        name=f"Tiri {n}d10",
+        value=f"Tutti i tiri: {rolls_display}\n"
+              f"Due più bassi: {two_lowest_display}",
+        inline=False
+    )
+    
+    embed.add_field(
+        name="Valori",
+        value=f"**VS (Valore Soglia):** `{result['VS (Valore Soglia)']}`\n"
+              f"**LD (Livello Difficoltà):** `{result['LD (Livello Difficoltà)']}`\n"
+              f"**VS Effettivo:** `{result['VS Effettivo']}`\n"
+              f"**Cifre identiche:** {'Sì 🟢' if result['Cifre Identiche'] else 'No'}",
+        inline=False
+    )
+    
+    if verbose:
+        odds = alea99_odds(n, vs, ld_value)
+        embed.add_field(
+            name="Legenda Gradi di Successo",
+            value=f"🟢 **Successo Assoluto (SA):** Cifre identiche e ≤ VS Effettivo · `{odds['SA']*100:.2f}%`\n"
+                  f"🟡 **Successo Pieno (SP):** Cifre diverse e ≤ VS Effettivo · `{odds['SP']*100:.2f}%`\n"
+                  f"🔴 **Fallimento Pieno (FP):** Cifre diverse e > VS Effettivo · `{odds['FP']*100:.2f}%`\n"
+                  f"⚫ **Fallimento Critico (FC):** Cifre identiche e > VS Effettivo · `{odds['FC']*100:.2f}%`",
+            inline=False
+        )
+    
+    footer = "Sistema ALEA99 - Tiro Nd10"
+    if result["Seed"] is not None:
+        footer += f" | Seed {result['Seed']:016x}"
+    embed.set_footer(text=footer)
+    if sheet is not None:
+        embed.set_author(name=f"{sheet.name} ({interaction.user.display_name})")
+    record_stage("alea99", "compute", compute_start)
+    
+    with timed("alea99", "discord"):
+        await SENDER.send(interaction, "alea99", [embed])
+
+@alea99.autocomplete("ld")
+async def alea99_ld_autocomplete(interaction: discord.Interaction, current: str):
+    return autocomplete_choices("autocomplete", ld_suggestions(current))
+
+
+@alea99.autocomplete("vs")
+async def alea99_vs_autocomplete(interaction: discord.Interaction, current: str):
+    named = [(c.name, c.vs99) for c in CHARACTERS.cached(interaction.guild_id, interaction.user.id) if c.vs99]
+    return autocomplete_choices("autocomplete", vs_suggestions(current, RECENT_VS.get("alea99", interaction.user.id), named))
+
+alea99.autocomplete("char")(char_autocomplete)
+
+@app_commands.command(name="alea99-odds", description="Mostra la curva delle probabilità esatte ALEA99 per N dadi")
+async def alea99_odds_command(interaction: discord.Interaction, spec: int = 0, ld: str = "0", vs: int = -1):
+    """
+    Curva esatta delle probabilità ALEA99 (SA/SP/FP/FC) al variare del VS.
+
+    spec (Specializzazione): 0-3 (N = 2+SPEC) - *Opzionale, default: 0*
+    ld (Livello Difficoltà): stessi formati di /alea99 - *Opzionale, default: 0*
+    vs (Valore Soglia): 0-99, evidenzia una riga della curva - *Opzionale*
+    """
+
+    if spec < 0 or spec > 3:
+        await respond(interaction, "alea99-odds", "❌ SPEC deve essere 0, 1, 2 o 3 (N = 2+SPEC, quindi 2-5 dadi)", ephemeral=True)
+        return
+
+    if vs > 99:
+        await respond(interaction, "alea99-odds", "❌ VS deve essere tra 0 e 99", ephemeral=True)
+        return
+
+    ld_value = parse_ld(ld)
+    if ld_value is None:
+        await respond(interaction, "alea99-odds",
+            "❌ LD non riconosciuto. Usa: `-60` a `+60`, oppure `-3` a `+3`, oppure `FFF/FF/F/M/D/DD/DDD`, oppure `Banale/Facilissima/Facile/Media/Difficile/Difficilissima/Estrema`",
+            ephemeral=True
+        )
+        return
+
+    n = 2 + spec
+    vs_values = sorted(set(list(range(0, 100, 10)) + [99] + ([vs] if vs >= 0 else [])))
+
+    # Tabella monospazio: una riga per VS
+    rows = [" VS     SA     SP     FP     FC"]
+    for v in vs_values:
+        odds = alea99_odds(n, v, ld_value)
+        marker = " ◀" if v == vs else ""
+        rows.append(f"{v:>3} " + " ".join(f"{odds[k]*100:5.1f}%" for k in ("SA", "SP", "FP", "FC")) + marker)
+
+    embed = discord.Embed(
+        title=f"📊 Probabilità ALEA99 - {n}d10",
+        description=f"**LD (Livello Difficoltà):** `{ld_value}` (VS Effettivo = VS + LD)\n```\n" + "\n".join(rows) + "\n```",
+        color=discord.Color.blue()
+    )
+    embed.set_footer(text="Calcolo esatto combinatorio - Sistema ALEA99")
+
+    await respond(interaction, "alea99-odds", embed=embed)
+
+
+async def setup(bot):
+    bot.tree.add_command(alea99)
+    bot.tree.add_command(alea99_odds_command)
@@ -0,0 +1,294 @@
+"""
+/alea (ALEA classico, 1d100 con Tiro Aperto) e /alea-odds.
+"""
+import time
+import logging
+from collections import Counter
+
+import discord
+from discord import app_commands
+
+from alea.thresholds import get_threshold_table
+from alea.dice import (BATCH_MAX_ROLLS, SPEC_BONUS, batch_vs, safe_malus, calcola_malus_stato, dice_roll, dice_roll_batch,
+                       parse_vs_list)
+from alea.odds import alea_odds
+from alea.complete import ld_suggestions, vs_suggestions
+from core import (CHARACTERS, HISTORY, RECENT_VS, SENDER, STATS, autocomplete_choices, batch_embeds,
+                  char_autocomplete, record_stage, respond, timed, within_budget)
+
+log = logging.getLogger(__name__)
+
+# === ALEA Classic ===
+def build_alea_batch_embeds(results, ld, malus_stato, table):
+    """Embed compatto per un tiro ALEA multiplo: una riga per tiro e un conteggio per grado."""
+    lines = []
+    counts = Counter()
+    for i, result in enumerate(results, 1):
+        label_index = result["Indice Grado"]
+        counts[label_index] += 1
+        aperto = " 💥" if result["Tiro Aperto"] else ""
+        lines.append(
+            f"`{i:02d}` VS `{result['Valore Soglia (VS)']}` · 1d100 `{result['Tiro 1d100']}`{aperto} → "
+            f"TM `{result['Tiro Manovra (con LD)']}` · **{table.labels[label_index]}**"
+        )
+    summary = " · ".join(f"**{table.acronyms[i] or table.labels[i]}** {counts[i]}" for i in range(len(table)) if counts[i])
+    return batch_embeds(
+        f"🎲 {len(results)} tiri ALEA",
+        lines,
+        summary,
+        discord.Color.blue(),
+        f"LD {ld} | Malus stati {safe_malus(malus_stato)} | 💥 = Tiro Aperto",
+    )
+
+
+def record_alea_roll(interaction, result, malus_stato, table=None, label_index=None):
+    """Accoda un tiro ALEA classico nello storico e, se ha un grado, aggiorna le statistiche."""
+    grade = table.labels[label_index] if label_index is not None else None
+    dice = [result["Primo Tiro"]] + ([result["Reroll"]] if result["Tiro Aperto"] else [])
+    if result["Valore Soglia (VS)"]:
+        RECENT_VS.add("alea", interaction.user.id, result["Valore Soglia (VS)"])
+    HISTORY.record(
+        user_id=interaction.user.id, guild_id=interaction.guild_id, channel_id=interaction.channel_id,
+        system="alea", vs=result["Valore Soglia (VS)"], ld=result["Livello Difficoltà (LD)"],
+        malus=safe_malus(malus_stato), dice=dice, result=result["Tiro Manovra (con LD)"], grade=grade,
+        seed=f"{result['Seed']:016x}" if result["Seed"] is not None else None,
+    )
+    if grade is None:
+        return
+    odds = alea_odds(result["Valore Soglia (VS)"], result["Livello Difficoltà (LD)"], malus_stato, table)
+    STATS.add(
+        interaction.user.id, interaction.guild_id, "alea",
+        grade=grade, odds=dict(zip(table.labels, odds)),
+        success=table.thresholds[label_index] <= 1.0,
+        p_success=sum(p for p, t in zip(odds, table.thresholds) if t <= 1.0),
+        final=result["Tiro Manovra (con LD)"], tiro_aperto=result["Tiro Aperto"],
+    )
+
+
+@app_commands.command(name="alea", description="Effettua un tiro ALEA con parametri completi del sistema MISO")
+async def alea(interaction: discord.Interaction, vs: int = 0, ld: int = 0, verbose: bool = False,
+              car: int = 0, abi: int = 0, spec: int = 0, lf: int = None, la: int = None, ls: int = None,
+              tiri: int = 1, vs_lista: str = "", char: str = ""):
+    """Effettua un tiro ALEA con parametri opzionali del sistema MISO (anche più tiri in un solo messaggio)"""
+
+    compute_start = time.perf_counter()
+
+    # Scheda personaggio: i parametri espliciti hanno la precedenza su quelli salvati
+    sheet = None
+    if char:
+        sheet = await within_budget(interaction, "alea", CHARACTERS.get(interaction.guild_id, interaction.user.id, char))
+        if sheet is None:
+            await respond(interaction, "alea", f"❌ Scheda `{char}` non trovata. Creala con `/alea-char save`", ephemeral=True)
+            return
+        if vs == 0 and not vs_lista and car == 0 and abi == 0 and spec == 0:
+            vs, car, abi, spec = sheet.vs, sheet.car, sheet.abi, min(sheet.spec, 2)  # SPEC 3 esiste solo in ALEA99
+        # None = non indicato: anche uno 0 esplicito sostituisce gli stati salvati
+        lf = sheet.lf if lf is None else lf
+        la = sheet.la if la is None else la
+        ls = sheet.ls if ls is None else ls
+    lf, la, ls = lf or 0, la or 0, ls or 0
+
+    # Converti SPEC da {0, 1, 2} a {0, 20, 30}
+    if spec not in [0, 1, 2]:
+        await respond(interaction, "alea", "❌ SPEC deve essere 0, 1 o 2 (non 20 o 30)", ephemeral=True)
+        return
+    spec_value = SPEC_BONUS[spec]
+    
+    # Allow shorthand call like "/alea 50" — try to extract first raw option value if vs is still 0
+    if vs == 0 and not vs_lista and not char:
+        try:
+            data = getattr(interaction, 'data', None)
+            if data:
+                opts = data.get('options', [])
+                if opts:
+                    # find first option with a concrete value
+                    for o in opts:
+                        if 'value' in o and o.get('name') != 'tiri':
+                            try:
+                                maybe_vs = int(o['value'])
+                                if maybe_vs >= 0:
+                                    vs = maybe_vs
+                                    break
+                            except (TypeError, ValueError):
+                                # not an integer, ignore
+                                pass
+        except (AttributeError, TypeError):
+            # Payload inatteso: il tiro prosegue senza scorciatoia, ma il problema deve vedersi nei log
+            log.warning("Opzioni dell'interazione non leggibili per la scorciatoia VS", exc_info=True,
+                        extra={"command": "alea", "guild": interaction.guild_id})
+
+    # Tiro multiplo: lista di VS (es. 20 PNG diversi) e/o più tiri con lo stesso VS
+    vs_values = None
+    if vs_lista:
+        vs_values = parse_vs_list(vs_lista)
+        if vs_values is None:
+            await respond(interaction, "alea", "❌ VS lista non valida: usa interi separati da virgole o spazi (es. `60, 45, 70`)", ephemeral=True)
+            return
+    # Se VS non è fornito direttamente, calcola da CAR+ABI+SPEC
+    elif vs == 0 and (car > 0 or abi > 0 or spec > 0):
+        vs = car + abi + spec_value
+        if vs == 0:
+            await respond(interaction, "alea", "❌ Devi fornire VS direttamente o almeno uno tra CAR, ABI, SPEC", ephemeral=True)
+            return
+    elif vs == 0:
+        await respond(interaction, "alea", "❌ Devi fornire il Valore Soglia (VS) o i parametri CAR/ABI/SPEC", ephemeral=True)
+        return
+    
+    # Calcola malus da stato
+    malus_stato = calcola_malus_stato(lf, la, ls)
+
+    if vs_values is not None or tiri != 1:
+        vs_values = batch_vs(vs_values or [vs], tiri)
+        if vs_values is None:
+            await respond(interaction, "alea", f"❌ Un tiro multiplo deve avere tra 1 e {BATCH_MAX_ROLLS} tiri in totale", ephemeral=True)
+            return
+        table = get_threshold_table(interaction.guild_id)
+        results = dice_roll_batch(vs_values, ld, malus_stato, table)
+        for result in results:
+            record_alea_roll(interaction, result, malus_stato, table, result["Indice Grado"])
+        embeds = build_alea_batch_embeds(results, ld, malus_stato, table)
+        if sheet is not None:
+            embeds[0].set_author(name=f"{sheet.name} ({interaction.user.display_name})")
+        record_stage("alea", "compute", compute_start)
+        with timed("alea", "discord"):
+            await SENDER.send(interaction, "alea", embeds)
+        return
+
+    # If the user invoked /alea with no parameters at all, just roll and return the final die value
+    no_params = (vs == 0 and car == 0 and abi == 0 and spec == 0 and lf == 0 and la == 0 and ls == 0 and ld == 0)
+    if no_params:
+        minimal = dice_roll(vs, ld, malus_stato, compute_label=False)
+        record_alea_roll(interaction, minimal, malus_stato)
+        tiro_aperto_text = ""
+        if minimal.get("Tiro Aperto"):
+            tiro_aperto_text = f"\n**Tiro Aperto!** Il primo tiro (`{minimal['Primo Tiro']}`) ha attivato un reroll → `{minimal['Reroll']}`."
+
+        embed = discord.Embed(
+            title=f"**Tiro 1d100: {minimal['Tiro 1d100']}**",
+            description=(
+                f"**Tiro Manovra (con LD+Stati):** `{minimal['Tiro Manovra (con LD)']}`\n"
+                f"━━━━━━━━━━━━━━━\n"
+                f"(Risultato grezzo, nessun confronto con Gradi di Successo){tiro_aperto_text}"
+            ),
+            color=discord.Color.blue()
+        )
+        with timed("alea", "discord"):
+            await SENDER.send(interaction, "alea", [embed])
+        return
+
+    # Resolve the guild's threshold profile once, so a concurrent reload cannot change it mid-roll
+    table = get_threshold_table(interaction.guild_id)
+
+    # Perform the dice roll calculations (normal flow)
+    result = dice_roll(vs, ld, malus_stato, table=table)
+
+    # Determine label index from the compiled boundaries (above all -> Fallimento Critico)
+    label_index = table.classify(result["Tiro Manovra (con LD)"], vs)
+    record_alea_roll(interaction, result, malus_stato, table, label_index)
+    range_text = table.range_texts(vs)[label_index]
+
+    # Handle "Tiro Aperto" (Exploding Rolls)
+    tiro_aperto_text = ""
+    if result["Tiro Aperto"]:
+        tiro_aperto_text = f"\n**Tiro Aperto!** Il primo tiro (`{result['Primo Tiro']}`) ha attivato un reroll → `{result['Reroll']}`."
+
+    # Format output based on verbosity
+    if not verbose:
+        summary = f"## {table.labels[label_index]} {range_text}"
+    else:
+        odds = alea_odds(vs, ld, malus_stato, table)
+        # iterate all labels, including final Fallimento Critico (lines cached per VS)
+        summary = "".join(
+            f"{line} · {odds[i]*100:.2f}%{' ✅' if i == label_index else ''}\n"
+            for i, line in enumerate(table.verbose_lines(vs))
+        )
+
+    # Create an embed message
+    # Crea stringa parametri aggiuntivi se forniti
+    param_extra = ""
+    if car > 0 or abi > 0 or spec > 0:
+        param_extra += f"**CAR (Caratteristica):** `{car}` | **ABI (Abilità):** `{abi}` | **SPEC:** `{spec}` (={spec_value})\n"
+    if lf > 0 or la > 0 or ls > 0:
+        param_extra += f"**LF (Ferite):** `{lf}` | **LA (Affaticamento):** `{la}` | **LS (Stordimento):** `{ls}`\n"
+    
+    embed = discord.Embed(
+        title=f"**Tiro 1d100: {result['Tiro 1d100']}**",
+        description=(
+            f"**Tiro Manovra (con LD+Stati):** `{result['Tiro Manovra (con LD)']}`\n"
+            f"**VS (Valore Soglia):** `{result['Valore Soglia (VS)']}`\n"
+            f"**LD (Livello Difficoltà):** `{result['Livello Difficoltà (LD)']}`\n"
+            f"{param_extra}"
+            "━━━━━━━━━━━━━━━\n"
+            f"{summary}\n"
+            "━━━━━━━━━━━━━━━"
+            f"{tiro_aperto_text}"
+        ),
+        color=discord.Color.blue()
+    )
+    if result["Seed"] is not None:
+        embed.set_footer(text=f"Seed {result['Seed']:016x} - riproducibile con /alea-replay")
+    if sheet is not None:
+        embed.set_author(name=f"{sheet.name} ({interaction.user.display_name})")
+
+    record_stage("alea", "compute", compute_start)
+
+    # Send the final response (one call when the channel has tokens)
+    with timed("alea", "discord"):
+        await SENDER.send(interaction, "alea", [embed])
+
+@alea.autocomplete("ld")
+async def alea_ld_autocomplete(interaction: discord.Interaction, current: str):
+    return autocomplete_choices("autocomplete", ld_suggestions(current, numeric=True))
+
+
+@alea.autocomplete("vs")
+async def alea_vs_autocomplete(interaction: discord.Interaction, current: str):
+    named = [(c.name, c.alea_vs()) for c in CHARACTERS.cached(interaction.guild_id, interaction.user.id)]
+    return autocomplete_choices("autocomplete", vs_suggestions(current, RECENT_VS.get("alea", interaction.user.id), named, high=None))
+
+alea.autocomplete("char")(char_autocomplete)
+
+@app_commands.command(name="alea-odds", description="Mostra la probabilità esatta di ogni Grado di Successo per un tiro ALEA")
+async def alea_odds_command(interaction: discord.Interaction, vs: int = 0, ld: int = 0,
+                            car: int = 0, abi: int = 0, spec: int = 0, lf: int = 0, la: int = 0, ls: int = 0):
+    """Probabilità esatte (non simulate) dei Gradi di Successo per VS, LD e stati dati"""
+
+    if spec not in [0, 1, 2]:
+        await respond(interaction, "alea-odds", "❌ SPEC deve essere 0, 1 o 2 (non 20 o 30)", ephemeral=True)
+        return
+    spec_value = SPEC_BONUS[spec]
+
+    # Se VS non è fornito direttamente, calcola da CAR+ABI+SPEC
+    if vs == 0:
+        vs = car + abi + spec_value
+    if vs <= 0:
+        await respond(interaction, "alea-odds", "❌ Devi fornire il Valore Soglia (VS) o i parametri CAR/ABI/SPEC", ephemeral=True)
+        return
+
+    malus_stato = calcola_malus_stato(lf, la, ls)
+    table = get_threshold_table(interaction.guild_id)
+    odds = alea_odds(vs, ld, malus_stato, table)
+    lines = [f"{line} · `{odds[i]*100:.2f}%`" for i, line in enumerate(table.verbose_lines(vs))]
+
+    # Probabilità complessiva di successo: gradi con soglia entro il 100% del VS
+    p_successo = sum(p for p, t in zip(odds, table.thresholds) if t <= 1.0)
+
+    embed = discord.Embed(
+        title=f"📊 Probabilità ALEA - VS {vs}",
+        description=(
+            f"**LD (Livello Difficoltà):** `{ld}` | **Malus Stati:** `{safe_malus(malus_stato)}`\n"
+            "━━━━━━━━━━━━━━━\n"
+            + "\n".join(lines) +
+            "\n━━━━━━━━━━━━━━━\n"
+            f"**Successo complessivo:** `{p_successo*100:.2f}%`"
+        ),
+        color=discord.Color.blue()
+    )
+    embed.set_footer(text="Calcolo esatto su 1d100 con Tiro Aperto")
+
+    await respond(interaction, "alea-odds", embed=embed)
+
+
+async def setup(bot):
+    bot.tree.add_command(alea)
+    bot.tree.add_command(alea_odds_command)
@@ -0,0 +1,119 @@
+"""
+/alea-char: schede personaggio salvate (alea.characters), usate da /alea e /alea99 con `char`.
+"""
+import discord
+from discord import app_commands
+
+from alea.characters import CHAR_NAME_MAX, STATE_LIMITS, Character
+from core import CHARACTERS, char_autocomplete, respond, within_budget
+
+# === Character Sheets (/alea-char) ===
+alea_char = app_commands.Group(name="alea-char", description="Schede personaggio salvate: CAR, ABI, SPEC, VS e stati")
+
+
+def character_embed(sheet, title):
+    """Embed di una scheda: valori salvati, VS ALEA risultante e malus degli stati."""
+    embed = discord.Embed(
+        title=title,
+        description=(
+            f"**CAR:** `{sheet.car}` | **ABI:** `{sheet.abi}` | **SPEC:** `{sheet.spec}`"
+            + (f" | **VS fisso:** `{sheet.vs}`" if sheet.vs else "") + "\n"
+            f"**VS ALEA:** `{sheet.alea_vs()}`" + (f" | **VS ALEA99:** `{sheet.vs99}`" if sheet.vs99 else "") + "\n"
+            f"**Stati:** LF `{sheet.lf}` · LA `{sheet.la}` · LS `{sheet.ls}` → Malus `{sheet.malus()}`"
+        ),
+        color=discord.Color.teal()
+    )
+    embed.set_footer(text=f"Usala con /alea char:{sheet.name} o /alea99 char:{sheet.name}")
+    return embed
+
+
+def state_error(**states):
+    """Messaggio di errore per il primo stato fuori dai limiti, None se sono tutti validi."""
+    for name, value in states.items():
+        low, high = STATE_LIMITS[name]
+        if not low <= value <= high:
+            return f"❌ {name.upper()} deve essere tra {low} e {high}"
+    return None
+
+
+@alea_char.command(name="save", description="Crea o sostituisce una scheda personaggio")
+async def alea_char_save(interaction: discord.Interaction, nome: str, car: int = 0, abi: int = 0, spec: int = 0,
+                         vs: int = 0, lf: int = 0, la: int = 0, ls: int = 0, vs99: int = 0):
+    """
+    nome: nome della scheda (unico per giocatore e server, maiuscole ignorate) - *Obbligatorio*
+    car, abi, spec: caratteristica, abilità e Specializzazione (0-3) - *Opzionali*
+    vs: Valore Soglia fisso al posto di CAR + ABI + SPEC - *Opzionale*
+    vs99: Valore Soglia ALEA99 (0-99) usato da /alea99 char - *Opzionale*
+    lf, la, ls: Livelli di Ferita, Affaticamento e Stress attuali - *Opzionali*
+    """
+    nome = nome.strip()
+    if not 1 <= len(nome) <= CHAR_NAME_MAX:
+        await respond(interaction, "alea-char save", f"❌ Il nome deve avere tra 1 e {CHAR_NAME_MAX} caratteri", ephemeral=True)
+        return
+    if spec not in (0, 1, 2, 3) or min(car, abi, vs) < 0:
+        await respond(interaction, "alea-char save", "❌ SPEC deve essere tra 0 e 3; CAR, ABI e VS non possono essere negativi", ephemeral=True)
+        return
+    if not 0 <= vs99 <= 99:
+        await respond(interaction, "alea-char save", "❌ VS99 deve essere tra 0 e 99", ephemeral=True)
+        return
+    error = state_error(lf=lf, la=la, ls=ls)
+    if error:
+        await respond(interaction, "alea-char save", error, ephemeral=True)
+        return
+    sheet = Character(name=nome, car=car, abi=abi, spec=spec, vs=vs, vs99=vs99, lf=lf, la=la, ls=ls)
+    CHARACTERS.save(interaction.guild_id, interaction.user.id, sheet)
+    await respond(interaction, "alea-char save", embed=character_embed(sheet, f"💾 Scheda salvata: {sheet.name}"), ephemeral=True)
+
+
+@alea_char.command(name="load", description="Mostra una scheda personaggio, o l'elenco delle tue schede")
+async def alea_char_load(interaction: discord.Interaction, nome: str = ""):
+    """nome: scheda da mostrare - *Opzionale, senza nome: elenco delle schede*"""
+    if not nome:
+        names = await within_budget(interaction, "alea-char load", CHARACTERS.names(interaction.guild_id, interaction.user.id), ephemeral=True)
+        text = ", ".join(f"`{n}`" for n in names) if names else "Nessuna scheda. Creane una con `/alea-char save`."
+        await respond(interaction, "alea-char load", f"📇 Le tue schede: {text}", ephemeral=True)
+        return
+    sheet = await within_budget(interaction, "alea-char load", CHARACTERS.get(interaction.guild_id, interaction.user.id, nome), ephemeral=True)
+    if sheet is None:
+        await respond(interaction, "alea-char load", f"❌ Scheda `{nome}` non trovata", ephemeral=True)
+        return
+    await respond(interaction, "alea-char load", embed=character_embed(sheet, f"📇 {sheet.name}"), ephemeral=True)
+
+
+@alea_char.command(name="set-state", description="Aggiorna Ferite, Affaticamento e Stress di una scheda")
+async def alea_char_set_state(interaction: discord.Interaction, nome: str, lf: int = -1, la: int = -1, ls: int = -1):
+    """
+    nome: scheda da aggiornare - *Obbligatorio*
+    lf, la, ls: nuovi livelli (-1 = invariato) - *Opzionali*
+    """
+    sheet = await within_budget(interaction, "alea-char set-state", CHARACTERS.get(interaction.guild_id, interaction.user.id, nome), ephemeral=True)
+    if sheet is None:
+        await respond(interaction, "alea-char set-state", f"❌ Scheda `{nome}` non trovata", ephemeral=True)
+        return
+    states = {name: value for name, value in (("lf", lf), ("la", la), ("ls", ls)) if value != -1}
+    error = state_error(**states)
+    if error:
+        await respond(interaction, "alea-char set-state", error, ephemeral=True)
+        return
+    sheet = sheet.with_state(**states)
+    CHARACTERS.save(interaction.guild_id, interaction.user.id, sheet)
+    await respond(interaction, "alea-char set-state", embed=character_embed(sheet, f"🩹 Stati aggiornati: {sheet.name}"), ephemeral=True)
+
+
+@alea_char.command(name="delete", description="Elimina una scheda personaggio")
+async def alea_char_delete(interaction: discord.Interaction, nome: str):
+    """nome: scheda da eliminare - *Obbligatorio*"""
+    sheet = await within_budget(interaction, "alea-char delete", CHARACTERS.get(interaction.guild_id, interaction.user.id, nome), ephemeral=True)
+    if sheet is None:
+        await respond(interaction, "alea-char delete", f"❌ Scheda `{nome}` non trovata", ephemeral=True)
+        return
+    CHARACTERS.delete(interaction.guild_id, interaction.user.id, sheet.name)
+    await respond(interaction, "alea-char delete", f"🗑️ Scheda `{sheet.name}` eliminata", ephemeral=True)
+
+
+for command in (alea_char_save, alea_char_load, alea_char_set_state, alea_char_delete):
+    command.autocomplete("nome")(char_autocomplete)
+
+
+async def setup(bot):
+    bot.tree.add_command(alea_char)
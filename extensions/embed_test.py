@@ -0,0 +1,70 @@
+"""
+/embed-test: anteprima dell'embed compatto dei tiri ALEA.
+"""
+import time
+
+import discord
+from discord import app_commands
+
+from alea.thresholds import get_threshold_table
+from alea.dice import dice_roll
+from core import record_stage, respond, timed
+
+# === Embed Preview ===
+@app_commands.command(name="embed-test", description="Anteprima embed ALEA (opzionale: vs)")
+async def embed_test(interaction: discord.Interaction, vs: int = 0, verbose: bool = False):
+    """Prototype embed for ALEA results. Use `/embed-test` or `/embed-test vs:50`."""
+    compute_start = time.perf_counter()
+
+    # If vs supplied, produce labeled result, otherwise minimal raw roll
+    malus_stato = 0
+    table = get_threshold_table(interaction.guild_id)
+    if vs == 0:
+        res = dice_roll(0, 0, malus_stato, compute_label=False)
+    else:
+        res = dice_roll(vs, 0, malus_stato, compute_label=True, table=table)
+
+    # Small responsive visual bar (10 segments) — safe for narrow screens
+    def build_bar(value, cap):
+        try:
+            pct = min(max(value / max(1, cap), 0.0), 1.0)
+        except (TypeError, ValueError):
+            pct = 0.0
+        filled = int(round(pct * 10))
+        empty = 10 - filled
+        return "".join(["🟩" for _ in range(filled)]) + "".join(["⬜" for _ in range(empty)])
+
+    # Prepare compact fields
+    if vs == 0:
+        title = f"🎲 Tiro 1d100: {res['Tiro 1d100']}"
+        description = f"Risultato grezzo — nessun confronto con Gradi di Successo"
+    else:
+        title = f"🎲 Tiro 1d100: {res['Tiro 1d100']} — {res.get('Risultato', '')}"
+        description = f"VS: {vs} | TM: {res['Tiro Manovra (con LD)']}"
+
+    embed = discord.Embed(title=title, description=description, color=discord.Color.blurple())
+
+    # Add compact inline stats to avoid wrapping long lines
+    embed.add_field(name="TM (con LD)", value=f"{res['Tiro Manovra (con LD)']}", inline=True)
+    embed.add_field(name="VS", value=f"{vs}", inline=True)
+    embed.add_field(name="Tiro Aperto", value=("Sì" if res.get("Tiro Aperto") else "No"), inline=True)
+
+    # Visual bar only when VS provided
+    if vs > 0:
+        bar = build_bar(res['Tiro Manovra (con LD)'], max(1, vs))
+        embed.add_field(name="Progresso vs", value=bar, inline=False)
+
+    # Verbose: list ranges from thresholds (short lines)
+    if verbose and len(table.labels) > 0:
+        legend = "\n".join([f"{i+1}. {lbl}" for i, lbl in enumerate(table.labels)])
+        embed.add_field(name="Legenda (brevi)", value=legend, inline=False)
+
+    embed.set_footer(text="Anteprima embed ALEA — visuale compatta per tutte le larghezze")
+    record_stage("embed-test", "compute", compute_start)
+
+    with timed("embed-test", "discord"):
+        await respond(interaction, "embed-test", embed=embed)
+
+
+async def setup(bot):
+    bot.tree.add_command(embed_test)
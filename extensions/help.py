@@ -0,0 +1,202 @@
+"""
+/alea-help e /alea99-help, con la cache degli embed di aiuto (ricostruita a ogni ricarica delle soglie).
+"""
+import discord
+from discord import app_commands
+
+from alea import thresholds
+from alea.thresholds import get_threshold_table, format_success_levels
+from core import respond, timed
+
+# === Help Commands ===
+def build_alea_help_embed(table):
+    """Embed di aiuto per /alea con i Gradi di Successo del profilo indicato"""
+    
+    embed = discord.Embed(
+        title="📖 Guida al Comando /alea",
+        description="Come usare il sistema di tiri ALEA",
+        color=discord.Color.green()
+    )
+    
+    embed.add_field(
+        name="Utilizzo Base",
+        value="`/alea vs:80`\n\nEsegue un tiro 1d100 contro un Valore Soglia (VS) di 80.",
+        inline=False
+    )
+    
+    embed.add_field(
+        name="Parametri Base",
+        value="**vs** (Valore Soglia): Valore Soglia diretto (0-999+) - *Opzionale se forniti CAR/ABI/SPEC*\n"
+              "**ld** (Livello Difficoltà): Modificatore di difficoltà (-60 a +60) - *Opzionale, default: 0*\n"
+              "**verbose**: Mostra tutti i Gradi di Successo o solo il risultato (true/false) - *Opzionale, default: false*",
+        inline=False
+    )
+    
+    embed.add_field(
+        name="Parametri MISO Avanzati (Opzionali)",
+        value="**car** (Caratteristica): Valore caratteristica (0-50+)\n"
+              "**abi** (Abilità): Valore abilità (0-100+)\n"
+              "**spec** (Specializzazione): Livello specializzazione {0=nessuna, 1=+20, 2=+30}\n"
+              "**lf** (Livello Ferite): Livello ferite (0-10)\n"
+              "**la** (Livello Affaticamento): Livello affaticamento (0-4)\n"
+              "**ls** (Livello Stordimento): Livello stordimento (0-4)\n\n"
+              "*Se forniti CAR/ABI/SPEC e VS=0, VS viene calcolato: VS = CAR + ABI + SPEC*",
+        inline=False
+    )
+    
+    embed.add_field(
+        name="Esempi",
+        value="`/alea vs:85 ld:10` - Tiro con VS 85 e +10 di difficoltà\n"
+              "`/alea car:25 abi:45 spec:2` - Tiro calcolato (25+45+30=100)\n"
+              "`/alea vs:50 lf:4 la:1` - Con ferita leggera + affaticamento\n"
+              "`/alea vs:100 verbose:true` - Mostra tutti i Gradi di Successo",
+        inline=False
+    )
+    
+    embed.add_field(
+        name="Gradi di Successo",
+        value=format_success_levels(table),
+        inline=False
+    )
+    
+    embed.add_field(
+        name="Tiro Aperto",
+        value="Se il 1d100 risulta 1-5 (critico di successo) o 96-100 (critico di fallimento),\n"
+              "il bot esegue automaticamente un reroll e lo combina con il primo risultato!",
+        inline=False
+    )
+    
+    embed.set_footer(text="Sistema ALEA GdR - Tira i dadi con stile!")
+    
+    return embed
+
+@app_commands.command(name="alea-help", description="Mostra aiuto su come usare il comando /alea")
+async def alea_help(interaction: discord.Interaction):
+    """Mostra aiuto su come usare il comando /alea"""
+    with timed("alea-help", "compute"):
+        embed = get_help_embed("alea-help", get_threshold_table(interaction.guild_id))
+    with timed("alea-help", "discord"):
+        await respond(interaction, "alea-help", embed=embed)
+
+def build_alea99_help_embed(table=None):
+    """Embed di aiuto per /alea99 (indipendente dal profilo di soglie)"""
+    
+    embed = discord.Embed(
+        title="📖 Guida al Comando /alea99",
+        description="Sistema ALEA99: Nd10 con i 2 dadi più bassi",
+        color=discord.Color.blue()
+    )
+    
+    embed.add_field(
+        name="Utilizzo Base",
+        value="`/alea99 vs:50`\n\nTira 2d10 (SPEC=0, default), estrae i 2 più bassi, e confronta con Valore Soglia 50.\n"
+              "`/alea99 vs:50 spec:2` - Tira 4d10 (SPEC=2 → N=2+2=4).",
+        inline=False
+    )
+    
+    embed.add_field(
+        name="Parametri",
+        value="**vs** (Valore Soglia): Soglia di confronto (0-99) - *Obbligatorio*\n"
+              "**spec** (Specializzazione): Livello specializzazione {0=2d10, 1=3d10, 2=4d10, 3=5d10} - *Opzionale, default: 0*\n"
+              "  → Formula: N = 2 + SPEC\n"
+              "**ld** (Livello Difficoltà): Modificatore al VS (⚠️ **LD è sulla DESTRA**: VS_effettivo = VS + LD) - *Opzionale, default: 0*\n"
+              "**verbose**: Mostra la legenda completa (true/false) - *Opzionale, default: false*",
+        inline=False
+    )
+    
+    embed.add_field(
+        name="Come Funziona",
+        value="1️⃣ Si tirano **N = 2 + SPEC** d10 (valori da 0 a 9)\n"
+              "2️⃣ Si **ordinano dal più basso al più alto**\n"
+              "3️⃣ Si **prendono solo i 2 più bassi**\n"
+              "4️⃣ Si forma un numero a 2 cifre: **[decina][unità]**\n"
+              "5️⃣ Si confronta con **VS Effettivo = VS + LD**\n\n"
+              "**Esempio:** N=4 → tiri [6, 2, 8, 1] → ordinati [1, 2, 6, 8] → **12** (mai 21)",
+        inline=False
+    )
+    
+    embed.add_field(
+        name="Gradi di Successo",
+        value="🟢 **Successo Assoluto (SA):** Cifre identiche (11, 22, 33...) e ≤ VS Effettivo\n"
+              "🟡 **Successo Pieno (SP):** Cifre diverse e ≤ VS Effettivo\n"
+              "🔴 **Fallimento Pieno (FP):** Cifre diverse e > VS Effettivo\n"
+              "⚫ **Fallimento Critico (FC):** Cifre identiche (11, 22, 33...) e > VS Effettivo",
+        inline=False
+    )
+    
+    embed.add_field(
+        name="Esempi Pratici",
+        value="`/alea99 vs:50` - Tira 2d10 (SPEC=0, default) con VS 50\n"
+              "`/alea99 vs:45 spec:1 ld:5` - Tira 3d10 (SPEC=1 → N=3) con VS 45 e LD +5 (VS Effettivo = 50)\n"
+              "`/alea99 vs:60 spec:2 verbose:true` - Tira 4d10 (SPEC=2) con VS 60, mostra legenda\n"
+              "`/alea99 vs:30 ld:-10` - Tira 2d10 con VS 30 e LD -10 (VS Effettivo = 20)",
+        inline=False
+    )
+    
+    embed.add_field(
+        name="Tabella Cifre Identiche",
+        value="00, 11, 22, 33, 44, 55, 66, 77, 88, 99\n\n"
+              "Questi numeri hanno **sempre** conseguenze critiche:\n"
+              "✅ Successo se ≤ VS Effettivo (Successo Assoluto)\n"
+              "❌ Fallimento se > VS Effettivo (Fallimento Critico)",
+        inline=False
+    )
+    
+    embed.add_field(
+        name="⚠️ Differenza rispetto a /alea Classico",
+        value="**ALEA Classico:** LD è sulla **SINISTRA** della disequazione\n"
+              "→ TM = 1d100 + LD, confronto: TM ≤ VS\n\n"
+              "**ALEA99:** LD è sulla **DESTRA** della disequazione\n"
+              "→ Risultato ≤ VS_effettivo = VS + LD",
+        inline=False
+    )
+    
+    embed.set_footer(text="Sistema ALEA99 - Tiro Nd10")
+    
+    return embed
+
+@app_commands.command(name="alea99-help", description="Mostra aiuto su come usare il comando /alea99")
+async def alea99_help(interaction: discord.Interaction):
+    """Mostra aiuto su come usare il comando /alea99"""
+    with timed("alea99-help", "compute"):
+        embed = get_help_embed("alea99-help")
+    with timed("alea99-help", "discord"):
+        await respond(interaction, "alea99-help", embed=embed)
+
+# === Help Embed Cache ===
+# Gli embed di aiuto sono costruiti una volta per profilo di soglie; ogni richiesta ne invia una copia.
+HELP_EMBED_BUILDERS = {
+    "alea-help": build_alea_help_embed,
+    "alea99-help": build_alea99_help_embed,
+}
+HELP_EMBEDS = {}
+
+def refresh_help_embeds():
+    """Ricostruisce la cache degli embed di aiuto; chiamata al caricamento dell'estensione e dopo ogni ricarica delle soglie."""
+    global HELP_EMBEDS
+    embeds = {("alea99-help", None): build_alea99_help_embed()}
+    for table in thresholds.threshold_profiles().values():
+        embeds[("alea-help", table)] = build_alea_help_embed(table)
+    HELP_EMBEDS = embeds
+
+
+def get_help_embed(name, table=None):
+    """Copia dell'embed di aiuto in cache (costruito al volo se la tabella è più recente della cache)."""
+    global HELP_EMBEDS
+    key = (name, table)
+    embed = HELP_EMBEDS.get(key)
+    if embed is None:
+        embed = HELP_EMBED_BUILDERS[name](table)
+        HELP_EMBEDS = {**HELP_EMBEDS, key: embed}
+    return embed.copy()
+
+
+async def on_thresholds_reload():
+    refresh_help_embeds()
+
+
+async def setup(bot):
+    refresh_help_embeds()
+    bot.add_listener(on_thresholds_reload)  # rimosso da discord.py allo scaricamento dell'estensione
+    bot.tree.add_command(alea_help)
+    bot.tree.add_command(alea99_help)
@@ -0,0 +1,186 @@
+"""
+Storico e contestazioni: /alea-replay (tiro riprodotto dal seed), /alea-history e /alea-luck.
+"""
+import asyncio
+
+import discord
+from discord import app_commands
+
+from alea.thresholds import get_threshold_table
+from alea.rng import parse_seed
+from alea.dice import calcola_malus_stato, dice_roll, dice_roll_alea99, parse_ld
+from core import CLUSTER_ID, EMBED_DESCRIPTION_LIMIT, HISTORY, STATS, respond, within_budget
+
+# === Replay, History and Luck ===
+@app_commands.command(name="alea-replay", description="Riproduce esattamente un tiro registrato in modalità audit dal suo seed")
+@app_commands.choices(sistema=[
+    app_commands.Choice(name="ALEA Classico (1d100)", value="alea"),
+    app_commands.Choice(name="ALEA99 (Nd10)", value="alea99"),
+])
+async def alea_replay(interaction: discord.Interaction, seed: str, vs: int, sistema: str = "alea", ld: int = 0,
+                      spec: int = 0, lf: int = 0, la: int = 0, ls: int = 0):
+    """Rigioca un tiro contestato con lo stesso seed e gli stessi parametri del tiro originale"""
+
+    seed_value = parse_seed(seed)
+    if seed_value is None:
+        await respond(interaction, "alea-replay", "❌ Seed non valido: usa il valore esadecimale mostrato nel footer del tiro", ephemeral=True)
+        return
+
+    if sistema == "alea99":
+        ld_value = parse_ld(str(ld))
+        if ld_value is None or not 0 <= spec <= 3:
+            await respond(interaction, "alea-replay", "❌ Parametri ALEA99 non validi (SPEC 0-3, LD come in /alea99)", ephemeral=True)
+            return
+        result = dice_roll_alea99(2 + spec, vs, ld_value, seed=seed_value)
+        description = (
+            f"**Tiri {2 + spec}d10:** {' '.join(f'`{d}`' for d in result['Tiri Completi'])}\n"
+            f"**Risultato:** `{result['Risultato']:02d}` | **VS Effettivo:** `{result['VS Effettivo']}`\n"
+            f"## {result['Successo Level']} ({result['Acronym']})"
+        )
+    else:
+        table = get_threshold_table(interaction.guild_id)
+        result = dice_roll(vs, ld, calcola_malus_stato(lf, la, ls), table=table, seed=seed_value)
+        reroll = f" | **Reroll:** `{result['Reroll']}`" if result["Tiro Aperto"] else ""
+        description = (
+            f"**Tiro 1d100:** `{result['Tiro 1d100']}`{reroll}\n"
+            f"**Tiro Manovra (con LD+Stati):** `{result['Tiro Manovra (con LD)']}` | **VS:** `{vs}`\n"
+            f"## {result['Risultato']}"
+        )
+
+    embed = discord.Embed(title=f"🔁 Replay tiro - seed {seed_value:016x}", description=description, color=discord.Color.dark_teal())
+    embed.set_footer(text="Stesso seed e stessi parametri → stesso tiro")
+    await respond(interaction, "alea-replay", embed=embed)
+
+HISTORY_PAGE_SIZE = 10
+
+def format_history_row(row):
+    """Una riga dello storico: quando, chi, tiro e grado."""
+    when = f"<t:{int(row['ts'])}:R> <@{row['user_id']}>"
+    dice = " ".join(str(d) for d in row["dice"] or [])
+    seed = f" · seed `{row['seed']}`" if row["seed"] else ""
+    if row["system"] == "roll":
+        return f"{when} **ROLL** `{row['expr']}` → **{row['result']}**{seed}"
+    if row["system"] == "alea99":
+        return (f"{when} **ALEA99** {row['n']}d10 [{dice}] VS `{row['vs']}` LD `{row['ld']}` → "
+                f"**{row['result']:02d}** {row['grade']}{seed}")
+    return (f"{when} **ALEA** 1d100 [{dice}] VS `{row['vs']}` LD `{row['ld']}` Malus `{row['malus']}` → "
+            f"TM `{row['result']}` · **{row['grade'] or 'grezzo'}**{seed}")
+
+
+@app_commands.command(name="alea-history", description="Mostra gli ultimi tiri registrati (tuoi, di un giocatore o del server)")
+async def alea_history(interaction: discord.Interaction, utente: discord.User = None, tutti: bool = False, pagina: int = 1):
+    """
+    Storico dei tiri, dal più recente, per risolvere le contestazioni.
+
+    utente: giocatore di cui mostrare i tiri - *Opzionale, default: chi usa il comando*
+    tutti: tiri di tutto il server invece che di un giocatore - *Opzionale, default: false*
+    pagina: pagina dello storico (10 tiri per pagina) - *Opzionale, default: 1*
+    """
+    if pagina < 1:
+        await respond(interaction, "alea-history", "❌ La pagina deve essere almeno 1", ephemeral=True)
+        return
+    if tutti and interaction.guild_id is None:
+        await respond(interaction, "alea-history", "❌ Lo storico del server è disponibile solo in un server", ephemeral=True)
+        return
+    # In DM non c'è un server a cui limitare la ricerca: lo storico di tutti i server si mostra solo al diretto interessato
+    if utente is not None and utente.id != interaction.user.id and interaction.guild_id is None:
+        await respond(interaction, "alea-history", "❌ Nei messaggi diretti puoi vedere solo i tuoi tiri", ephemeral=True)
+        return
+
+    user = None if tutti else (utente or interaction.user)
+    # Una riga in più del necessario dice se esiste la pagina successiva, senza contare tutto lo storico
+    rows = await within_budget(interaction, "alea-history", asyncio.to_thread(
+        HISTORY.recent, user_id=user.id if user else None, guild_id=interaction.guild_id,
+        limit=HISTORY_PAGE_SIZE + 1, offset=(pagina - 1) * HISTORY_PAGE_SIZE,
+    ))
+    has_next = len(rows) > HISTORY_PAGE_SIZE
+    rows = rows[:HISTORY_PAGE_SIZE]
+
+    owner = "del server" if user is None else f"di {user.display_name}"
+    if not rows:
+        await respond(interaction, "alea-history", f"Nessun tiro registrato {owner} (pagina {pagina}).", ephemeral=True)
+        return
+
+    embed = discord.Embed(
+        title=f"📜 Storico tiri {owner}",
+        description="\n".join(format_history_row(row) for row in rows)[:EMBED_DESCRIPTION_LIMIT],
+        color=discord.Color.dark_gold()
+    )
+    footer = f"Pagina {pagina}"
+    if has_next:
+        footer += f" - continua con pagina:{pagina + 1}"
+    embed.set_footer(text=footer)
+    await respond(interaction, "alea-history", embed=embed)
+
+def luck_verdict(z):
+    """Giudizio sulla fortuna dallo scarto dei successi in deviazioni standard."""
+    if z >= 2:
+        return "🍀 Fortunatissimo"
+    if z >= 1:
+        return "🙂 Fortunato"
+    if z > -1:
+        return "😐 Nella media"
+    if z > -2:
+        return "🙁 Sfortunato"
+    return "💀 Sfortunatissimo"
+
+
+@app_commands.command(name="alea-luck", description="Fortuna di un giocatore o del server rispetto alle probabilità esatte")
+@app_commands.choices(sistema=[
+    app_commands.Choice(name="ALEA Classico (1d100)", value="alea"),
+    app_commands.Choice(name="ALEA99 (Nd10)", value="alea99"),
+])
+async def alea_luck(interaction: discord.Interaction, utente: discord.User = None, sistema: str = "alea", tutti: bool = False):
+    """
+    Frequenze osservate dei Gradi di Successo contro le probabilità esatte di ogni tiro fatto.
+    Legge contatori aggiornati a ogni tiro: nessuna scansione dello storico.
+
+    utente: giocatore (statistiche su tutti i server) - *Opzionale, default: chi usa il comando*
+    sistema: alea (1d100) o alea99 (Nd10) - *Opzionale, default: alea*
+    tutti: statistiche di tutto il server - *Opzionale, default: false*
+    """
+    if tutti:
+        if interaction.guild_id is None:
+            await respond(interaction, "alea-luck", "❌ Le statistiche del server sono disponibili solo in un server", ephemeral=True)
+            return
+        scope, key, owner = "guild", interaction.guild_id, "del server"
+    else:
+        user = utente or interaction.user
+        scope, key, owner = "user", user.id, f"di {user.display_name}"
+    if CLUSTER_ID is None:
+        tally = STATS.get(scope, key, sistema)
+    else:
+        # Con cluster.py un giocatore tira anche in server di altri worker: somma i loro ultimi checkpoint
+        tally = await within_budget(interaction, "alea-luck", asyncio.to_thread(STATS.merged, scope, key, sistema))
+
+    system_name = "ALEA99" if sistema == "alea99" else "ALEA"
+    if tally is None or not tally.rolls:
+        await respond(interaction, "alea-luck", f"Nessun tiro {system_name} registrato {owner}.", ephemeral=True)
+        return
+
+    n = tally.rolls
+    grades = list(tally.expected) + [g for g in tally.grades if g not in tally.expected]
+    lines = [f"**{grade}:** `{tally.grades.get(grade, 0) / n * 100:.1f}%` (atteso `{tally.expected.get(grade, 0.0) / n * 100:.1f}%`)"
+             for grade in grades]
+    z = tally.luck()
+
+    embed = discord.Embed(
+        title=f"🎲 Fortuna {owner} - {system_name}",
+        description=(
+            f"## {luck_verdict(z)} ({z:+.2f} σ)\n"
+            f"**Tiri:** `{n}` | **Successi:** `{tally.successes}` (attesi `{tally.expected_successes:.1f}`)\n"
+            + (f"**Tiri Aperti:** `{tally.tiri_aperti / n * 100:.1f}%` (atteso `10.0%`) | **TM medio:** `{tally.mean_final():.1f}`\n"
+               if sistema == "alea" else f"**Risultato medio:** `{tally.mean_final():.1f}`\n")
+            + "━━━━━━━━━━━━━━━\n"
+            + "\n".join(lines)
+        ),
+        color=discord.Color.green() if z >= 0 else discord.Color.red()
+    )
+    embed.set_footer(text="Atteso = somma delle probabilità esatte di ogni tiro fatto")
+    await respond(interaction, "alea-luck", embed=embed)
+
+
+async def setup(bot):
+    bot.tree.add_command(alea_replay)
+    bot.tree.add_command(alea_history)
+    bot.tree.add_command(alea_luck)
@@ -0,0 +1,92 @@
+"""
+/roll: espressioni di dadi libere (alea.expr).
+"""
+import asyncio
+import time
+
+import discord
+from discord import app_commands
+
+from alea.expr import DiceExpressionError, parse_expression, roll_expression
+from core import EMBED_DESCRIPTION_LIMIT, EMBED_TITLE_LIMIT, HISTORY, SENDER, record_stage, respond, timed, within_budget
+
+# === Dice Expressions (/roll) ===
+ROLL_DETAIL_DICE = 60  # dadi mostrati per termine; oltre, solo il totale del termine
+HEAVY_ROLLS = asyncio.Semaphore(1)  # un solo tiro pesante alla volta in thread: la memoria della VM è poca
+
+
+async def roll_in_thread(expression):
+    """Tiro costoso in un thread, dopo quelli già in corso."""
+    async with HEAVY_ROLLS:
+        return await asyncio.to_thread(roll_expression, expression)
+
+def format_roll_term(term):
+    """Riga di un termine di dadi: dadi scartati barrati, 💥 per esplosioni e Tiri Aperti."""
+    values = term["Valori"]
+    if values is None or len(values) > ROLL_DETAIL_DICE:
+        return f"`{term['Termine']}` → **{term['Totale']}**"
+    shown = []
+    for i, (value, faces) in enumerate(zip(values, term["Facce"])):
+        text = f"{value}💥" if len(faces) > 1 else str(value)
+        shown.append(f"~~{text}~~" if term["Tenuti"] is not None and i not in term["Tenuti"] else text)
+    return f"`{term['Termine']}` [{', '.join(shown)}] → **{term['Totale']}**"
+
+
+@app_commands.command(name="roll", description="Tira un'espressione di dadi (es. 4d6kh3+2, 6d10kl2, 3d6!, 1d100ta)")
+async def roll(interaction: discord.Interaction, espressione: str):
+    """
+    Tiro libero per giochi secondari e regole della casa.
+
+    espressione: dadi e numeri con + - * e parentesi - *Obbligatorio*
+        - `NdF` o `Nd%`: N dadi da F facce
+        - `khK`/`klK`: tieni i K più alti/bassi · `dhK`/`dlK`: scarta i K più alti/bassi
+        - `!` esplode sul massimo, `!S` su S o più · `ta`: Tiro Aperto come in /alea
+    """
+    try:
+        expression = parse_expression(espressione)
+    except DiceExpressionError as e:
+        await respond(interaction, "roll", f"❌ {e}", ephemeral=True)
+        return
+
+    compute_start = time.perf_counter()
+
+    # Molti dadi o molte esplosioni: in un thread, per non bloccare l'event loop (defer solo se sfora il budget)
+    try:
+        if expression.offload:
+            result = await within_budget(interaction, "roll", roll_in_thread(expression))
+        else:
+            result = roll_expression(expression)
+    except DiceExpressionError as e:  # esplosioni oltre MAX_DRAWS estrazioni
+        await respond(interaction, "roll", f"❌ {e}", ephemeral=True)
+        return
+
+    terms = result["Termini"]
+    detailed = all(t["Valori"] is not None and len(t["Valori"]) <= ROLL_DETAIL_DICE for t in terms)
+    HISTORY.record(
+        user_id=interaction.user.id, guild_id=interaction.guild_id, channel_id=interaction.channel_id,
+        system="roll", expr=expression.text, result=result["Totale"],
+        dice=[t["Valori"] for t in terms] if detailed else None,
+        seed=f"{result['Seed']:016x}" if result["Seed"] is not None else None,
+    )
+
+    # Il totale sta nella descrizione: con `*` può avere centinaia di cifre e il titolo ha un limite di 256 caratteri
+    title = f"🎲 {expression.text}"
+    total = f"## = {result['Totale']}"
+    details = "\n".join(format_roll_term(t) for t in terms)
+    embed = discord.Embed(
+        title=title if len(title) <= EMBED_TITLE_LIMIT else title[:EMBED_TITLE_LIMIT - 1] + "…",
+        description=f"{total}\n{details}"[:EMBED_DESCRIPTION_LIMIT],
+        color=discord.Color.blurple()
+    )
+    footer = "kh/kl tieni · dh/dl scarta · ! esplode · ta Tiro Aperto"
+    if result["Seed"] is not None:
+        footer += f" | Seed {result['Seed']:016x}"
+    embed.set_footer(text=footer)
+    record_stage("roll", "compute", compute_start)
+
+    with timed("roll", "discord"):
+        await SENDER.send(interaction, "roll", [embed])
+
+
+async def setup(bot):
+    bot.tree.add_command(roll)
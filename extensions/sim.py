@@ -0,0 +1,94 @@
+"""
+/alea-sim: simulazioni Monte Carlo vettoriali (NumPy) di ALEA e ALEA99.
+"""
+import asyncio
+import secrets
+
+import discord
+from discord import app_commands
+
+from alea.thresholds import get_threshold_table
+from alea.rng import parse_seed
+from alea.dice import safe_malus, calcola_malus_stato, parse_ld
+from alea.odds import alea_odds, alea99_odds
+from alea.simulate import SIM_MAX_ROLLS, simulation_rng, simulate_alea, simulate_alea99, format_histogram
+from core import respond, within_budget
+
+# === Simulation ===
+SIMULATIONS = asyncio.Semaphore(1)  # una sola simulazione alla volta in thread: la memoria della VM è poca
+
+
+async def simulate_in_thread(simulate, *args):
+    """Simulazione in un thread, dopo quelle già in corso."""
+    async with SIMULATIONS:
+        return await asyncio.to_thread(simulate, *args)
+
+
+@app_commands.command(name="alea-sim", description="Simula molti tiri ALEA o ALEA99 e mostra frequenze e istogramma")
+@app_commands.choices(sistema=[
+    app_commands.Choice(name="ALEA Classico (1d100)", value="alea"),
+    app_commands.Choice(name="ALEA99 (Nd10)", value="alea99"),
+])
+async def alea_sim(interaction: discord.Interaction, vs: int, sistema: str = "alea", ld: int = 0, spec: int = 0,
+                   lf: int = 0, la: int = 0, ls: int = 0, tiri: int = 100_000, seme: str = ""):
+    """
+    Simulazione Monte Carlo vettoriale per bilanciare incontri e regole della casa.
+
+    sistema: alea (1d100) o alea99 (Nd10) - *Opzionale, default: alea*
+    spec: per ALEA99 N = 2+SPEC - *Opzionale, default: 0*
+    lf/la/ls: stati (solo ALEA classico) - *Opzionali*
+    tiri: numero di tiri simulati (max 5.000.000) - *Opzionale, default: 100.000*
+    seme: seme esadecimale PCG64 per ripetere una simulazione - *Opzionale*
+    """
+
+    seed = parse_seed(seme) if seme else secrets.randbits(64)
+    if seed is None:
+        await respond(interaction, "alea-sim", "❌ Seme non valido: usa il valore esadecimale mostrato nel footer", ephemeral=True)
+        return
+    rng = simulation_rng(seed)
+
+    if tiri < 1 or tiri > SIM_MAX_ROLLS:
+        await respond(interaction, "alea-sim", f"❌ Il numero di tiri deve essere tra 1 e {SIM_MAX_ROLLS:,}".replace(",", "."), ephemeral=True)
+        return
+
+    if sistema == "alea99":
+        if vs < 0 or vs > 99:
+            await respond(interaction, "alea-sim", "❌ VS deve essere tra 0 e 99", ephemeral=True)
+            return
+        if spec < 0 or spec > 3:
+            await respond(interaction, "alea-sim", "❌ SPEC deve essere 0, 1, 2 o 3 (N = 2+SPEC, quindi 2-5 dadi)", ephemeral=True)
+            return
+        ld_value = parse_ld(str(ld))
+        if ld_value is None:
+            await respond(interaction, "alea-sim", "❌ LD non riconosciuto. Usa: `-60` a `+60` (multipli di 20) oppure `-3` a `+3`", ephemeral=True)
+            return
+    elif vs <= 0:
+        await respond(interaction, "alea-sim", "❌ Devi fornire il Valore Soglia (VS)", ephemeral=True)
+        return
+
+    # La simulazione gira in un thread (una alla volta) per non bloccare l'event loop; il defer solo se sfora il budget
+
+    if sistema == "alea99":
+        n = 2 + spec
+        sim = await within_budget(interaction, "alea-sim", simulate_in_thread(simulate_alea99, n, vs, ld_value, tiri, rng))
+        exact = alea99_odds(n, vs, ld_value)
+        rows = [f"**{k}:** `{sim['Gradi'][k] / tiri * 100:.2f}%` (esatto `{exact[k]*100:.2f}%`)" for k in ("SA", "SP", "FP", "FC")]
+        title = f"🎲 Simulazione ALEA99 - {n}d10, VS {vs}, LD {ld_value}"
+    else:
+        malus_stato = calcola_malus_stato(lf, la, ls)
+        table = get_threshold_table(interaction.guild_id)
+        sim = await within_budget(interaction, "alea-sim", simulate_in_thread(simulate_alea, vs, ld, malus_stato, tiri, table, rng))
+        exact = alea_odds(vs, ld, malus_stato, table)
+        rows = [f"**{table.labels[i]}:** `{c / tiri * 100:.2f}%` (esatto `{exact[i]*100:.2f}%`)" for i, c in enumerate(sim["Gradi"])]
+        rows.append(f"**Tiri Aperti:** `{sim['Tiri Aperti'] / tiri * 100:.2f}%` | **Media TM:** `{sim['Media Tiro Manovra']:.2f}`")
+        title = f"🎲 Simulazione ALEA - VS {vs}, LD {ld}, Malus {safe_malus(malus_stato)}"
+
+    embed = discord.Embed(title=title, description="\n".join(rows), color=discord.Color.blurple())
+    embed.add_field(name="Istogramma", value=f"```\n{format_histogram(sim['Istogramma'], tiri)}\n```", inline=False)
+    embed.set_footer(text=f"{tiri:,} tiri simulati".replace(",", ".") + f" | Seme {seed:016x}")
+
+    await respond(interaction, "alea-sim", embed=embed)
+
+
+async def setup(bot):
+    bot.tree.add_command(alea_sim)